@@ -1,22 +1,592 @@
-from PIL import Image
-import requests
+import concurrent.futures
+import functools
+import hashlib
+import importlib
+import io
+import json
 import math
-import pandas as pd
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import ExitStack, contextmanager
+from itertools import count, repeat
 
 # Logging Setup
 # We can use the logging module to log information about our code.
 # This will do the same thing for us as print statements or using the debugger, again in a different way. 
 # Logging can be made more elaborate, but we can start with just the basics - basically a print statement for logs only. 
+# Importing the module leaves the logging configuration alone; call configure_logging() (or logging.basicConfig)
+# from the program that uses it.
 import logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(filename='testing.log', encoding='utf-8', level=logging.DEBUG)
+logger.addHandler(logging.NullHandler())
 #logging.debug('This will get logged')
 
+def configure_logging(filename='testing.log', level=logging.DEBUG) -> None:
+    """
+    Send log records to a file, as importing this module used to do.
+
+    Args:
+        filename (str, optional): The log file. Defaults to 'testing.log'.
+        level (int, optional): The lowest level written. Defaults to logging.DEBUG.
+    """
+    logging.basicConfig(filename=filename, encoding='utf-8', level=level)
+
+
+class _LazyModule():
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    pandas, numpy, PIL and requests account for nearly all of the import time of this module, and most programs only
+    need some of them: PIL and requests are only used to display images, pandas only to read CSVs. Once the module
+    is imported the stand-in replaces itself in this module's globals, so later lookups cost nothing extra.
+    """
+
+    def __init__(self, alias, module) -> None:
+        self._alias = alias
+        self._module = module
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._module)
+        globals()[self._alias] = module
+        return getattr(module, attr)
+
+
+np = _LazyModule("np", "numpy")
+pd = _LazyModule("pd", "pandas")
+Image = _LazyModule("Image", "PIL.Image")
+requests = _LazyModule("requests", "requests")
+multiprocessing = _LazyModule("multiprocessing", "multiprocessing")
+shared_memory = _LazyModule("shared_memory", "multiprocessing.shared_memory")
+pa = _LazyModule("pa", "pyarrow")
+
+def _clean_numeric(column, decimal=True):
+    """
+    Vectorized version of the per-row numeric cleanup in read_file.
+
+    String columns have every character except digits (and the decimal point, if decimal is True) removed before parsing;
+    empty or missing values become 0. Columns pandas already parsed as numbers only have their missing values replaced.
+
+    Args:
+        column (pd.Series): The raw CSV column.
+        decimal (bool, optional): Keep the decimal point and parse floats. Defaults to True. If False, parse integers.
+
+    Returns:
+        pd.Series: The parsed values, float64 or int64.
+        pd.Series: A boolean mask of the values that could not be parsed.
+    """
+    if pd.api.types.is_numeric_dtype(column):
+        values = column.fillna(0)
+        bad = pd.Series(False, index=column.index)
+    else:
+        pattern = r'[^0-9.]' if decimal else r'[^0-9]'
+        cleaned = column.astype(object).where(column.notna(), '').str.replace(pattern, '', regex=True)
+        values = pd.to_numeric(cleaned.where(cleaned != '', '0'), errors='coerce')
+        bad = values.isna()
+        values = values.fillna(0)
+
+    if decimal:
+        return values.astype('float64'), bad
+    return values.astype('int64'), bad
+
+# Striped locks guarding stock updates, picked by product name. They are shared by all inventories because
+# inventories combined with + share their stock entries.
+_STOCK_LOCKS = [threading.Lock() for _ in range(64)]
+
+def _stock_lock(product_name) -> threading.Lock:
+    """
+    Get the lock that guards the stock of a product.
+    """
+    return _STOCK_LOCKS[hash(product_name) % len(_STOCK_LOCKS)]
+
+# Every stock change, in any inventory, stores a new number from _stock_changes in _stock_version (next() on a count
+# is atomic), so a cached query result that depends on stock is current only while _stock_version still holds the
+# number it was cached with. Like the locks, this is shared because inventories combined with + share stock entries.
+_stock_changes = count(1)
+_stock_version = 0
+
+def _stock_changed() -> None:
+    """
+    Record that some product's stock changed.
+    """
+    global _stock_version
+    _stock_version = next(_stock_changes)
+
+# The same for prices, ratings and categories, which cached query results that filter or sort on them depend on
+_price_changes = count(1)
+_price_version = 0
+_rating_changes = count(1)
+_rating_version = 0
+_category_changes = count(1)
+_category_version = 0
+
+def _prices_changed() -> None:
+    """
+    Record that some product's base or discount price changed.
+    """
+    global _price_version
+    _price_version = next(_price_changes)
+
+def _ratings_changed() -> None:
+    """
+    Record that some product's rating or number of ratings changed.
+    """
+    global _rating_version
+    _rating_version = next(_rating_changes)
+
+def _categories_changed() -> None:
+    """
+    Record that some product's category or subcategory changed.
+    """
+    global _category_version
+    _category_version = next(_category_changes)
+
+# Inventories that keep indexes or a mutation log over their products, told by myProduct._notify when a product's price
+# or rating changes. Owners are tracked here rather than on each product, which would cost every product a slot, so
+# each inventory checks that a changed product is one of its own (see myInventory._holds). The tuple of weak references
+# is replaced rather than changed, so notifying needs no lock.
+_watchers = ()
+_watchers_lock = threading.Lock()
+
+def _watch(inventory) -> None:
+    """
+    Register an inventory to be told about price and rating changes. Registering twice does nothing.
+    """
+    global _watchers
+    with _watchers_lock:
+        live = tuple(ref for ref in _watchers if ref() is not None)
+        if not any(ref() is inventory for ref in live):
+            live += (weakref.ref(inventory),)
+        _watchers = live
+
+# Weighted rating queries rank products by a Bayesian average: each product's rating is pulled toward _RATING_PRIOR
+# as if it had _RATING_PRIOR_COUNT more ratings, so a single 5-star review ranks below a 4.8 from a thousand reviews.
+_RATING_PRIOR = 3.0
+_RATING_PRIOR_COUNT = 10
+
+def _weighted_rating(rating, numRate) -> float:
+    """
+    Get the Bayesian average rating used to rank products when a rating query asks for weighted=True.
+    """
+    return (rating * numRate + _RATING_PRIOR * _RATING_PRIOR_COUNT) / (numRate + _RATING_PRIOR_COUNT)
+
+class myMetrics():
+    """
+    Call counts, error counts and latency histograms for the instrumented myInventory methods, plus counts of CSV
+    values that failed to parse, per column.
+
+    Collection is off by default, and an instrumented method then only pays for one attribute check. Turn it on with
+    metrics.enabled = True and read the numbers with to_prometheus() or to_json().
+    """
+
+    # Upper bounds of the latency histogram buckets, in seconds
+    BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, math.inf)
+
+    def __init__(self, enabled=False) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Clear every counter.
+        """
+        with self._lock:
+            self.calls = {}
+            self.errors = {}
+            self.latency_sum = {}
+            self.latency_buckets = {}
+            self.parse_failures = {}
+
+    def record_call(self, operation, seconds, failed=False) -> None:
+        """
+        Count one call of an operation and add its duration to the histogram.
+        """
+        bucket = bisect_left(self.BUCKETS, seconds)
+        with self._lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+            if failed:
+                self.errors[operation] = self.errors.get(operation, 0) + 1
+            self.latency_sum[operation] = self.latency_sum.get(operation, 0.0) + seconds
+            buckets = self.latency_buckets.setdefault(operation, [0] * len(self.BUCKETS))
+            buckets[bucket] += 1
+
+    def record_parse_failures(self, column, count) -> None:
+        """
+        Count values of a CSV column that could not be parsed. Recorded even when timing is disabled,
+        since it happens at most once per file or chunk.
+        """
+        with self._lock:
+            self.parse_failures[column] = self.parse_failures.get(column, 0) + count
+
+    def to_json(self) -> str:
+        """
+        Get every counter as a JSON document. Histogram buckets are per bucket, not cumulative.
+        """
+        with self._lock:
+            return json.dumps({
+                "calls": self.calls,
+                "errors": self.errors,
+                "latency_seconds": {
+                    operation: {"sum": self.latency_sum[operation], "buckets": dict(zip(map(str, self.BUCKETS), counts))}
+                    for operation, counts in self.latency_buckets.items()
+                },
+                "parse_failures": self.parse_failures,
+            })
+
+    def to_prometheus(self) -> str:
+        """
+        Get every counter in the Prometheus text exposition format.
+        """
+        with self._lock:
+            lines = ["# HELP inventory_calls_total Calls to instrumented myInventory methods.",
+                     "# TYPE inventory_calls_total counter"]
+            lines += [f'inventory_calls_total{{operation="{operation}"}} {count}' for operation, count in self.calls.items()]
+            lines += ["# HELP inventory_errors_total Instrumented myInventory calls that raised an exception.",
+                      "# TYPE inventory_errors_total counter"]
+            lines += [f'inventory_errors_total{{operation="{operation}"}} {count}' for operation, count in self.errors.items()]
+            lines += ["# HELP inventory_latency_seconds Latency of instrumented myInventory methods.",
+                      "# TYPE inventory_latency_seconds histogram"]
+            for operation, counts in self.latency_buckets.items():
+                cumulative = 0
+                for bound, count in zip(self.BUCKETS, counts):
+                    cumulative += count
+                    label = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f'inventory_latency_seconds_bucket{{operation="{operation}",le="{label}"}} {cumulative}')
+                lines.append(f'inventory_latency_seconds_sum{{operation="{operation}"}} {self.latency_sum[operation]}')
+                lines.append(f'inventory_latency_seconds_count{{operation="{operation}"}} {cumulative}')
+            lines += ["# HELP inventory_parse_failures_total CSV values that could not be parsed, by column.",
+                      "# TYPE inventory_parse_failures_total counter"]
+            lines += [f'inventory_parse_failures_total{{column="{column}"}} {count}' for column, count in self.parse_failures.items()]
+            return "\n".join(lines) + "\n"
+
+
+# The metrics shared by every inventory
+metrics = myMetrics()
+
+def _instrumented(method):
+    """
+    Decorator that records calls, errors and latency of a myInventory method in metrics while metrics.enabled is set.
+    """
+    operation = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if not metrics.enabled:
+            return method(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except Exception:
+            metrics.record_call(operation, time.perf_counter() - start, failed=True)
+            raise
+        metrics.record_call(operation, time.perf_counter() - start)
+        return result
+
+    return wrapper
+
+def _report_parse_failures(failures) -> None:
+    """
+    Add per-column parse failure counts from one read to metrics and log one summary line.
+
+    Args:
+        failures (dict): Values that failed to parse, by column.
+    """
+    failures = {column: count for column, count in failures.items() if count}
+    if not failures:
+        return
+    for column, count in failures.items():
+        metrics.record_parse_failures(column, count)
+    summary = ", ".join(f"{column}: {count}" for column, count in failures.items())
+    logger.error(f"Skipped rows with unparseable values ({summary}).")
+
+# Version of the file layout written by myInventory.save_snapshot. Version 2 added the stock settings and reorder
+# points; version 1 files are still read, with the default settings.
+SNAPSHOT_VERSION = 2
+
+def _pack_strings(values):
+    """
+    Pack a list of strings into one UTF-8 byte array for a snapshot. Missing (non-string) values are stored as empty
+    strings and flagged in the returned mask.
+
+    Args:
+        values (list): The strings to pack.
+
+    Returns:
+        np.ndarray: The NUL-separated UTF-8 bytes, as uint8.
+        np.ndarray: A boolean mask of the missing values.
+    """
+    missing = np.array([not isinstance(value, str) for value in values], dtype=bool)
+    text = "\x00".join(value if isinstance(value, str) else "" for value in values)
+    return np.frombuffer(text.encode("utf-8"), dtype=np.uint8), missing
+
+def _unpack_strings(packed, missing) -> list:
+    """
+    Reverse _pack_strings. Missing values come back as NaN, as pandas reads them from a CSV.
+    """
+    if len(missing) == 0:
+        return []
+    values = packed.tobytes().decode("utf-8").split("\x00")
+    for position in np.flatnonzero(missing):
+        values[position] = float("nan")
+    return values
+
+class myImageCache():
+    """
+    Fetches product images and keeps them in two caches: an on-disk cache of the downloaded bytes, and an in-memory
+    cache of decoded thumbnails.
+
+    Downloads share one pooled requests.Session with a timeout, and prefetch runs at most max_workers at a time.
+    On disk, image bytes are stored once per distinct content under their SHA-256 digest, with an index.json mapping
+    URLs to digests. When the files exceed max_bytes, the least recently used ones are deleted. Downloads write the
+    index at most every INDEX_SAVE_INTERVAL seconds, and prefetch and close write it out; a URL missing from the index
+    after a crash is downloaded again.
+    """
+
+    INDEX_SAVE_INTERVAL = 1.0
+
+    def __init__(self, cache_dir=None, max_bytes=256 * 1024 * 1024, max_thumbnails=1024, max_workers=8, timeout=10) -> None:
+        """
+        Args:
+            cache_dir (str, optional): Where to keep downloaded images. Defaults to a directory in the system temp dir.
+            max_bytes (int, optional): Size limit of the on-disk cache. Defaults to 256 MB.
+            max_thumbnails (int, optional): How many decoded thumbnails to keep in memory. Defaults to 1024.
+            max_workers (int, optional): Most downloads at once, and the size of the connection pool. Defaults to 8.
+            timeout (float, optional): Connect and read timeout for each request, in seconds. Defaults to 10.
+        """
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "inventory_images")
+        self.max_bytes = max_bytes
+        self.max_thumbnails = max_thumbnails
+        self.max_workers = max_workers
+        self.timeout = timeout
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._thumbnails = OrderedDict()
+        self._index_path = os.path.join(self.cache_dir, "index.json")
+        self._index = {}
+        # Digest -> file size, least recently used first, and the sum of the sizes
+        self._files = OrderedDict()
+        self._bytes = 0
+        # Whether the index changed since it was last written, and when that was
+        self._index_dirty = False
+        self._index_saved = time.monotonic()
+        self._load_index()
+
+    def _blob_path(self, digest) -> str:
+        return os.path.join(self.cache_dir, digest)
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._index_path, encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            index = {}
+        files = []
+        for digest in set(index.values()):
+            try:
+                stat = os.stat(self._blob_path(digest))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, digest, stat.st_size))
+        for _, digest, size in sorted(files):
+            self._files[digest] = size
+        self._bytes = sum(self._files.values())
+        self._index = {url: digest for url, digest in index.items() if digest in self._files}
+
+    def _save_index(self, force=True) -> None:
+        """
+        Write the URL index if it changed, or with force=False only if INDEX_SAVE_INTERVAL has passed since the last write.
+        """
+        with self._lock:
+            if not self._index_dirty or (not force and time.monotonic() - self._index_saved < self.INDEX_SAVE_INTERVAL):
+                return
+            index = dict(self._index)
+            self._index_dirty = False
+            self._index_saved = time.monotonic()
+        temp_path = f"{self._index_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(temp_path, self._index_path)
+
+    def _cached_bytes(self, url):
+        with self._lock:
+            digest = self._index.get(url)
+            if digest is None:
+                return None
+            self._files.move_to_end(digest)
+        try:
+            with open(self._blob_path(digest), "rb") as file:
+                content = file.read()
+            # The file modification time records recency across restarts
+            os.utime(self._blob_path(digest))
+            return content
+        except OSError:
+            with self._lock:
+                self._index.pop(url, None)
+                self._bytes -= self._files.pop(digest, 0)
+                self._index_dirty = True
+            return None
+
+    def _store(self, url, content) -> None:
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as file:
+                file.write(content)
+            os.replace(temp_path, path)
+
+        with self._lock:
+            self._index[url] = digest
+            self._index_dirty = True
+            self._bytes += len(content) - self._files.get(digest, 0)
+            self._files[digest] = len(content)
+            self._files.move_to_end(digest)
+            evicted = []
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                old_digest, size = self._files.popitem(last=False)
+                self._bytes -= size
+                evicted.append(old_digest)
+            if evicted:
+                gone = set(evicted)
+                self._index = {cached_url: cached for cached_url, cached in self._index.items() if cached not in gone}
+
+        for old_digest in evicted:
+            try:
+                os.remove(self._blob_path(old_digest))
+            except OSError:
+                pass
+
+    def fetch(self, url, save_index=True) -> bytes:
+        """
+        Get the bytes of an image, from the disk cache if it is there, otherwise by downloading it.
+
+        Args:
+            url (str): The image URL.
+            save_index (bool, optional): Write the URL index to disk after a download, if INDEX_SAVE_INTERVAL has
+                passed since it was last written. Defaults to True.
+
+        Returns:
+            bytes: The image file's contents.
+
+        Raises:
+            requests.RequestException: If the download fails or times out.
+        """
+        content = self._cached_bytes(url)
+        if content is not None:
+            return content
+
+        response = self._session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        content = response.content
+        self._store(url, content)
+        if save_index:
+            self._save_index(force=False)
+        return content
+
+    def open(self, url, size=None):
+        """
+        Get an image as a PIL Image.
+
+        Args:
+            url (str): The image URL.
+            size (tuple, optional): If given, return a thumbnail that fits in (width, height). Thumbnails are kept
+                in memory, so asking for the same one again doesn't decode the image again. Defaults to None.
+
+        Returns:
+            Image: The decoded image or thumbnail. Thumbnails are copies of the cached one, so changing one is safe.
+        """
+        if size is None:
+            return Image.open(io.BytesIO(self.fetch(url)))
+
+        key = (url, tuple(size))
+        with self._lock:
+            thumbnail = self._thumbnails.get(key)
+            if thumbnail is not None:
+                self._thumbnails.move_to_end(key)
+                return thumbnail.copy()
+
+        thumbnail = Image.open(io.BytesIO(self.fetch(url)))
+        thumbnail.thumbnail(size)
+        with self._lock:
+            self._thumbnails[key] = thumbnail
+            while len(self._thumbnails) > self.max_thumbnails:
+                self._thumbnails.popitem(last=False)
+        return thumbnail.copy()
+
+    def prefetch(self, urls) -> int:
+        """
+        Download images into the disk cache ahead of time, up to max_workers at once. Failures are logged and skipped.
+
+        Args:
+            urls (iterable): The image URLs.
+
+        Returns:
+            int: The number of distinct URLs whose image is now in the cache, whether downloaded by this call
+                or cached already. Images that failed to download are not counted.
+        """
+        urls = [url for url in dict.fromkeys(urls) if isinstance(url, str)]
+
+        def fetch(url):
+            try:
+                self.fetch(url, save_index=False)
+                return True
+            except Exception as e:
+                logger.error(f"Failed to prefetch image {url}: {e}")
+                return False
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            fetched = sum(executor.map(fetch, urls))
+        self._save_index()
+        return fetched
+
+    def close(self) -> None:
+        """
+        Write out the URL index and close the pooled HTTP connections.
+        """
+        self._save_index()
+        self._session.close()
+
+
+_image_cache = None
+_image_cache_lock = threading.Lock()
+
+def get_image_cache() -> myImageCache:
+    """
+    Get the shared image cache used by myProduct.displayIMG, creating it with default settings on first use.
+    """
+    global _image_cache
+    if _image_cache is None:
+        # Threads displaying their first images at once must not each create a cache over the same directory
+        with _image_cache_lock:
+            if _image_cache is None:
+                _image_cache = myImageCache()
+    return _image_cache
+
 # Note: the arrow and variable type thing at the end of function definitions is a type hint.
 # It's not required, and it won't be enforced when code runs, it is basically a more formalized comment. 
 
 class myProduct():
 
+    # Fixed attribute slots instead of a per-instance __dict__, which saves memory when there are millions of products.
+    # category, subcat, price, discPrice, rating and numRate are properties over the underscored slots, so that assigning
+    # one directly, e.g. product.discPrice = 9.99, still reaches the indexes of the inventories holding the product.
+    __slots__ = ("name", "_category", "_subcat", "imageURL", "prodURL", "_rating", "_numRate", "_discPrice", "_price")
+
     def __init__(self, name, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price) -> None:
         """
         Initialize a product object. Each product has a name, category, subcategory, image URL, product URL, rating, number of ratings, discount price, and price.
@@ -35,39 +605,141 @@ class myProduct():
             price (str): The base price of the product.
         """
         self.name = name
-        self.category = category
-        self.subcat = subcat
+        self._category = category
+        self._subcat = subcat
         self.imageURL = imageURL
         self.prodURL = prodURL
         
         # Convert rating to float and ensure valid input
         try:
-            self.rating = float(rating)
+            self._rating = float(rating)
         except ValueError:
-            self.rating = 0.0  # Default to 0 if conversion fails
+            self._rating = 0.0  # Default to 0 if conversion fails
             logger.error(f"Invalid rating value for product {name}. Defaulted to 0.0.")
         
         # Convert numRate to int and ensure valid input
         try:
-            self.numRate = int(numRate)
+            self._numRate = int(numRate)
         except ValueError:
-            self.numRate = 0  # Default to 0 if conversion fails
+            self._numRate = 0  # Default to 0 if conversion fails
             logger.error(f"Invalid numRate value for product {name}. Defaulted to 0.")
         
         # Convert discPrice to float and ensure valid input
         try:
-            self.discPrice = float(discPrice)
+            self._discPrice = float(discPrice)
         except ValueError:
-            self.discPrice = 0.0  # Default to 0 if conversion fails
+            self._discPrice = 0.0  # Default to 0 if conversion fails
             logger.error(f"Invalid discount price value for product {name}. Defaulted to 0.0.")
         
         # Convert price to float and ensure valid input
         try:
-            self.price = float(price)
+            self._price = float(price)
         except ValueError:
-            self.price = 0.0  # Default to 0 if conversion fails
+            self._price = 0.0  # Default to 0 if conversion fails
             logger.error(f"Invalid price value for product {name}. Defaulted to 0.0.")
 
+    @classmethod
+    def from_validated(cls, name, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price) -> 'myProduct':
+        """
+        Build a product from values that are already the right types, skipping the conversions and error handling in __init__.
+        Use this only for trusted input, e.g. columns that read_file has already cleaned.
+
+        Args:
+            Same as __init__, except rating, discPrice and price must already be floats and numRate an int.
+
+        Returns:
+            myProduct: The new product.
+        """
+        product = cls.__new__(cls)
+        product.name = name
+        product._category = category
+        product._subcat = subcat
+        product.imageURL = imageURL
+        product.prodURL = prodURL
+        product._rating = rating
+        product._numRate = numRate
+        product._discPrice = discPrice
+        product._price = price
+        return product
+
+    @property
+    def category(self):
+        return self._category
+
+    @category.setter
+    def category(self, value):
+        old_category = self._category
+        self._category = value
+        self._category_changed(old_category, self._subcat)
+
+    @property
+    def subcat(self):
+        return self._subcat
+
+    @subcat.setter
+    def subcat(self, value):
+        old_subcat = self._subcat
+        self._subcat = value
+        self._category_changed(self._category, old_subcat)
+
+    @property
+    def price(self):
+        return self._price
+
+    @price.setter
+    def price(self, value):
+        old_price, old_purchase = self._price, self.get_purchase_price()
+        self._price = value
+        self._price_changed(old_price, old_purchase)
+
+    @property
+    def discPrice(self):
+        return self._discPrice
+
+    @discPrice.setter
+    def discPrice(self, value):
+        old_purchase = self.get_purchase_price()
+        self._discPrice = value
+        self._price_changed(self._price, old_purchase)
+
+    @property
+    def rating(self):
+        return self._rating
+
+    @rating.setter
+    def rating(self, value):
+        old_rating = self._rating
+        self._rating = value
+        self._rating_changed(old_rating, self._numRate)
+
+    @property
+    def numRate(self):
+        return self._numRate
+
+    @numRate.setter
+    def numRate(self, value):
+        old_numRate = self._numRate
+        self._numRate = value
+        self._rating_changed(self._rating, old_numRate)
+
+    def _write_disc_price(self, discPrice) -> None:
+        """
+        Set the discount price without telling any inventory, for callers that update the indexes themselves.
+        """
+        self._discPrice = discPrice
+
+    def _write_price(self, price) -> None:
+        """
+        Set the base price without telling any inventory, see _write_disc_price.
+        """
+        self._price = price
+
+    def _write_rating(self, rating, numRate) -> None:
+        """
+        Set the rating and number of ratings together without telling any inventory, see _write_disc_price.
+        """
+        self._rating, self._numRate = rating, numRate
+
     def __repr__(self):
         """
         This method will define how the product object is represented when printed.
@@ -112,12 +784,15 @@ class myProduct():
             rating = float(rating)  # Convert the rating to float
             numberRate = int(numberRate)  # Ensure numberRate is an integer
 
+            old_rating, old_numRate = self.rating, self.numRate
+
             # Calculate the new weighted average rating
             total_ratings = self.numRate + numberRate
-            self.rating = ((self.rating * self.numRate) + (rating * numberRate)) / total_ratings
+            new_rating = ((self.rating * self.numRate) + (rating * numberRate)) / total_ratings
 
-            # Update the total number of ratings
-            self.numRate = total_ratings
+            # Update the rating and the total number of ratings together, then tell the inventories once
+            self._write_rating(new_rating, total_ratings)
+            self._rating_changed(old_rating, old_numRate)
 
             return self.rating  # Return the new rating
 
@@ -165,7 +840,7 @@ class myProduct():
         # Truncate to two decimal places
         truncated_price = int(new_discount_price * 100) / 100.0
         
-        # Update the discount price
+        # Update the discount price (the discPrice setter tells the inventories holding this product)
         self.discPrice = truncated_price
         
         return self.discPrice  # Return the new discount price
@@ -196,9 +871,59 @@ class myProduct():
             logger.error(f"Invalid value for newPrice: {newPrice}. Setting discount price failed.")
             return self.discPrice  # Return the current discount price if there's an error
 
-    def displayIMG(self):
+    def __reduce__(self):
+        # Pickle the fields only, so a view pickles as a plain product
+        return (myProduct.from_validated, (self.name, self.category, self.subcat, self.imageURL, self.prodURL,
+                                           self.rating, self.numRate, self.discPrice, self.price))
+
+    def _category_changed(self, old_category, old_subcat) -> None:
+        """
+        Tell the inventories holding this product that its category or subcategory changed.
+        """
+        _categories_changed()
+        self._notify("_on_category_change", old_category, old_subcat)
+
+    def _price_changed(self, old_price, old_purchase, skip=None) -> None:
+        """
+        Tell the inventories holding this product that its base or discount price changed.
+        """
+        _prices_changed()
+        self._notify("_on_price_change", old_price, old_purchase, skip=skip)
+
+    def _rating_changed(self, old_rating, old_numRate, skip=None) -> None:
+        """
+        Tell the inventories holding this product that its rating or number of ratings changed.
+        """
+        _ratings_changed()
+        self._notify("_on_rating_change", old_rating, old_numRate, skip=skip)
+
+    def _notify(self, callback, *args, skip=None) -> None:
+        """
+        Call a method on every watching inventory, e.g. _notify("_on_price_change", old_price, old_purchase).
+        Inventories that don't hold this product ignore the call.
+
+        Args:
+            callback (str): The name of the myInventory method to call with this product and args.
+            skip (myInventory, optional): An inventory not to call, because it is updating itself. Defaults to None.
+        """
+        for ref in _watchers:
+            inventory = ref()
+            if inventory is not None and inventory is not skip:
+                getattr(inventory, callback)(self, *args)
+
+    def displayIMG(self, size=None, cache=None):
+        """
+        Get the product image, through the image cache so repeated calls don't download it again.
+
+        Args:
+            size (tuple, optional): Return a thumbnail that fits in (width, height) instead of the full image. Defaults to None.
+            cache (myImageCache, optional): The cache to use. Defaults to the shared one from get_image_cache().
+
+        Returns:
+            Image: The image, or None if it couldn't be fetched.
+        """
         try:
-            im = Image.open(requests.get(self.imageURL, stream=True).raw)
+            im = (cache or get_image_cache()).open(self.imageURL, size)
             return im
         except Exception as e:
             logger.error(f"Failed to display image for {self.name}: {e}")
@@ -240,282 +965,3819 @@ class myProduct():
     # to add any other methods you want to organize your code, but they'll need to be called by
     # the other methods to be included in the tests.
 
-class myInventory():
+class _ReadWriteLock():
+    """
+    A lock that many readers can hold at once, or one writer alone. A waiting writer blocks new readers,
+    so a steady stream of readers can't starve it.
 
-    def __init__(self, inv_name="My Inventory", file_path=None) -> None:
-        # Think about the best data structure to use to store the product objects. 
-        # Consider how it will typically be accessed and what operations will be performed on it.
-        # As long as you meet what the the other methods expect, you can use any data structure, but some may be easier or quicker. 
-        """
-        Initialize the inventory with a name and optionally load products from a CSV file.
+    The lock is re-entrant: a thread that holds it can take it again for reading without waiting (even behind a waiting
+    writer, which would otherwise wait for it forever), and the writer can take it again for writing. A reader can't
+    upgrade to writing, since two readers trying to would wait for each other; that raises RuntimeError instead.
+    """
 
-        Args:
-            inv_name (str): The name of the inventory.
-            file_path (str): Optional file path to load products from a CSV file.
-        """
-        # Initialize the inventory name
-        self.inv_name = inv_name
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = {}
+        self._writer = None
+        self._write_depth = 0
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._writers_waiting:
+                    self._condition.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                depth = self._readers.pop(me) - 1
+                if depth:
+                    self._readers[me] = depth
+                elif not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._write_depth += 1
+            elif me in self._readers:
+                raise RuntimeError("Can't take a lock for writing while holding it for reading.")
+            else:
+                self._writers_waiting += 1
+                try:
+                    while self._writer is not None or self._readers:
+                        self._condition.wait()
+                finally:
+                    self._writers_waiting -= 1
+                self._writer, self._write_depth = me, 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._write_depth -= 1
+                if not self._write_depth:
+                    self._writer = None
+                    self._condition.notify_all()
 
-        # Create a list to store product objects
-        self.products = {}
-        
-        if file_path:
-            self.read_file(file_path)
-        
 
-    def read_file(self, path) -> int:
+class _SortedIndex():
+    """
+    Product names kept sorted by a numeric key (a price), so a key range can be found with two bisects.
+
+    Inserts are buffered and merged into the sorted lists on the next lookup. A few at a time are placed with bisect,
+    larger batches are merged with one sort, so loading a whole file stays O(n log n).
+    """
+
+    _INSORT_LIMIT = 64
+
+    def __init__(self, keys=(), names=()) -> None:
         """
-        Read in a CSV file and populate the inventory with the products in the file. Each product should have a stock of 10, unless otherwise specified.
-        Note that the CSV file will have the following columns: name, main_category, sub_category, image, link, ratings, no_of_ratings, discount_price, actual_price.
-        Duplicate names should not be allowed in the inventory, if a duplicate attempts to be added, the function should ignore it.
-        Also, the ratings and no_of_ratings should be converted to floats and integers respectively.
-        Additionally, the discount_price and actual_price should be converted to floats, and any non-numeric characters should be removed.
-        
         Args:
-            path (str): The path to the CSV file.
-        
-        Returns:
-            int: The number of products in the inventory.
+            keys (list, optional): The keys, already sorted.
+            names (list, optional): The product name for each key.
         """
+        self.keys = list(keys)
+        self.names = list(names)
+        self._pending = []
+        # Lookups run concurrently under the owner's read lock, and any of them may do the merge
+        self._flush_lock = threading.Lock()
 
-        data = pd.read_csv(path)
+    def __len__(self) -> int:
+        return len(self.keys) + len(self._pending)
 
-        for _, row in data.iterrows():
-            try:
-                # Handle discount_price
-                if isinstance(row['discount_price'], str):
-                    discount_price = ''.join(c for c in row['discount_price'] if c.isdigit() or c == '.')
-                    discount_price = float(discount_price) if discount_price else 0.0  # Default to 0.0 if empty or invalid
-                else:
-                    discount_price = float(row['discount_price']) if not pd.isna(row['discount_price']) else 0.0
+    def add(self, key, name) -> None:
+        self._pending.append((key, name))
 
-                # Handle actual_price
-                if isinstance(row['actual_price'], str):
-                    actual_price = ''.join(c for c in row['actual_price'] if c.isdigit() or c == '.')
-                    actual_price = float(actual_price) if actual_price else 0.0  # Default to 0.0 if empty or invalid
-                else:
-                    actual_price = float(row['actual_price']) if not pd.isna(row['actual_price']) else 0.0
+    def discard(self, key, name) -> None:
+        """
+        Remove one (key, name) entry, if it is in the index.
+        """
+        self._flush()
+        for position in range(bisect_left(self.keys, key), bisect_right(self.keys, key)):
+            if self.names[position] == name:
+                del self.keys[position]
+                del self.names[position]
+                return
+
+    def top(self, count) -> list:
+        """
+        Get the names with the highest keys, highest first.
+        """
+        self._flush()
+        if count <= 0:
+            return []
+        return self.names[:-count - 1:-1]
+
+    def discard_names(self, names) -> None:
+        """
+        Remove every entry for a set of names in one pass over the index.
+        """
+        self._flush()
+        keep = [position for position, name in enumerate(self.names) if name not in names]
+        self.keys = [self.keys[position] for position in keep]
+        self.names = [self.names[position] for position in keep]
+
+    def count(self, low, high) -> int:
+        """
+        Get the number of names whose key is in [low, high], without building the list.
+        """
+        self._flush()
+        return max(0, bisect_right(self.keys, high) - bisect_left(self.keys, low))
+
+    def range(self, low, high) -> list:
+        """
+        Get the names whose key is in [low, high], in ascending key order.
+        """
+        self._flush()
+        return self.names[bisect_left(self.keys, low):bisect_right(self.keys, high)]
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        with self._flush_lock:
+            if self._pending:
+                self._merge_pending()
+
+    def _merge_pending(self) -> None:
+        if len(self._pending) <= self._INSORT_LIMIT:
+            for key, name in self._pending:
+                position = bisect_right(self.keys, key)
+                self.keys.insert(position, key)
+                self.names.insert(position, name)
+        else:
+            pairs = sorted(list(zip(self.keys, self.names)) + self._pending, key=lambda pair: pair[0])
+            self.keys = [key for key, _ in pairs]
+            self.names = [name for _, name in pairs]
+        self._pending = []
+
+
+class _NameIndex():
+    """
+    Inverted index from the words of product names to the names, for searchProducts.
+
+    Words are matched exactly, by prefix (found by bisecting the sorted vocabulary), or, for fuzzy searches,
+    by trigram similarity: each word is indexed under its three-letter substrings, so a misspelled query word
+    can be compared only against words that share some trigrams with it.
+    """
+
+    _WORD = re.compile(r"\w+")
+
+    def __init__(self) -> None:
+        self.postings = {}
+        self.trigrams = {}
+        self._vocabulary = []
+        self._vocabulary_dirty = False
+
+    @classmethod
+    def words(cls, text) -> list:
+        """
+        Split text into lowercase words, ignoring punctuation such as the "..." that truncated names end with.
+        """
+        return cls._WORD.findall(text.lower()) if isinstance(text, str) else []
+
+    @staticmethod
+    def _trigrams(word) -> set:
+        padded = f"  {word} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def add(self, name) -> None:
+        for word in set(self.words(name)):
+            names = self.postings.get(word)
+            if names is None:
+                names = self.postings[word] = set()
+                self._vocabulary_dirty = True
+                for trigram in self._trigrams(word):
+                    self.trigrams.setdefault(trigram, set()).add(word)
+            names.add(name)
+
+    def _matches(self, word, fuzzy, min_similarity) -> dict:
+        """
+        Get the indexed words matching one query word, with a score: 1.0 for the exact word, 0.8 for words it is a
+        prefix of, and, when fuzzy, 0.6 times the trigram similarity for other similar words.
+        """
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self.postings)
+            self._vocabulary_dirty = False
+
+        matches = {}
+        start = bisect_left(self._vocabulary, word)
+        for position in range(start, len(self._vocabulary)):
+            candidate = self._vocabulary[position]
+            if not candidate.startswith(word):
+                break
+            matches[candidate] = 1.0 if candidate == word else 0.8
+        if not fuzzy:
+            return matches
+
+        query = self._trigrams(word)
+        shared = {}
+        for trigram in query:
+            for candidate in self.trigrams.get(trigram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        for candidate, common in shared.items():
+            similarity = common / len(query | self._trigrams(candidate))
+            if similarity >= min_similarity and candidate not in matches:
+                matches[candidate] = 0.6 * similarity
+        return matches
+
+    def search(self, query, limit=10, fuzzy=False, min_similarity=0.3) -> list:
+        """
+        Get the names containing every word of the query (as a whole word or a prefix, or a similar word when fuzzy),
+        best match first. Names are scored by the sum of their best match per query word; ties go to the shorter name.
+        """
+        scores = None
+        for word in dict.fromkeys(self.words(query)):
+            word_scores = {}
+            for candidate, score in self._matches(word, fuzzy, min_similarity).items():
+                for name in self.postings[candidate]:
+                    if score > word_scores.get(name, 0):
+                        word_scores[name] = score
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {name: total + word_scores[name] for name, total in scores.items() if name in word_scores}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        return sorted(scores, key=lambda name: (-scores[name], len(name), name))[:limit]
+
+
+class _ProductView(myProduct):
+    """
+    A myProduct that reads and writes its fields from a row of a _ColumnStore instead of keeping its own copy.
+    Views are created on demand by the columnar inventory, so products that are never looked up never become Python objects.
+    """
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store, row) -> None:
+        self._store = store
+        self._row = row
+
+    def _column_property(column, cast, changed):
+        # changed(view) takes the old values a change is reported with, and returns the callback reporting it
+        def fget(self):
+            return cast(getattr(self._store, column)[self._row])
+
+        def fset(self, value):
+            report = changed(self)
+            getattr(self._store, column)[self._row] = value
+            report()
+
+        return property(fget, fset)
+
+    def _price_reporter(self):
+        old_price, old_purchase = self.price, self.get_purchase_price()
+        return lambda: self._price_changed(old_price, old_purchase)
+
+    def _rating_reporter(self):
+        old_rating, old_numRate = self.rating, self.numRate
+        return lambda: self._rating_changed(old_rating, old_numRate)
+
+    def _code_property(column):
+        def fget(self):
+            return self._store.categories[getattr(self._store, column)[self._row]]
+
+        def fset(self, value):
+            old_category, old_subcat = self.category, self.subcat
+            getattr(self._store, column)[self._row] = self._store.intern(value)
+            self._category_changed(old_category, old_subcat)
+
+        return property(fget, fset)
+
+    name = property(lambda self: self._store.names[self._row])
+    category = _code_property("category_codes")
+    subcat = _code_property("subcat_codes")
+    imageURL = property(lambda self: self._store.image_urls[self._row])
+    prodURL = property(lambda self: self._store.prod_urls[self._row])
+    rating = _column_property("rating", float, _rating_reporter)
+    numRate = _column_property("numRate", int, _rating_reporter)
+    discPrice = _column_property("discPrice", float, _price_reporter)
+    price = _column_property("price", float, _price_reporter)
+
+    del _column_property, _code_property, _price_reporter, _rating_reporter
+
+    def _write_disc_price(self, discPrice) -> None:
+        self._store.discPrice[self._row] = discPrice
+
+    def _write_price(self, price) -> None:
+        self._store.price[self._row] = price
+
+    def _write_rating(self, rating, numRate) -> None:
+        self._store.rating[self._row] = rating
+        self._store.numRate[self._row] = numRate
+
+
+class _ColumnEntry():
+    """
+    Stand-in for the {"product": myProduct, "stock": int} dict stored per product in a dict-backed inventory.
+    Reading "product" builds a _ProductView, and "stock" reads and writes the stock column.
+    """
+
+    def __init__(self, store, row) -> None:
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, key):
+        if key == "product":
+            return _ProductView(self._store, self._row)
+        if key == "stock":
+            return int(self._store.stock[self._row])
+        raise KeyError(key)
+
+    def __setitem__(self, key, value) -> None:
+        if key != "stock":
+            raise KeyError(key)
+        self._store.stock[self._row] = value
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class _ColumnStore(Mapping):
+    """
+    Array-backed product storage for myInventory(columnar=True).
+
+    Numeric fields live in NumPy arrays indexed by row, category and subcategory are stored as integer codes into a
+    shared list of interned strings, and the name to row lookup is a plain dict. The store behaves like the
+    name -> {"product", "stock"} dict of a regular inventory, so the myInventory methods work unchanged.
+    Like _ProductDict, version counts the products set through store[name] = ..., which the inventory's indexes
+    don't see.
+    """
+
+    version = 0
+    # Set by from_arrays: the columns are someone else's arrays, which growing would silently copy away from
+    fixed = False
+    _NUMERIC = {"price": "float64", "discPrice": "float64", "rating": "float64", "numRate": "int64", "stock": "int64"}
+    _CODES = ("category_codes", "subcat_codes")
+
+    def __init__(self, capacity=1024) -> None:
+        self.index = {}
+        self.names = []
+        self.image_urls = []
+        self.prod_urls = []
+        self.categories = []
+        self._category_codes = {}
+        self._size = 0
+        self._capacity = capacity
+        self._arrays = {column: np.zeros(capacity, dtype=dtype) for column, dtype in self._NUMERIC.items()}
+        self._arrays.update({column: np.zeros(capacity, dtype=np.int32) for column in self._CODES})
+
+    def __getattr__(self, column):
+        # Expose each array trimmed to the used rows, e.g. store.price
+        arrays = self.__dict__.get("_arrays", {})
+        if column in arrays:
+            return arrays[column][:self._size]
+        raise AttributeError(column)
+
+    def intern(self, value) -> int:
+        """
+        Get the code of a category string, adding it to the category table if it is new.
+
+        Args:
+            value (str): The category or subcategory.
+
+        Returns:
+            int: The category code.
+        """
+        code = self._category_codes.get(value)
+        if code is None:
+            code = len(self.categories)
+            self._category_codes[value] = code
+            self.categories.append(value)
+        return code
+
+    def code_of(self, value):
+        """
+        Get the code of a category string without adding it.
+
+        Returns:
+            int: The category code, or None if no product uses this category.
+        """
+        return self._category_codes.get(value)
+
+    def _reserve(self, count) -> None:
+        if self.fixed and count:
+            raise ValueError("Can't add products to a store over fixed arrays, such as a shard's shared memory.")
+        needed = self._size + count
+        if needed <= self._capacity:
+            return
+        while self._capacity < needed:
+            self._capacity *= 2
+        for column, array in self._arrays.items():
+            grown = np.zeros(self._capacity, dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            self._arrays[column] = grown
+
+    def append(self, product, stock=10) -> int:
+        """
+        Add one product as a new row.
+
+        Args:
+            product (myProduct): The product to copy into the store.
+            stock (int, optional): The product's stock. Defaults to 10.
+
+        Returns:
+            int: The new row.
+        """
+        return self.extend([product.name], [product.category], [product.subcat], [product.imageURL], [product.prodURL],
+                           [product.rating], [product.numRate], [product.discPrice], [product.price], stock)[0]
+
+    def extend(self, names, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price, stock=10) -> range:
+        """
+        Add many products as new rows. Every argument except stock is a sequence with one value per product;
+        the caller is responsible for making sure the names are new and unique.
+
+        Returns:
+            range: The new rows.
+
+        Raises:
+            ValueError: If the store is fixed, see from_arrays.
+        """
+        count = len(names)
+        self._reserve(count)
+        rows = range(self._size, self._size + count)
+        start, end = rows.start, rows.stop
+
+        self._arrays["price"][start:end] = price
+        self._arrays["discPrice"][start:end] = discPrice
+        self._arrays["rating"][start:end] = rating
+        self._arrays["numRate"][start:end] = numRate
+        self._arrays["stock"][start:end] = stock
+        self._arrays["category_codes"][start:end] = [self.intern(value) for value in category]
+        self._arrays["subcat_codes"][start:end] = [self.intern(value) for value in subcat]
+
+        self.names.extend(names)
+        self.image_urls.extend(imageURL)
+        self.prod_urls.extend(prodURL)
+        self.index.update(zip(names, rows))
+        self._size = end
+        return rows
+
+    @classmethod
+    def from_arrays(cls, arrays, names, image_urls, prod_urls, categories) -> '_ColumnStore':
+        """
+        Wrap existing column arrays, such as ones in shared memory, in a store without copying them.
+        The store is full and fixed: adding a product raises ValueError rather than moving its columns to new
+        private arrays, which would stop its writes from reaching the shared ones.
+
+        Args:
+            arrays (dict): One array per column of _NUMERIC and _CODES, all of the same length.
+            names (list): The product name of each row.
+            image_urls (list): The image URL of each row.
+            prod_urls (list): The product URL of each row.
+            categories (list): The category table the codes refer to, without duplicates.
+
+        Returns:
+            _ColumnStore: The store.
+        """
+        store = cls(capacity=0)
+        store._arrays = dict(arrays)
+        store.names, store.image_urls, store.prod_urls = list(names), list(image_urls), list(prod_urls)
+        for value in categories:
+            store.intern(value)
+        store.index = {name: row for row, name in enumerate(store.names)}
+        store._size = len(store.names)
+        store._capacity = max(store._size, 1)
+        store.fixed = True
+        return store
+
+    def purchase_price(self):
+        """
+        Get the purchase price of every row: the discount price if one is set, otherwise the base price.
+
+        Returns:
+            np.ndarray: The purchase prices.
+        """
+        return np.where(self.discPrice > 0, self.discPrice, self.price)
+
+    def extend_from(self, source, rows) -> range:
+        """
+        Copy rows of another column store into this one as new rows.
+
+        Args:
+            source (_ColumnStore): The store to copy from.
+            rows (list): The rows of source to copy.
+
+        Returns:
+            range: The new rows.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        return self.extend(
+            [source.names[row] for row in rows],
+            [source.categories[code] for code in source.category_codes[rows]],
+            [source.categories[code] for code in source.subcat_codes[rows]],
+            [source.image_urls[row] for row in rows],
+            [source.prod_urls[row] for row in rows],
+            source.rating[rows],
+            source.numRate[rows],
+            source.discPrice[rows],
+            source.price[rows],
+            source.stock[rows],
+        )
+
+    def view(self, row) -> myProduct:
+        """
+        Get a myProduct view of one row.
+        """
+        return _ProductView(self, row)
+
+    def __getitem__(self, name) -> _ColumnEntry:
+        return _ColumnEntry(self, self.index[name])
+
+    def add(self, name, product_info) -> None:
+        """
+        Add a new product that the inventory indexes itself, without bumping version.
+        """
+        self.append(product_info["product"], product_info["stock"])
+
+    def __setitem__(self, name, product_info) -> None:
+        self.version += 1
+        if name not in self.index:
+            self.append(product_info["product"], product_info["stock"])
+            return
+
+        # Replacing an existing product overwrites its row in place
+        row = self.index[name]
+        product = product_info["product"]
+        self._arrays["category_codes"][row] = self.intern(product.category)
+        self._arrays["subcat_codes"][row] = self.intern(product.subcat)
+        for column in ("rating", "numRate", "discPrice", "price"):
+            self._arrays[column][row] = getattr(product, column)
+        self.image_urls[row], self.prod_urls[row] = product.imageURL, product.prodURL
+        self._arrays["stock"][row] = product_info["stock"]
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+class _ProductDict(dict):
+    """
+    The name -> {"product", "stock"} dict of a regular inventory. version counts the products set, replaced or removed
+    through the dict interface, e.g. inv.products[name] = ..., which the inventory's indexes don't see; an index built
+    at one version is stale at any other. The inventory adds the products it indexes itself with add.
+    """
+
+    version = 0
+
+    def add(self, name, product_info) -> None:
+        """
+        Add a product that the inventory indexes itself, without bumping version.
+        """
+        dict.__setitem__(self, name, product_info)
+
+    def _changed(method):
+        @functools.wraps(method)
+        def changed(self, *args, **kwargs):
+            self.version += 1
+            return method(self, *args, **kwargs)
+
+        return changed
+
+    __setitem__ = _changed(dict.__setitem__)
+    __delitem__ = _changed(dict.__delitem__)
+    __ior__ = _changed(dict.__ior__)
+    pop = _changed(dict.pop)
+    popitem = _changed(dict.popitem)
+    clear = _changed(dict.clear)
+    update = _changed(dict.update)
+    setdefault = _changed(dict.setdefault)
+
+    del _changed
+
+
+def _load_inventory(path, columnar=False, default_stock=10, reorder_point=0) -> 'myInventory':
+    """
+    Load one CSV file into a new inventory. Used by myInventory.from_files in the worker processes.
+    """
+    return myInventory(inv_name=path, file_path=path, columnar=columnar, default_stock=default_stock, reorder_point=reorder_point)
+
+
+def _categorical(codes, table) -> 'pd.Categorical':
+    """
+    Make a Categorical from category codes and their string table without decoding the strings. Missing categories,
+    stored in the table as None, become missing values.
+    """
+    missing = np.flatnonzero(pd.isna(pd.Index(table, dtype=object)))
+    if len(missing):
+        remap = np.arange(len(table), dtype=np.int64)
+        remap[missing] = -1
+        kept = remap >= 0
+        remap[kept] = np.arange(int(kept.sum()))
+        codes = remap[codes]
+        table = [value for value, keep in zip(table, kept.tolist()) if keep]
+    return pd.Categorical.from_codes(codes, categories=pd.Index(table, dtype=object))
+
+
+def _fsync_path(path) -> None:
+    """
+    fsync a file, or a directory so a rename in it is durable. Directories can't be opened on some platforms,
+    in which case there is nothing to do.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _truncate_torn_tail(path) -> None:
+    """
+    Cut a log file back to the end of its last complete line, dropping a record torn by a crash during a write,
+    so records appended afterwards start on a line of their own.
+    """
+    try:
+        file = open(path, "r+b")
+    except FileNotFoundError:
+        return
+    with file:
+        end = position = file.seek(0, os.SEEK_END)
+        while position > 0:
+            start = max(0, position - 4096)
+            file.seek(start)
+            newline = file.read(position - start).rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            file.truncate(position)
+            file.flush()
+            os.fsync(file.fileno())
+
+
+class myMutationLog():
+    """
+    Append-only log of stock, price, rating and reorder point changes, so an inventory can be recovered after a crash from its last
+    snapshot plus the log. See myInventory.recover.
+
+    Each record is a JSON line with a product's new value rather than the change, so replaying a record twice is
+    harmless and replay only needs the last record of each product. Products added to the inventory are recorded with
+    all of their fields. Records are buffered by append() while the product's stock lock is held, which keeps them in
+    the order the changes happened, and written by commit().
+
+    Commits are grouped: while one thread writes and fsyncs, the others keep appending, and the next commit writes
+    all of their records with one write and one fsync. fsync chooses the durability:
+        "always": commit() returns once its records are on disk.
+        "interval": a background thread writes and fsyncs the buffer every interval seconds, and commit() returns at
+            once, so a crash loses at most the last interval.
+        "never": commit() hands the records to the OS without fsync, which survives the process crashing but not the
+            machine.
+    """
+
+    FSYNC_MODES = ("always", "interval", "never")
+
+    def __init__(self, path, fsync="always", interval=0.05, compact_bytes=64 * 1024 * 1024) -> None:
+        """
+        Args:
+            path (str): The log file. It is appended to if it exists, after dropping a torn record at its end.
+            fsync (str, optional): "always", "interval" or "never", as above. Defaults to "always".
+            interval (float, optional): Seconds between background flushes with fsync="interval". Defaults to 0.05.
+            compact_bytes (int, optional): Compact the log into a snapshot once it grows past this size, or None to
+                compact only when myInventory.checkpoint is called. Defaults to 64 MiB.
+
+        Raises:
+            ValueError: If fsync is not one of the modes above.
+        """
+        if fsync not in self.FSYNC_MODES:
+            raise ValueError(f"fsync must be one of {self.FSYNC_MODES}, not {fsync!r}.")
+        self.path = path
+        self.fsync = fsync
+        self.interval = interval
+        self.compact_bytes = compact_bytes
+
+        # Buffered record lines, and the sequence numbers of the last record appended and the last one written
+        self._buffer = []
+        self._appended = 0
+        self._written = 0
+        self._buffer_lock = threading.Lock()
+        # Held by the thread writing the buffer out, and while the log is compacted
+        self._write_lock = threading.Lock()
+        _truncate_torn_tail(path)
+        self._file = open(path, "ab")
+        # Bytes in the file, kept by _write so size() doesn't touch the file while compact() swaps it
+        self._size = self._file.tell()
+
+        self._closed = threading.Event()
+        self._flusher = None
+        if fsync == "interval":
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def append(self, record) -> int:
+        """
+        Buffer one record, e.g. ("s", name, stock), ("p", name, discPrice, price), ("r", name, rating, numRate),
+        ("o", name, reorder_point) with None for the inventory's reorder_point, or
+        ("a", name, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price, stock) for a new product.
+
+        Returns:
+            int: The record's sequence number, to pass to commit.
+        """
+        line = json.dumps(record, separators=(",", ":"))
+        with self._buffer_lock:
+            self._buffer.append(line)
+            self._appended += 1
+            return self._appended
+
+    def extend(self, records) -> int:
+        """
+        Buffer many records at once.
+
+        Returns:
+            int: The sequence number of the last one.
+        """
+        lines = [json.dumps(record, separators=(",", ":")) for record in records]
+        with self._buffer_lock:
+            self._buffer.extend(lines)
+            self._appended += len(lines)
+            return self._appended
+
+    def commit(self, sequence=None) -> None:
+        """
+        Make the records up to a sequence number (by default, everything appended so far) as durable as the fsync mode
+        promises. A commit whose records another thread already wrote returns without touching the file.
+        """
+        if self.fsync == "interval":
+            return
+        sequence = self._appended if sequence is None else sequence
+        if self._written >= sequence:
+            return
+        with self._write_lock:
+            if self._written < sequence:
+                self._write(self.fsync == "always")
+
+    def flush(self) -> None:
+        """
+        Write and fsync everything buffered, whatever the fsync mode.
+        """
+        with self._write_lock:
+            self._write(True)
+
+    def _write(self, sync) -> None:
+        # Called with _write_lock held
+        with self._buffer_lock:
+            lines, self._buffer = self._buffer, []
+            last = self._appended
+        if lines:
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            if sync:
+                os.fsync(self._file.fileno())
+        self._written = last
+
+    def _flush_periodically(self) -> None:
+        while not self._closed.wait(self.interval):
+            with self._write_lock:
+                self._write(True)
+
+    def size(self) -> int:
+        """
+        Get the size of the log file in bytes, not counting buffered records.
+        """
+        return self._size
+
+    def compact(self, inventory, snapshot_path) -> None:
+        """
+        Fold the log into a snapshot of the inventory and start an empty log.
+
+        The current log is renamed to path + ".1" and new records go to a fresh file, then the snapshot is written and
+        only after that the old log deleted. A crash at any point leaves a snapshot and logs that replay to the
+        current state, since every change after the rename is in the new log.
+
+        Args:
+            inventory (myInventory): The inventory this log records.
+            snapshot_path (str): Where to write the snapshot.
+        """
+        old_path = self.path + ".1"
+        with self._write_lock:
+            self._write(True)
+            self._file.close()
+            if os.path.exists(old_path):
+                # Left by a compaction that didn't finish: keep both, in order
+                _truncate_torn_tail(old_path)
+                with open(old_path, "ab") as old, open(self.path, "rb") as current:
+                    shutil.copyfileobj(current, old)
+                os.remove(self.path)
+            else:
+                os.replace(self.path, old_path)
+            self._file = open(self.path, "ab")
+            self._size = 0
+            _fsync_path(os.path.dirname(os.path.abspath(self.path)))
+
+        inventory.save_snapshot(snapshot_path)
+        _fsync_path(snapshot_path)
+        _fsync_path(os.path.dirname(os.path.abspath(snapshot_path)))
+        os.remove(old_path)
+
+    def close(self) -> None:
+        """
+        Write out everything buffered and close the file.
+        """
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._write_lock:
+            if not self._file.closed:
+                self._write(self.fsync != "never")
+                self._file.close()
+
+    @staticmethod
+    def read(path) -> tuple:
+        """
+        Read a log, including the ".1" file of an unfinished compaction, keeping the last record of each product.
+        A torn line at the end of a file, from a crash during a write, is skipped.
+
+        Args:
+            path (str): The log file.
+
+        Returns:
+            tuple: Dicts by product name of the latest stock, (discPrice, price) and (rating, numRate), of the fields
+                of the products added, as (category, subcat, imageURL, prodURL, rating, numRate, discPrice, price, stock),
+                and of the latest reorder point (None meaning the inventory's reorder_point).
+        """
+        stock, prices, ratings, products, reorder_points = {}, {}, {}, {}, {}
+        for file_path in (path + ".1", path):
+            if not os.path.exists(file_path):
+                continue
+            with open(file_path, "rb") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    kind, name = record[0], record[1]
+                    if kind == "s":
+                        stock[name] = record[2]
+                    elif kind == "p":
+                        # Logs written before base prices were recorded have only the discount price
+                        prices[name] = (record[2], record[3] if len(record) > 3 else None)
+                    elif kind == "r":
+                        ratings[name] = (record[2], record[3])
+                    elif kind == "a":
+                        products[name] = tuple(record[2:])
+                    elif kind == "o":
+                        reorder_points[name] = record[2]
+        return stock, prices, ratings, products, reorder_points
+
+
+class myQuery():
+    """
+    Filters for myInventory.query, all of which a product must pass. Build one by chaining, e.g.
+
+        myQuery().category("Car Electronics").price(100, 500).rating(4).in_stock()
+
+    Every method returns a new query, so queries can be kept and reused, and a & b requires the filters of both.
+    Ranges include their ends, and a missing end is unbounded. Queries are hashable, which the result cache relies on.
+    """
+
+    # The fields that can be filtered on by range, and that results can be ordered by
+    FIELDS = ("price", "purchase_price", "rating", "numRate", "stock")
+
+    def __init__(self) -> None:
+        # "category" and "subcat" values, and (low, high) ranges by field
+        self.equals = {}
+        self.ranges = {}
+        # Set when two filters on the same field contradict each other, so nothing can match
+        self.empty = False
+
+    def _with(self, equals=(), ranges=(), empty=False) -> 'myQuery':
+        query = myQuery()
+        query.equals, query.ranges, query.empty = dict(self.equals), dict(self.ranges), self.empty or empty
+        for field, value in dict(equals).items():
+            if query.equals.get(field, value) != value:
+                query.empty = True
+            query.equals[field] = value
+        for field, (low, high) in dict(ranges).items():
+            old_low, old_high = query.ranges.get(field, (-math.inf, math.inf))
+            query.ranges[field] = (max(old_low, low), min(old_high, high))
+        return query
+
+    def _range(self, field, low, high) -> 'myQuery':
+        return self._with(ranges={field: (-math.inf if low is None else low, math.inf if high is None else high)})
+
+    def category(self, category) -> 'myQuery':
+        """
+        Only products in this category.
+        """
+        return self._with(equals={"category": category})
+
+    def subcat(self, subcat) -> 'myQuery':
+        """
+        Only products in this subcategory.
+        """
+        return self._with(equals={"subcat": subcat})
+
+    def price(self, low=None, high=None) -> 'myQuery':
+        """
+        Only products with a base price in [low, high].
+        """
+        return self._range("price", low, high)
+
+    def purchase_price(self, low=None, high=None) -> 'myQuery':
+        """
+        Only products with a purchase price (the discount price if set, see myProduct.get_purchase_price) in [low, high].
+        """
+        return self._range("purchase_price", low, high)
+
+    def rating(self, low=None, high=None) -> 'myQuery':
+        """
+        Only products with a rating in [low, high].
+        """
+        return self._range("rating", low, high)
+
+    def numRate(self, low=None, high=None) -> 'myQuery':
+        """
+        Only products with a number of ratings in [low, high].
+        """
+        return self._range("numRate", low, high)
+
+    def stock(self, low=None, high=None) -> 'myQuery':
+        """
+        Only products with stock in [low, high].
+        """
+        return self._range("stock", low, high)
+
+    def in_stock(self) -> 'myQuery':
+        """
+        Only products with at least one in stock.
+        """
+        return self.stock(1)
+
+    def __and__(self, other) -> 'myQuery':
+        return self._with(other.equals, other.ranges, other.empty)
+
+    def uses(self, *fields) -> bool:
+        """
+        Check whether the query filters on any of the given fields.
+        """
+        return any(field in self.ranges or field in self.equals for field in fields)
+
+    @staticmethod
+    def value(product, field):
+        """
+        Get the value of a range field of a product; stock isn't a product field and is handled by the caller.
+        """
+        return product.get_purchase_price() if field == "purchase_price" else getattr(product, field)
+
+    def matches(self, product, stock) -> bool:
+        """
+        Check whether a product with the given stock passes every filter.
+        """
+        if self.empty:
+            return False
+        for field, value in self.equals.items():
+            if getattr(product, field) != value:
+                return False
+        for field, (low, high) in self.ranges.items():
+            value = stock if field == "stock" else self.value(product, field)
+            if not low <= value <= high:
+                return False
+        return True
+
+    def _key(self) -> tuple:
+        return (self.empty, tuple(sorted(self.equals.items())), tuple(sorted(self.ranges.items())))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, myQuery) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def __repr__(self) -> str:
+        filters = [f"{field}={value!r}" for field, value in self.equals.items()]
+        filters += [f"{low} <= {field} <= {high}" for field, (low, high) in self.ranges.items()]
+        return f"myQuery({', '.join(filters)}{', empty' if self.empty else ''})"
+
+
+class myInventory():
+
+    # Results kept by the query cache
+    _QUERY_CACHE_SIZE = 256
+
+    # A columnar query starts from an index only if it narrows the candidates to at most 1 in this many products;
+    # otherwise a vectorized mask over all rows is cheaper than gathering the candidate rows
+    _QUERY_INDEX_RATIO = 8
+
+    def __init__(self, inv_name="My Inventory", file_path=None, columnar=False, default_stock=10, reorder_point=0) -> None:
+        # Think about the best data structure to use to store the product objects. 
+        # Consider how it will typically be accessed and what operations will be performed on it.
+        # As long as you meet what the the other methods expect, you can use any data structure, but some may be easier or quicker. 
+        """
+        Initialize the inventory with a name and optionally load products from a CSV file.
+
+        Args:
+            inv_name (str): The name of the inventory.
+            file_path (str): Optional file path to load products from a CSV file.
+            columnar (bool, optional): Store products in NumPy columns instead of myProduct objects. Defaults to False.
+                This uses much less memory per product and makes category and price scans vectorized;
+                getProduct then returns a view that reads and writes the columns.
+            default_stock (int, optional): The stock of products read from CSV files. Defaults to 10.
+            reorder_point (int, optional): The reorder point of products without their own, see lowStock. Defaults to 0.
+        """
+        # Initialize the inventory name
+        self.inv_name = inv_name
+        self.columnar = columnar
+        self.default_stock = default_stock
+        self.reorder_point = reorder_point
+
+        # Map product names to {"product": myProduct, "stock": int}, or to rows of a column store
+        self.products = _ColumnStore() if columnar else _ProductDict()
+
+        # Each index below is kept current as this inventory changes its products, and stamped with products.version
+        # when built: a product set or replaced through self.products directly changes the version and makes it stale.
+
+        # Sorted base price and purchase price indexes for getPrices, built on first use
+        self._price_index = None
+        self._purchase_index = None
+        self._price_stamp = None
+
+        # Names by (category, None), (None, subcat) and (category, subcat) for getCategory, built on first use
+        self._category_index = None
+        self._category_stamp = None
+
+        # Rating aggregates per category, and None for the whole inventory, built on first use:
+        # _rating_index holds (by rating, by weighted rating) _SortedIndex pairs,
+        # _rating_stats holds [products, rating sum, rating * numRate sum, numRate sum]
+        self._rating_index = None
+        self._rating_stats = None
+        self._rating_stamp = None
+
+        # Word index over product names for searchProducts, built on first use
+        self._name_index = None
+        self._name_stamp = None
+
+        # Reorder points set with setReorderPoint, by product name
+        self._reorder_points = {}
+        # Products at or below their reorder point, by shortfall (reorder point - stock), for lowStock, built on first use.
+        # _low_stock_keys holds each indexed product's shortfall, so it can be found in the index again.
+        self._low_stock_index = None
+        self._low_stock_keys = None
+        self._low_stock_stamp = None
+        self._low_stock_lock = threading.Lock()
+
+        # Held for reading while prices are read across products, and for writing by reprice,
+        # so a bulk repricing is seen all at once or not at all. It also guards the rating indexes: readers hold it
+        # for reading, and rating changes and inserts take it for writing
+        self._price_lock = _ReadWriteLock()
+        # Counts reprice calls starting and finishing, so it is odd while one runs; purchases read prices without the
+        # lock and take it only if this changed meanwhile, see _purchase_prices
+        self._reprices = 0
+
+        # LRU cache of query results: (query, order_by, limit) -> (token, product names), see query()
+        self._query_cache = OrderedDict()
+        self._query_lock = threading.Lock()
+
+        # The myMutationLog changes are recorded to, and where it is compacted to, see attach_log
+        self._log = None
+        self._snapshot_path = None
+        self._compact_lock = threading.Lock()
+        
+        if file_path:
+            self.read_file(file_path)
+        
+
+    @_instrumented
+    def read_file(self, path, vectorized=True, chunksize=None, progress=None) -> int:
+        """
+        Read in a CSV file and populate the inventory with the products in the file. Each product should have a stock of 10, unless otherwise specified.
+        (The stock is the inventory's default_stock, 10 unless given to the constructor.)
+        Note that the CSV file will have the following columns: name, main_category, sub_category, image, link, ratings, no_of_ratings, discount_price, actual_price.
+        Duplicate names should not be allowed in the inventory, if a duplicate attempts to be added, the function should ignore it.
+        Also, the ratings and no_of_ratings should be converted to floats and integers respectively.
+        Additionally, the discount_price and actual_price should be converted to floats, and any non-numeric characters should be removed.
+        
+        By default the numeric columns are cleaned with vectorized pandas string operations, which is much faster on large files.
+        Pass vectorized=False to use the original row-by-row loop; both paths produce the same products.
+
+        For files too large to hold in memory as one DataFrame, pass chunksize to stream the file: each chunk is parsed,
+        validated and inserted before the next one is read, and the first row with a given name still wins.
+
+        Args:
+            path (str): The path to the CSV file.
+            vectorized (bool, optional): Use the columnar ingestion path. Defaults to True.
+            chunksize (int, optional): Read the file this many rows at a time. Defaults to None, reading it all at once.
+            progress (callable, optional): Called after each chunk as progress(rows_read, products_in_inventory).
+        
+        Returns:
+            int: The number of products in the inventory.
+        """
+        read = self._read_columns if vectorized else self._read_rows
+
+        if chunksize is None:
+            data = pd.read_csv(path)
+            read(data)
+            if progress:
+                progress(len(data), len(self.products))
+            return len(self.products)
+
+        rows_read = 0
+        with pd.read_csv(path, chunksize=chunksize) as chunks:
+            for chunk in chunks:
+                read(chunk)
+                rows_read += len(chunk)
+                logger.debug(f"Read {rows_read} rows from {path}, {len(self.products)} products in inventory.")
+                if progress:
+                    progress(rows_read, len(self.products))
+
+        return len(self.products)
+
+    def _read_rows(self, data) -> int:
+        """
+        Row-by-row ingestion of a CSV DataFrame. This is the original read_file loop.
+
+        Args:
+            data (pd.DataFrame): The raw CSV data.
+
+        Returns:
+            int: The number of products in the inventory.
+        """
+        failures = {}
+        added = []
+        for _, row in data.iterrows():
+            try:
+                # Handle discount_price
+                column = 'discount_price'
+                if isinstance(row['discount_price'], str):
+                    discount_price = ''.join(c for c in row['discount_price'] if c.isdigit() or c == '.')
+                    discount_price = float(discount_price) if discount_price else 0.0  # Default to 0.0 if empty or invalid
+                else:
+                    discount_price = float(row['discount_price']) if not pd.isna(row['discount_price']) else 0.0
+
+                # Handle actual_price
+                column = 'actual_price'
+                if isinstance(row['actual_price'], str):
+                    actual_price = ''.join(c for c in row['actual_price'] if c.isdigit() or c == '.')
+                    actual_price = float(actual_price) if actual_price else 0.0  # Default to 0.0 if empty or invalid
+                else:
+                    actual_price = float(row['actual_price']) if not pd.isna(row['actual_price']) else 0.0
 
                 # Handle no_of_ratings
+                column = 'no_of_ratings'
                 if isinstance(row['no_of_ratings'], str):
                     no_of_ratings_str = ''.join(c for c in row['no_of_ratings'] if c.isdigit())
                     no_of_ratings = int(no_of_ratings_str) if no_of_ratings_str else 0  # Default to 0 if empty or invalid
                 elif isinstance(row['no_of_ratings'], float) and math.isnan(row['no_of_ratings']):
                     no_of_ratings = 0
                 else:
-                    no_of_ratings = int(row['no_of_ratings'])
+                    no_of_ratings = int(row['no_of_ratings'])
+
+                # Handle ratings
+                column = 'ratings'
+                if isinstance(row['ratings'], str):
+                    rating = ''.join(c for c in row['ratings'] if c.isdigit() or c == '.')
+                    rating = float(rating) if rating else 0.0  # Default to 0.0 if empty or invalid
+                elif isinstance(row['ratings'], float) and math.isnan(row['ratings']):
+                    rating = 0.0  # Default to 0.0 if NaN
+                else:
+                    rating = float(row['ratings'])
+
+                # Create the product object
+                column = 'row'
+                product = myProduct(
+                    name=row['name'],
+                    category=row['main_category'],
+                    subcat=row['sub_category'],
+                    imageURL=row['image'],
+                    prodURL=row['link'],
+                    rating=rating,
+                    numRate=no_of_ratings,
+                    discPrice=discount_price,
+                    price=actual_price
+                )
+
+                # Add product to the inventory
+                if product.name not in self.products:
+                    self.products.add(product.name, {"product": product, "stock": self.default_stock})
+                    added.append(product.name)
+                else:
+                    continue
+
+            except (ValueError, TypeError):
+                # Counted per column and reported once below, rather than logged for every row
+                failures[column] = failures.get(column, 0) + 1
+                continue
+
+        # Indexed and logged once for the whole file, as _read_columns does
+        self._index_products(added)
+        _report_parse_failures(failures)
+        return len(self.products)
+
+    def _read_columns(self, data) -> int:
+        """
+        Columnar ingestion of a CSV DataFrame. The numeric columns are cleaned in bulk and duplicate names are dropped
+        with one pandas call, so the only per-row Python work left is building the myProduct objects.
+
+        Rows whose cleaned numeric text still can't be parsed (e.g. "4.4.1") are skipped, the same as the row loop does.
+
+        Args:
+            data (pd.DataFrame): The raw CSV data.
+
+        Returns:
+            int: The number of products in the inventory.
+        """
+        discount_price, bad_discount = _clean_numeric(data['discount_price'])
+        actual_price, bad_actual = _clean_numeric(data['actual_price'])
+        no_of_ratings, bad_count = _clean_numeric(data['no_of_ratings'], decimal=False)
+        rating, bad_rating = _clean_numeric(data['ratings'])
+
+        keep = ~(bad_discount | bad_actual | bad_count | bad_rating)
+        if not keep.all():
+            # Like the row loop, count each bad row once, under the first column (in parsing order) that failed
+            failures, earlier = {}, False
+            for column, bad in (('discount_price', bad_discount), ('actual_price', bad_actual),
+                                ('no_of_ratings', bad_count), ('ratings', bad_rating)):
+                failures[column] = int((bad & ~earlier).sum())
+                earlier = earlier | bad
+            _report_parse_failures(failures)
+
+        # A row that fails to parse is skipped before de-duplication, so a later row with the same name can still be added
+        names = data['name'][keep]
+        known = np.fromiter((name in self.products for name in names), dtype=bool, count=len(names))
+        first = ~names.duplicated(keep='first') & ~known
+        rows = names.index[first]
+
+        if self.columnar:
+            self.products.extend(
+                names[rows].tolist(),
+                data['main_category'][rows].tolist(),
+                data['sub_category'][rows].tolist(),
+                data['image'][rows].tolist(),
+                data['link'][rows].tolist(),
+                rating[rows].to_numpy(),
+                no_of_ratings[rows].to_numpy(),
+                discount_price[rows].to_numpy(),
+                actual_price[rows].to_numpy(),
+                self.default_stock,
+            )
+            self._index_products(names[rows].tolist())
+            return len(self.products)
+
+        columns = zip(
+            names[rows].tolist(),
+            data['main_category'][rows].tolist(),
+            data['sub_category'][rows].tolist(),
+            data['image'][rows].tolist(),
+            data['link'][rows].tolist(),
+            rating[rows].tolist(),
+            no_of_ratings[rows].tolist(),
+            discount_price[rows].tolist(),
+            actual_price[rows].tolist(),
+        )
+        for name, category, subcat, imageURL, prodURL, rate, numRate, discPrice, price in columns:
+            self.products.add(name, {
+                "product": myProduct.from_validated(name, category, subcat, imageURL, prodURL, rate, numRate, discPrice, price),
+                "stock": self.default_stock,
+            })
+        self._index_products(names[rows].tolist())
+
+        return len(self.products)
+
+
+
+
+
+    
+    def __len__(self) -> int:
+        """
+        Get the number of products in the inventory.
+        """
+        return len(self.products)
+
+    def _holds(self, product) -> bool:
+        """
+        Check that a product whose price or rating changed is one of this inventory's, rather than a product of
+        another inventory or one that has since been replaced.
+        """
+        if self.columnar:
+            return isinstance(product, _ProductView) and product._store is self.products
+        product_info = self.products.get(product.name)
+        return product_info is not None and product_info["product"] is product
+
+    def getProduct(self, product_name) -> myProduct:
+        """
+        Get a product from the inventory.
+
+        Args:
+            product (str): The name of the product.
+
+        Returns:
+            myProduct: The product object.
+        """
+        return self.products.get(product_name, {}).get("product", None)
+        
+
+    def searchProducts(self, query, limit=10, fuzzy=False) -> list:
+        """
+        Search product names by words, for when the full (often truncated) name isn't known.
+
+        Every word of the query must match a word of the name, either exactly or as its prefix, so "blue car adap"
+        finds "ZQWINT Bluetooth Car Adapter, ...". With fuzzy=True, query words also match similar-looking words
+        (ranked below exact and prefix matches), which catches typos. The search uses a word index that is built on the first search
+        and kept current as products are added.
+
+        Args:
+            query (str): The words to search for.
+            limit (int, optional): The most products to return. Defaults to 10.
+            fuzzy (bool, optional): Also match misspelled words. Defaults to False.
+
+        Returns:
+            list: The matching myProduct objects, best match first.
+        """
+        if self._name_index is None or self._name_stamp != self.products.version:
+            self._name_index = _NameIndex()
+            self._name_stamp = self.products.version
+            for name in self.products:
+                self._name_index.add(name)
+        return [self.products[name]["product"] for name in self._name_index.search(query, limit, fuzzy)]
+
+    def adjust_stock(self, product, stock) -> None:
+        """
+        Adjusts the stock of a product to a new value.
+
+        Args:
+            product (str): The name of the product.
+            stock (int): The new stock value.
+        """
+        if product in self.products:
+            log = self._log
+            with _stock_lock(product):
+                self.products[product]["stock"] = stock
+                if log is not None:
+                    log.append(("s", product, int(stock)))
+            if self._low_stock_index is not None:
+                self._track_stock([product])
+            _stock_changed()
+            if log is not None:
+                self._commit_log()
+
+    def setReorderPoint(self, product_name, reorder_point) -> None:
+        """
+        Set the stock level at or below which a product needs restocking, see lowStock.
+
+        Args:
+            product_name (str): The name of the product.
+            reorder_point (int): The reorder point, or None to go back to the inventory's reorder_point.
+        """
+        if reorder_point is None:
+            self._reorder_points.pop(product_name, None)
+        else:
+            self._reorder_points[product_name] = reorder_point
+        if product_name in self.products and self._low_stock_index is not None:
+            self._track_stock([product_name])
+        if self._log is not None:
+            self._log.append(("o", product_name, None if reorder_point is None else int(reorder_point)))
+            self._commit_log()
+
+    def getReorderPoint(self, product_name) -> int:
+        """
+        Get the reorder point of a product: its own if one was set, otherwise the inventory's reorder_point.
+        """
+        return self._reorder_points.get(product_name, self.reorder_point)
+
+    def lowStock(self, count=None) -> list:
+        """
+        Get the products whose stock is at or below their reorder point, most urgent (furthest below) first.
+
+        The products come from an index kept current by adjust_stock, the purchase methods and restock, so this costs
+        time proportional to count rather than to the inventory size. The index is built on the first call.
+
+        Args:
+            count (int, optional): The most products to return. Defaults to None, meaning all of them.
+
+        Returns:
+            list: (product name, stock, reorder point) tuples.
+        """
+        with self._low_stock_lock:
+            if self._low_stock_index is None or self._low_stock_stamp != self.products.version:
+                self._build_low_stock()
+            index = self._low_stock_index
+            names = index.top(len(index) if count is None else count)
+            keys = self._low_stock_keys
+            return [(name, self.getReorderPoint(name) - keys[name], self.getReorderPoint(name)) for name in names]
+
+    def _build_low_stock(self) -> None:
+        """
+        Build the low-stock index from scratch. Called with _low_stock_lock held.
+        """
+        if self.columnar:
+            store = self.products
+            points = np.full(len(store), self.reorder_point, dtype=np.int64)
+            overrides = [(store.index[name], point) for name, point in self._reorder_points.items() if name in store.index]
+            if overrides:
+                rows, values = zip(*overrides)
+                points[list(rows)] = values
+            shortfall = points - store.stock
+            rows = np.flatnonzero(shortfall >= 0)
+            order = rows[np.argsort(shortfall[rows], kind="stable")]
+            keys = shortfall[order].tolist()
+            names = [store.names[row] for row in order.tolist()]
+            self._low_stock_index = _SortedIndex(keys, names)
+            self._low_stock_keys = dict(zip(names, keys))
+        else:
+            self._low_stock_index = _SortedIndex()
+            self._low_stock_keys = {}
+            for name, product_info in self.products.items():
+                shortfall = self._reorder_points.get(name, self.reorder_point) - product_info["stock"]
+                if shortfall >= 0:
+                    self._low_stock_index.add(shortfall, name)
+                    self._low_stock_keys[name] = shortfall
+        self._low_stock_stamp = self.products.version
+
+    def _track_stock(self, names) -> None:
+        """
+        Move products into, within or out of the low-stock index after their stock changed. Called once per operation
+        after its stock locks are released; the current stock is read under the low-stock lock, so whichever call for
+        a product runs last leaves its entry matching its latest stock.
+
+        Args:
+            names (list): The product names.
+        """
+        with self._low_stock_lock:
+            index, keys = self._low_stock_index, self._low_stock_keys
+            if index is None:
+                return
+            if self.columnar:
+                store = self.products
+                stocks = store.stock[[store.index[name] for name in names]].tolist()
+            else:
+                stocks = [self.products[name]["stock"] for name in names]
+            for name, stock in zip(names, stocks):
+                old = keys.pop(name, None)
+                if old is not None:
+                    index.discard(old, name)
+                shortfall = self._reorder_points.get(name, self.reorder_point) - stock
+                if shortfall >= 0:
+                    index.add(shortfall, name)
+                    keys[name] = shortfall
+
+    def restock(self, restock) -> dict:
+        """
+        Add stock to many products at once, e.g. from a delivery file.
+
+        Quantities are summed per product with one vectorized pass, then all stock is updated in one step under the
+        stock locks of the products involved. Records with a quantity that isn't a whole number are skipped and logged
+        once, and so are products not in the inventory.
+
+        Args:
+            restock (pd.DataFrame, str or tuple): A DataFrame with columns product_name, quantity and optionally
+                reorder_point (setting each product's reorder point, as setReorderPoint), the path of a CSV file with
+                those columns, or a (product_names, quantities) or (product_names, quantities, reorder_points) tuple.
+
+        Returns:
+            dict: The new stock of each product restocked, by name.
+        """
+        if isinstance(restock, str):
+            restock = pd.read_csv(restock)
+        elif isinstance(restock, tuple):
+            restock = pd.DataFrame(dict(zip(("product_name", "quantity", "reorder_point"), restock)))
+        if len(restock) == 0:
+            return {}
+
+        quantities = pd.to_numeric(restock["quantity"], errors="coerce").to_numpy(dtype=np.float64)
+        valid = np.isfinite(quantities) & (quantities == np.trunc(quantities))
+        if not valid.all():
+            logger.error(f"{int((~valid).sum())} restock records had an invalid quantity and were skipped.")
+        codes, names = pd.factorize(restock["product_name"][valid])
+        totals = np.bincount(codes, weights=quantities[valid], minlength=len(names)).astype(np.int64)
+
+        known = np.array([name in self.products for name in names], dtype=bool)
+        if not known.all():
+            logger.error(f"{int((~known).sum())} products in the restock are not in the inventory and were skipped.")
+        if "reorder_point" in restock:
+            # The last reorder point given for each product
+            points = pd.to_numeric(restock["reorder_point"], errors="coerce")[valid].groupby(codes).last().dropna()
+            for code, point in zip(points.index.tolist(), points.astype(np.int64).tolist()):
+                if known[code]:
+                    self._reorder_points[names[code]] = point
+                    if self._log is not None:
+                        self._log.append(("o", names[code], point))
+        names, totals = names[known].tolist(), totals[known]
+        if not names:
+            if self._log is not None:
+                self._commit_log()
+            return {}
+
+        locks = sorted({id(lock): lock for lock in map(_stock_lock, names)}.items())
+        for _, lock in locks:
+            lock.acquire()
+        try:
+            if self.columnar:
+                store = self.products
+                rows = np.array([store.index[name] for name in names], dtype=np.int64)
+                store.stock[rows] += totals
+                new_stock = store.stock[rows].tolist()
+            else:
+                infos = [self.products[name] for name in names]
+                new_stock = [info["stock"] + total for info, total in zip(infos, totals.tolist())]
+                for info, stock in zip(infos, new_stock):
+                    info["stock"] = stock
+            _stock_changed()
+            if self._log is not None:
+                self._log.extend(zip(repeat("s"), names, new_stock))
+        finally:
+            for _, lock in reversed(locks):
+                lock.release()
+        if self._low_stock_index is not None:
+            self._track_stock(names)
+        if self._log is not None:
+            self._commit_log()
+        return dict(zip(names, new_stock))
+
+    @_instrumented
+    def getCategory(self, category=None, subcat=None) -> list:
+        """
+        Get a subset of the inventory based on a category.
+
+        The lookup uses a category index, so it costs time proportional to the number of products returned.
+
+        Args:
+            category (str, optional): The category to filter by. Defaults to None.
+            subcat (str, optional): The subcategory to filter by. Defaults to None.
+
+        Returns:
+            list: A list of myProduct objects.
+        """
+        return list(self.iterCategory(category, subcat))
+
+    def iterCategory(self, category=None, subcat=None):
+        """
+        Lazy version of getCategory, for paging through large categories without building the whole list.
+
+        Args:
+            category (str, optional): The category to filter by. Defaults to None.
+            subcat (str, optional): The subcategory to filter by. Defaults to None.
+
+        Yields:
+            myProduct: The products in the category, in the order they were added. A product whose category was set
+                since comes after the products already in its new category.
+        """
+        if category or subcat:
+            names = self._category_indexes().get((category or None, subcat or None), ())
+        else:
+            names = self.products
+        for name in names:
+            yield self.products[name]["product"]
+
+    def _category_indexes(self) -> dict:
+        """
+        Get the category index, building it if this is the first category query
+        or if products were added to self.products directly.
+
+        Returns:
+            dict: Lists of product names keyed by (category, None), (None, subcat) and (category, subcat).
+        """
+        if self._category_index is None or self._category_stamp != self.products.version:
+            _watch(self)
+            self._category_index = {}
+            self._category_stamp = self.products.version
+            self._index_categories(self.products.keys())
+        return self._category_index
+
+    def _on_category_change(self, product, old_category, old_subcat) -> None:
+        """
+        Move a product within the category index and the rating totals after its category or subcategory changed.
+        Called by myProduct. The product goes to the end of its new category's list.
+
+        Args:
+            product (myProduct): The product whose category changed.
+            old_category (str): The category before the change.
+            old_subcat (str): The subcategory before the change.
+        """
+        if not self._holds(product):
+            return
+        name, category, subcat = product.name, product.category, product.subcat
+        with self._price_lock.write():
+            # An index built before products were set through self.products is rebuilt on its next use instead
+            if self._category_index is not None and self._category_stamp == self.products.version:
+                index = self._category_index
+                for old, new in zip(((old_category, None), (None, old_subcat), (old_category, old_subcat)),
+                                    ((category, None), (None, subcat), (category, subcat))):
+                    if old != new:
+                        index[old].remove(name)
+                        if not index[old]:
+                            del index[old]
+                        index.setdefault(new, []).append(name)
+            if self._rating_index is not None and self._rating_stamp == self.products.version and category != old_category:
+                self._add_rating_entry(name, old_category, product.rating, product.numRate, -1)
+                self._add_rating_entry(name, category, product.rating, product.numRate, 1)
+
+    def _index_categories(self, names) -> None:
+        """
+        Add newly inserted products to the category index. Does nothing until the index has been built.
+
+        Args:
+            names (iterable): The names of the new products.
+        """
+        if self._category_index is None:
+            return
+        index = self._category_index
+        if self.columnar:
+            store = self.products
+            rows = [store.index[name] for name in names]
+            categories = [store.categories[code] for code in store.category_codes[rows].tolist()]
+            subcats = [store.categories[code] for code in store.subcat_codes[rows].tolist()]
+        else:
+            products = [self.products[name]["product"] for name in names]
+            categories = [product.category for product in products]
+            subcats = [product.subcat for product in products]
+        for name, category, subcat in zip(names, categories, subcats):
+            for key in ((category, None), (None, subcat), (category, subcat)):
+                index.setdefault(key, []).append(name)
+
+    @_instrumented
+    def getPrices(self, min_price, max_price, purchase_price=False) -> list:
+        """
+        Get a subset of the inventory based on a price range.
+
+        The lookup uses a sorted price index, so it costs O(log n + k) rather than a scan of the inventory.
+        The index is kept current as products are added and as set_discount_percent / set_disc_price change prices.
+
+        Args:
+            max_price (float): The maximum price.
+            min_price (float): The minimum price.
+            purchase_price (bool, optional): Filter on get_purchase_price() instead of the base price. Defaults to False.
+
+        Returns:
+            list: A list of myProduct objects, in ascending price order.
+        """
+        with self._price_lock.read():
+            price_index, purchase_index = self._price_indexes()
+            index = purchase_index if purchase_price else price_index
+            return [self.products[name]["product"] for name in index.range(min_price, max_price)]
+
+    def reprice(self, percent=None, price=None, category=None, subcat=None, min_price=None, max_price=None) -> int:
+        """
+        Set the discount price of every product matching a selector, either as a percentage off the base price
+        (truncated to the cent, the same as set_discount_percent) or to a fixed price (as set_disc_price).
+
+        The new prices are computed first and then written in place together while holding the price lock for writing,
+        so getPrices and do_purchase see either all of the old prices or all of the new ones. The purchase price
+        index is updated in one pass. Dict-backed inventories can share product objects, so a dict-backed inventory
+        also locks the other dict-backed inventories watching for price changes and updates their indexes in the same step.
+
+        Args:
+            percent (float, optional): The percentage discount to apply.
+            price (float, optional): The discount price to set. Exactly one of percent and price must be given.
+            category (str, optional): Only reprice this category.
+            subcat (str, optional): Only reprice this subcategory.
+            min_price (float, optional): Only reprice products with a base price of at least this.
+            max_price (float, optional): Only reprice products with a base price of at most this.
+
+        Returns:
+            int: The number of products repriced.
+
+        Raises:
+            ValueError: If neither or both of percent and price are given, or price is negative.
+        """
+        if (percent is None) == (price is None):
+            raise ValueError("Give exactly one of percent and price.")
+        if price is not None and float(price) < 0:
+            raise ValueError("Discount price cannot be negative.")
+
+        others = [] if self.columnar else [
+            inventory for inventory in (ref() for ref in _watchers)
+            if inventory is not None and inventory is not self and not inventory.columnar
+        ]
+        with ExitStack() as locked:
+            # Locked in a fixed order, so two inventories repricing shared products at once can't deadlock
+            for inventory in sorted([self] + others, key=id):
+                locked.enter_context(inventory._price_lock.write())
+            repricing = [self] + others
+
+            def finished():
+                for inventory in repricing:
+                    inventory._reprices += 1
+
+            # Runs before the locks are released
+            locked.callback(finished)
+            for inventory in repricing:
+                inventory._reprices += 1
+
+            names = self._select_names(category, subcat, min_price, max_price)
+            if not names:
+                return 0
+
+            if self.columnar:
+                store = self.products
+                rows = np.array([store.index[name] for name in names], dtype=np.int64)
+                base, old_discount = store.price[rows], store.discPrice[rows]
+            else:
+                products = [self.products[name]["product"] for name in names]
+                base = np.array([product.price for product in products], dtype=np.float64)
+                old_discount = np.array([product.discPrice for product in products], dtype=np.float64)
+
+            if percent is not None:
+                new_prices = np.trunc(base * (1 - percent / 100) * 100) / 100.0
+            else:
+                new_prices = np.full(len(names), float(price))
+            old_purchase = np.where(old_discount > 0, old_discount, base)
+
+            if self.columnar:
+                # Written in place, so arrays aliasing the column (shared memory, exported views) see the new prices
+                store.discPrice[rows] = new_prices
+            else:
+                for product, new_price in zip(products, new_prices.tolist()):
+                    product._write_disc_price(new_price)
+            _prices_changed()
+
+            if self._purchase_index is not None:
+                new_purchase = np.where(new_prices > 0, new_prices, base)
+                self._purchase_index.discard_names(set(names))
+                for name, key in zip(names, new_purchase.tolist()):
+                    self._purchase_index.add(key, name)
+            if self._log is not None:
+                self._log.extend(zip(repeat("p"), names, new_prices.tolist(), base.tolist()))
+
+            # Other inventories holding the same products update their own indexes
+            for inventory in others:
+                for product, base_price, old in zip(products, base.tolist(), old_purchase.tolist()):
+                    inventory._on_price_change(product, base_price, old, commit=False)
+
+        for inventory in [self] + others:
+            if inventory._log is not None:
+                inventory._commit_log()
+        return len(names)
+
+    def _select_names(self, category=None, subcat=None, min_price=None, max_price=None) -> list:
+        """
+        Get the names of the products matching a category and base price selector, using the indexes.
+        """
+        if category or subcat:
+            names = list(self._category_indexes().get((category or None, subcat or None), ()))
+        else:
+            names = None
+        if min_price is None and max_price is None:
+            return list(self.products) if names is None else names
+
+        low = -math.inf if min_price is None else min_price
+        high = math.inf if max_price is None else max_price
+        in_range = self._price_indexes()[0].range(low, high)
+        if names is None:
+            return in_range
+        in_range = set(in_range)
+        return [name for name in names if name in in_range]
+
+    def _price_indexes(self) -> tuple:
+        """
+        Get the base price and purchase price indexes, building them if this is the first price query
+        or if products were added to self.products directly.
+
+        Returns:
+            tuple: The (base price, purchase price) _SortedIndex objects.
+        """
+        if self._price_index is not None and self._price_stamp == self.products.version:
+            return self._price_index, self._purchase_index
+
+        _watch(self)
+        self._price_stamp = self.products.version
+        if self.columnar:
+            names = self.products.names
+            price, purchase = self.products.price, self.products.purchase_price()
+            indexes = []
+            for keys in (price, purchase):
+                order = np.argsort(keys, kind="stable")
+                indexes.append(_SortedIndex(keys[order].tolist(), [names[row] for row in order]))
+            self._price_index, self._purchase_index = indexes
+        else:
+            self._price_index, self._purchase_index = _SortedIndex(), _SortedIndex()
+            self._index_prices(self.products.keys())
+        return self._price_index, self._purchase_index
+
+    def _index_products(self, names) -> None:
+        """
+        Add newly inserted products to the price and category indexes, and to the mutation log if one is attached.
+        Indexes that haven't been built yet are skipped.
+
+        Args:
+            names (list): The names of the new products.
+        """
+        if self._log is not None and names:
+            self._log_inserts(names)
+        self._index_categories(names)
+        if self._price_index is not None:
+            self._index_prices(names)
+        if self._rating_index is not None:
+            with self._price_lock.write():
+                self._index_ratings(names)
+        if self._name_index is not None:
+            for name in names:
+                self._name_index.add(name)
+        if self._low_stock_index is not None:
+            self._track_stock(names)
+
+    def _log_inserts(self, names) -> None:
+        """
+        Record newly inserted products in the mutation log with all of their fields, so recover can add them back.
+        """
+        records = []
+        for name in names:
+            product_info = self.products[name]
+            product = product_info["product"]
+            records.append(("a", name, product.category, product.subcat, product.imageURL, product.prodURL,
+                            float(product.rating), int(product.numRate), float(product.discPrice), float(product.price),
+                            int(product_info["stock"])))
+        self._log.extend(records)
+        self._commit_log()
+
+    def _index_prices(self, names) -> None:
+        """
+        Add products to the price indexes.
+
+        Args:
+            names (iterable): The names of the products.
+        """
+        for name in names:
+            product = self.products[name]["product"]
+            self._price_index.add(product.price, name)
+            self._purchase_index.add(product.get_purchase_price(), name)
+
+    def _on_price_change(self, product, old_price, old_purchase, commit=True) -> None:
+        """
+        Move a product within the price indexes after its price changed. Called by myProduct.
+
+        Args:
+            product (myProduct): The product whose price changed.
+            old_price (float): The base price before the change.
+            old_purchase (float): The purchase price before the change.
+            commit (bool, optional): Commit the mutation log record. Defaults to True; batches commit once at the end.
+        """
+        if not self._holds(product):
+            return
+        with self._price_lock.write():
+            if self._log is not None:
+                self._log.append(("p", product.name, float(product.discPrice), float(product.price)))
+            if self._price_index is not None:
+                for index, old, new in ((self._price_index, old_price, product.price),
+                                        (self._purchase_index, old_purchase, product.get_purchase_price())):
+                    if new != old:
+                        index.discard(old, product.name)
+                        index.add(new, product.name)
+        if commit and self._log is not None:
+            self._commit_log()
+
+    def query(self, query, order_by=None, limit=None) -> list:
+        """
+        Get the products that pass every filter of a myQuery, e.g.
+        inventory.query(myQuery().category("Car Electronics").price(100, 500).rating(4).in_stock(), order_by="-rating").
+
+        A planner starts from the smallest candidate set it can get cheaply: the category index, or a range of the price,
+        purchase price or rating index (whose size takes two bisects to find). A columnar inventory uses an index only if
+        it is selective, and otherwise filters all rows with a vectorized mask. The remaining filters are applied to the
+        candidates only. Results are kept in an LRU cache. An entry is used only while no product was set through
+        self.products directly and no price, rating or stock that its query filters or sorts on has changed since.
+
+        Args:
+            query (myQuery): The filters.
+            order_by (str, optional): Sort by "price", "purchase_price", "rating", "numRate" or "stock", or by one of
+                them descending with a leading "-", e.g. "-rating". Defaults to None, in which case the order is unspecified.
+            limit (int, optional): Return at most this many products. Defaults to None, meaning all of them.
+
+        Returns:
+            list: The matching myProduct objects.
+
+        Raises:
+            ValueError: If order_by is not one of the fields above.
+        """
+        field = order_by.lstrip("-") if order_by else None
+        if field is not None and field not in myQuery.FIELDS:
+            raise ValueError(f"Can't order query results by {order_by!r}.")
+
+        with self._price_lock.read():
+            key = (query, order_by, limit)
+            # Taken before running the query, so a change made while it runs leaves the entry stale rather than wrong
+            depends = {field, *query.ranges, *query.equals}
+            token = (
+                len(self.products),
+                self.products.version,
+                _stock_version if "stock" in depends else None,
+                _price_version if depends & {"price", "purchase_price"} else None,
+                _rating_version if depends & {"rating", "numRate"} else None,
+                _category_version if depends & {"category", "subcat"} else None,
+            )
+            with self._query_lock:
+                cached = self._query_cache.get(key)
+                if cached is not None and cached[0] == token:
+                    self._query_cache.move_to_end(key)
+            if cached is not None and cached[0] == token:
+                names = cached[1]
+            else:
+                names = self._run_query(query)
+                if field is not None:
+                    values = self._query_values(names, field)
+                    order = np.argsort(-values if order_by.startswith("-") else values, kind="stable")
+                    names = [names[position] for position in order.tolist()]
+                names = tuple(names[:limit])
+                with self._query_lock:
+                    self._query_cache[key] = (token, names)
+                    self._query_cache.move_to_end(key)
+                    if len(self._query_cache) > self._QUERY_CACHE_SIZE:
+                        self._query_cache.popitem(last=False)
+            return [self.products[name]["product"] for name in names]
+
+    def _run_query(self, query) -> list:
+        """
+        Plan and run a query without the cache.
+
+        Returns:
+            list: The names of the matching products.
+        """
+        if query.empty:
+            return []
+        category, subcat = query.equals.get("category"), query.equals.get("subcat")
+        low_high = query.ranges
+
+        # Candidate sets as (size, function returning the names). A columnar inventory only uses indexes already built,
+        # since building one costs more than a vectorized scan.
+        plans = []
+        if (category is not None or subcat is not None) and (not self.columnar or self._category_index is not None):
+            in_category = self._category_indexes().get((category, subcat), ())
+            plans.append((len(in_category), lambda: in_category))
+        if query.uses("price", "purchase_price") and (not self.columnar or self._price_index is not None):
+            for field, index in zip(("price", "purchase_price"), self._price_indexes()):
+                if field in low_high:
+                    plans.append((index.count(*low_high[field]), functools.partial(index.range, *low_high[field])))
+        if "rating" in low_high and (not self.columnar or self._rating_index is not None):
+            # The per-category rating index covers the category filter as well
+            indexes = self._rating_indexes().get(category if subcat is None else None)
+            if indexes is None:
+                return []
+            plans.append((indexes[0].count(*low_high["rating"]), functools.partial(indexes[0].range, *low_high["rating"])))
+
+        size, names = min(plans, key=lambda plan: plan[0]) if plans else (len(self.products), None)
+        if not self.columnar:
+            names = self.products if names is None else names()
+            products = self.products
+            return [name for name in names if query.matches(products[name]["product"], products[name]["stock"])]
+
+        store = self.products
+        if names is not None and size * self._QUERY_INDEX_RATIO <= len(store):
+            rows = np.array([store.index[name] for name in names()], dtype=np.int64)
+        else:
+            rows = np.arange(len(store))
+        keep = np.ones(len(rows), dtype=bool)
+        for field, column in (("category", "category_codes"), ("subcat", "subcat_codes")):
+            if field in query.equals:
+                code = store.code_of(query.equals[field])
+                if code is None:
+                    return []
+                keep &= getattr(store, column)[rows] == code
+        for field, (low, high) in low_high.items():
+            values = self._query_values(rows, field)
+            keep &= (values >= low) & (values <= high)
+        return [store.names[row] for row in rows[keep].tolist()]
+
+    def _query_values(self, names, field):
+        """
+        Get one range field (see myQuery.FIELDS) of many products as an array.
+
+        Args:
+            names (list or np.ndarray): Product names, or for a columnar inventory, an array of rows.
+            field (str): The field.
+
+        Returns:
+            np.ndarray: The values, in the same order.
+        """
+        if self.columnar:
+            store = self.products
+            rows = names if isinstance(names, np.ndarray) else np.array([store.index[name] for name in names], dtype=np.int64)
+            if field == "purchase_price":
+                discount, price = store.discPrice[rows], store.price[rows]
+                return np.where(discount > 0, discount, price)
+            return getattr(store, field)[rows]
+        infos = [self.products[name] for name in names]
+        if field == "stock":
+            return np.array([info["stock"] for info in infos], dtype=np.int64)
+        return np.array([myQuery.value(info["product"], field) for info in infos], dtype=np.float64)
+
+    def topRated(self, count=10, category=None, weighted=False) -> list:
+        """
+        Get the best-rated products, from a rating index that is kept current as reviews are added,
+        so this costs time proportional to count rather than to the inventory size.
+
+        Args:
+            count (int, optional): How many products to return. Defaults to 10.
+            category (str, optional): Only rank products in this category. Defaults to None, meaning all products.
+            weighted (bool, optional): Rank by a Bayesian average that discounts products with few ratings. Defaults to False.
+
+        Returns:
+            list: Up to count myProduct objects, best first.
+        """
+        with self._price_lock.read():
+            indexes = self._rating_indexes().get(category)
+            if indexes is None:
+                return []
+            names = (indexes[1] if weighted else indexes[0]).top(count)
+        return [self.products[name]["product"] for name in names]
+
+    def averageRating(self, category=None, weighted=False) -> float:
+        """
+        Get the average rating of a category from running totals, without scanning its products.
+
+        Args:
+            category (str, optional): The category. Defaults to None, meaning all products.
+            weighted (bool, optional): Weight each product's rating by its number of ratings, giving the mean over all
+                individual ratings. Defaults to False, the plain mean over products.
+
+        Returns:
+            float: The average rating, or None if there are no products (or, when weighted, no ratings) to average.
+        """
+        with self._price_lock.read():
+            self._rating_indexes()
+            stats = list(self._rating_stats.get(category) or ())
+        if not stats or not stats[0]:
+            return None
+        if weighted:
+            return stats[2] / stats[3] if stats[3] else None
+        return stats[1] / stats[0]
+
+    def _rating_indexes(self) -> dict:
+        """
+        Get the rating indexes, building them if this is the first rating query
+        or if products were added to self.products directly. Call it holding _price_lock for reading.
+
+        Returns:
+            dict: (by rating, by weighted rating) _SortedIndex pairs, keyed by category and by None for all products.
+        """
+        if self._rating_index is None or self._rating_stamp != self.products.version:
+            _watch(self)
+            # Built aside and published whole, since other readers may build or read them at the same time
+            index, stats = {}, {}
+            for name, category, rating, numRate in self._rating_fields(list(self.products.keys())):
+                self._add_rating_entry(name, category, rating, numRate, 1, index, stats)
+            self._rating_stats, self._rating_stamp = stats, self.products.version
+            self._rating_index = index
+        return self._rating_index
+
+    def _rating_fields(self, names) -> list:
+        """
+        Get (name, category, rating, numRate) for each of the named products.
+        """
+        if self.columnar:
+            store = self.products
+            rows = [store.index[name] for name in names]
+            categories = [store.categories[code] for code in store.category_codes[rows].tolist()]
+            return list(zip(names, categories, store.rating[rows].tolist(), store.numRate[rows].tolist()))
+        fields = []
+        for name in names:
+            product = self.products[name]["product"]
+            fields.append((name, product.category, product.rating, product.numRate))
+        return fields
+
+    def _index_ratings(self, names) -> None:
+        """
+        Add products to the rating indexes and category totals.
+
+        Args:
+            names (iterable): The names of the products.
+        """
+        for name, category, rating, numRate in self._rating_fields(list(names)):
+            self._add_rating_entry(name, category, rating, numRate, 1)
+
+    def _add_rating_entry(self, name, category, rating, numRate, sign, rating_index=None, rating_stats=None) -> None:
+        """
+        Add (sign=1) or remove (sign=-1) one product's rating in the indexes and totals of its category and of the whole
+        inventory, or in rating_index and rating_stats while they are being built.
+        """
+        rating_index = self._rating_index if rating_index is None else rating_index
+        rating_stats = self._rating_stats if rating_stats is None else rating_stats
+        weighted = _weighted_rating(rating, numRate)
+        for key in dict.fromkeys((None, category)):
+            indexes = rating_index.get(key)
+            if indexes is None:
+                indexes = rating_index[key] = (_SortedIndex(), _SortedIndex())
+                rating_stats[key] = [0, 0.0, 0.0, 0]
+            if sign > 0:
+                indexes[0].add(rating, name)
+                indexes[1].add(weighted, name)
+            else:
+                indexes[0].discard(rating, name)
+                indexes[1].discard(weighted, name)
+            stats = rating_stats[key]
+            stats[0] += sign
+            stats[1] += sign * rating
+            stats[2] += sign * rating * numRate
+            stats[3] += sign * numRate
+
+    def _on_rating_change(self, product, old_rating, old_numRate, commit=True) -> None:
+        """
+        Update the rating indexes and category totals after a product got new ratings. Called by myProduct.
+
+        Args:
+            product (myProduct): The product whose rating changed.
+            old_rating (float): The rating before the change.
+            old_numRate (int): The number of ratings before the change.
+            commit (bool, optional): Commit the mutation log record. Defaults to True; batches commit once at the end.
+        """
+        if not self._holds(product):
+            return
+        if self._log is not None:
+            self._log.append(("r", product.name, float(product.rating), int(product.numRate)))
+            if commit:
+                self._commit_log()
+        # Under the write lock, so topRated, averageRating and query never read the indexes halfway through a change
+        with self._price_lock.write():
+            if self._rating_index is None:
+                return
+            self._add_rating_entry(product.name, product.category, old_rating, old_numRate, -1)
+            self._add_rating_entry(product.name, product.category, product.rating, product.numRate, 1)
+
+    def itemRating(self, product_name) -> float:
+        """
+        Get the rating of a product.
+
+        Args:
+            product_name (str): The name of the product.
+
+        Returns:
+            float: The rating of the product.
+        """
+        product = self.getProduct(product_name)
+        if product:
+            return product.get_rating()
+        return None
+    
+    @_instrumented
+    def do_purchase(self, product_quantity_tuple_list, atomic=False) -> float:
+        """
+        Perform a purchase of multiple products.
+
+        If the quantity of a product is not available, the purchase should get as many as possible, and the total price should be calculated based on the available quantity.
+
+        Stock is read and decremented under a per-product lock, so concurrent purchases from several threads never
+        oversell a product. With atomic=True the whole order is all-or-nothing: unless every product exists and has
+        enough stock for its full quantity, nothing is bought. The order is priced as of one moment, before or after
+        any concurrent reprice, without taking the price lock unless a reprice actually ran, see _purchase_prices.
+
+        Args:
+            product_quantity_tuple_list (list): A list of tuples, where each tuple contains a myProduct item name and an integer representing the quantity purchased.
+            atomic (bool, optional): Commit the order all-or-nothing. Defaults to False.
+
+        Returns:
+            float: The total price of all the purchased products, calculated using the get_purchase_price function.
+            items_purchased (list): A list of tuples, where each tuple contains the name of the product, the quantity purchased, and the total price for that product.
+        """
+        if atomic:
+            return self._do_purchase_atomic(product_quantity_tuple_list)
+        return self._do_purchase_lines(product_quantity_tuple_list)
+
+    def _purchase_prices(self, products) -> list:
+        """
+        Get the purchase price of each product of an order as of one moment, so an order never mixes prices from before
+        and after a reprice. The prices are read without the price lock, and read again under it only if a reprice ran
+        meanwhile, so purchases don't all queue on the lock while no prices change.
+        """
+        started = self._reprices
+        if not started % 2:
+            prices = [product.get_purchase_price() for product in products]
+            if self._reprices == started:
+                return prices
+        with self._price_lock.read():
+            return [product.get_purchase_price() for product in products]
+
+    def _do_purchase_lines(self, product_quantity_tuple_list) -> tuple:
+        """
+        The line-by-line body of do_purchase, filling as much of each line as there is stock for.
+        """
+        total_price = 0
+        items_purchased = []
+        log = self._log
+
+        lines = []
+        for product_name, quantity in product_quantity_tuple_list:
+            product_info = self.products.get(product_name)
+            if product_info:
+                with _stock_lock(product_name):
+                    stock = product_info["stock"]
+                    purchased_quantity = min(quantity, stock)
+                    product_info["stock"] = stock - purchased_quantity
+                    if log is not None:
+                        log.append(("s", product_name, int(stock - purchased_quantity)))
+                lines.append((product_name, purchased_quantity, product_info["product"]))
+
+        prices = self._purchase_prices([product for _, _, product in lines])
+        for (product_name, purchased_quantity, _), price in zip(lines, prices):
+            price_for_product = purchased_quantity * price
+            total_price += price_for_product
+            items_purchased.append((product_name, purchased_quantity, price_for_product))
+
+        if items_purchased:
+            _stock_changed()
+            if self._low_stock_index is not None:
+                self._track_stock(list(dict.fromkeys(name for name, _, _ in items_purchased)))
+            if log is not None:
+                self._commit_log()
+        return total_price, items_purchased
+
+    def prefetch_images(self, category=None, subcat=None, cache=None) -> int:
+        """
+        Download the images of a category (or of the whole inventory) into the image cache ahead of time.
+
+        Args:
+            category (str, optional): The category to prefetch. Defaults to None, meaning every product.
+            subcat (str, optional): The subcategory to prefetch. Defaults to None.
+            cache (myImageCache, optional): The cache to fill. Defaults to the shared one from get_image_cache().
+
+        Returns:
+            int: The number of distinct images of the category now in the cache, see myImageCache.prefetch.
+        """
+        urls = [product.imageURL for product in self.iterCategory(category, subcat)]
+        return (cache or get_image_cache()).prefetch(urls)
+
+    def do_purchase_batch(self, orders) -> list:
+        """
+        Perform many purchases at once, with the same results as calling do_purchase on each order in turn.
+
+        Product names are resolved once per batch, and the stock each line gets is worked out with vectorized cumulative
+        sums per product in arrival order, so earlier orders are filled first. All stock is updated in one step under the
+        stock locks of the products involved. Quantities are assumed to be non-negative.
+
+        Args:
+            orders (list or pd.DataFrame): Either a list of orders, each a list of (name, quantity) tuples as passed to
+                do_purchase, or a DataFrame with one row per order line and columns order_id, name and quantity, in arrival order.
+
+        Returns:
+            list: One (total_price, items_purchased) tuple per order, as returned by do_purchase. For a DataFrame the
+                orders are in order of first appearance of their order_id.
+
+        Raises:
+            ValueError: If a DataFrame row has no order_id.
+        """
+        if isinstance(orders, pd.DataFrame):
+            order_codes, order_labels = pd.factorize(orders["order_id"])
+            missing = int((order_codes < 0).sum())
+            if missing:
+                raise ValueError(f"{missing} order lines have no order_id.")
+            names = orders["name"].tolist()
+            quantities = orders["quantity"].to_numpy(dtype=np.int64)
+            order_count = len(order_labels)
+        else:
+            order_codes = np.repeat(np.arange(len(orders)), [len(order) for order in orders])
+            names = [name for order in orders for name, _ in order]
+            quantities = np.array([quantity for order in orders for _, quantity in order], dtype=np.int64)
+            order_count = len(orders)
+
+        if not names:
+            return [(0, []) for _ in range(order_count)]
+
+        # Resolve each distinct name once
+        # A missing name gets a code of its own and is then dropped with the other unknown products
+        product_codes, unique_names = pd.factorize(pd.Series(names, dtype=object), use_na_sentinel=False)
+        if self.columnar:
+            store = self.products
+            rows = np.array([store.index.get(name, -1) for name in unique_names], dtype=np.int64)
+            known_products = rows >= 0
+            rows = rows[known_products]
+        else:
+            infos = [self.products.get(name) for name in unique_names]
+            known_products = np.array([info is not None for info in infos], dtype=bool)
+            infos = [info for info in infos if info is not None]
+
+        # Renumber the lines so known products are 0..k-1 and drop lines for unknown products
+        known = known_products[product_codes]
+        product_codes = (np.cumsum(known_products) - 1)[product_codes[known]]
+        order_codes, quantities = order_codes[known], quantities[known]
+        names = [name for name, is_known in zip(names, known.tolist()) if is_known]
+        product_count = int(known_products.sum())
+
+        locks = sorted({id(lock): lock for lock in map(_stock_lock, unique_names[known_products])}.items())
+        # Prices are read under the price lock so a concurrent reprice is seen all at once or not at all
+        with self._price_lock.read():
+            for _, lock in locks:
+                lock.acquire()
+            try:
+                if self.columnar:
+                    stock = store.stock[rows]
+                    prices = store.purchase_price()[rows]
+                else:
+                    stock = np.array([info["stock"] for info in infos], dtype=np.int64)
+                    prices = np.array([info["product"].get_purchase_price() for info in infos], dtype=np.float64)
+
+                # Each line gets what is left after the earlier lines for the same product, up to its quantity
+                ordered_before = pd.Series(quantities).groupby(product_codes).cumsum().to_numpy() - quantities
+                purchased = np.clip(stock[product_codes] - ordered_before, 0, quantities)
+                consumed = np.bincount(product_codes, weights=purchased, minlength=product_count).astype(np.int64)
+
+                if self.columnar:
+                    store.stock[rows] = stock - consumed
+                else:
+                    for info, new_stock in zip(infos, (stock - consumed).tolist()):
+                        info["stock"] = new_stock
+                _stock_changed()
+                if self._log is not None:
+                    self._log.extend(zip(repeat("s"), unique_names[known_products].tolist(), (stock - consumed).tolist()))
+            finally:
+                for _, lock in reversed(locks):
+                    lock.release()
+            if self._low_stock_index is not None:
+                self._track_stock(unique_names[known_products].tolist())
+        if self._log is not None:
+            self._commit_log()
+
+        line_prices = purchased * prices[product_codes]
+        totals = np.bincount(order_codes, weights=line_prices, minlength=order_count).tolist()
+
+        # Group the lines by order, keeping arrival order within each order, and slice out each order's items
+        by_order = np.argsort(order_codes, kind="stable")
+        items = list(zip([names[line] for line in by_order.tolist()], purchased[by_order].tolist(), line_prices[by_order].tolist()))
+        ends = np.cumsum(np.bincount(order_codes, minlength=order_count)).tolist()
+        starts = [0] + ends[:-1]
+        return [(total, items[start:end]) for total, start, end in zip(totals, starts, ends)]
+
+    def _do_purchase_atomic(self, product_quantity_tuple_list) -> tuple:
+        """
+        All-or-nothing version of do_purchase. The locks of every product in the order are taken in a fixed order,
+        so two orders over the same products can't deadlock, and the stock is checked for the whole order before
+        any of it is decremented.
+
+        Returns:
+            float: The total price, 0 if the order was rejected.
+            items_purchased (list): The (name, quantity, price) tuples, empty if the order was rejected.
+        """
+        order = list(product_quantity_tuple_list)
+        needed = {}
+        for product_name, quantity in order:
+            if product_name not in self.products:
+                logger.info(f"Order rejected: {product_name} is not in the inventory.")
+                return 0, []
+            needed[product_name] = needed.get(product_name, 0) + quantity
+
+        locks = sorted({id(lock): lock for lock in map(_stock_lock, needed)}.items())
+        for _, lock in locks:
+            lock.acquire()
+        try:
+            for product_name, quantity in needed.items():
+                if self.products[product_name]["stock"] < quantity:
+                    logger.info(f"Order rejected: not enough stock of {product_name}.")
+                    return 0, []
+
+            products = []
+            for product_name, quantity in order:
+                product_info = self.products[product_name]
+                product_info["stock"] = product_info["stock"] - quantity
+                if self._log is not None:
+                    self._log.append(("s", product_name, int(product_info["stock"])))
+                products.append(product_info["product"])
+            _stock_changed()
+        finally:
+            for _, lock in reversed(locks):
+                lock.release()
+            if self._log is not None:
+                self._commit_log()
+        if self._low_stock_index is not None:
+            self._track_stock(list(needed))
+
+        # Priced after the stock locks are released, since waiting for the price lock while holding them could deadlock
+        # with a batch that holds the price lock and waits for a stock lock
+        total_price = 0
+        items_purchased = []
+        for (product_name, quantity), price in zip(order, self._purchase_prices(products)):
+            price_for_product = quantity * price
+            total_price += price_for_product
+            items_purchased.append((product_name, quantity, price_for_product))
+        return total_price, items_purchased
+    
+    def addReviews(self, product_name, rating, numberRate=1) -> float:
+        """
+        Add a review to a product.
+
+        Args:
+            product_name (str): The name of the product.
+            rating (float): The rating to add.
+            numberRate (int, optional): The number of ratings the rating is based on. Defaults to 1.
+
+        Returns:
+            float: The new rating of the product.
+        """
+        product = self.getProduct(product_name)
+        if product:
+            return product.add_rating(rating, numberRate)
+        return None
+
+    def addReviewsBatch(self, reviews) -> dict:
+        """
+        Add many reviews at once. The result matches calling addReviews on each record in order, up to float rounding.
+
+        The records are grouped by product and each product's new weighted mean is computed in one vectorized step,
+        since applying means one after another gives (rating * numRate + sum of rating_i * count_i) / (numRate + sum of count_i).
+        Counts are truncated to whole numbers, as int() does in add_rating. Records with a non-numeric rating or count,
+        or with a count given as text that int() can't read such as "3.7", are skipped and logged once, the same
+        records add_rating rejects, and so are products not in the inventory.
+
+        Args:
+            reviews (pd.DataFrame, str or tuple): A DataFrame with columns product_name, rating and optionally numberRate
+                (defaulting to 1), the path of a CSV file with those columns, or a (product_names, ratings, numberRates)
+                tuple of sequences or arrays.
+
+        Returns:
+            dict: The new rating of each product that was updated, by name.
+        """
+        if isinstance(reviews, str):
+            reviews = pd.read_csv(reviews)
+        elif isinstance(reviews, tuple):
+            reviews = pd.DataFrame(dict(zip(("product_name", "rating", "numberRate"), reviews)))
+        if len(reviews) == 0:
+            return {}
+
+        ratings = pd.to_numeric(reviews["rating"], errors="coerce").to_numpy(dtype=np.float64)
+        raw_counts = reviews["numberRate"] if "numberRate" in reviews else pd.Series(1, index=reviews.index)
+        counts = pd.to_numeric(raw_counts, errors="coerce").to_numpy(dtype=np.float64)
+        valid = ~np.isnan(ratings) & np.isfinite(counts)
+        if raw_counts.dtype == object:
+            # int() truncates 2.5 but can't read "2.5"
+            text = np.array([isinstance(count, str) for count in raw_counts], dtype=bool)
+            valid &= ~text | (counts == np.trunc(counts))
+        counts = np.trunc(counts)
+        if not valid.all():
+            logger.error(f"{int((~valid).sum())} review records had an invalid rating or numberRate and were skipped.")
+
+        # Group the records by product: sum of rating * count and sum of count per name
+        codes, names = pd.factorize(reviews["product_name"][valid])
+        counts = counts[valid].astype(np.int64)
+        rating_sums = np.bincount(codes, weights=ratings[valid] * counts, minlength=len(names))
+        count_sums = np.bincount(codes, weights=counts, minlength=len(names)).astype(np.int64)
+
+        if self.columnar:
+            store = self.products
+            rows = np.array([store.index.get(name, -1) for name in names], dtype=np.int64)
+            known = rows >= 0
+            rows, rating_sums, count_sums = rows[known], rating_sums[known], count_sums[known]
+            old_rating, old_numRate = store.rating[rows], store.numRate[rows]
+            totals = old_numRate + count_sums
+            update = totals != 0
+            rows, totals = rows[update], totals[update]
+            old_rating, old_numRate = old_rating[update], old_numRate[update]
+            store.rating[rows] = (old_rating * old_numRate + rating_sums[update]) / totals
+            store.numRate[rows] = totals
+            _ratings_changed()
+            # This inventory is among the watchers too if it has rating indexes or a log
+            if any(ref() is not None for ref in _watchers):
+                for row, rating, numRate in zip(rows.tolist(), old_rating.tolist(), old_numRate.tolist()):
+                    view = _ProductView(store, row)
+                    view._rating_changed(rating, numRate, skip=self)
+                    self._on_rating_change(view, rating, numRate, commit=False)
+                if self._log is not None:
+                    self._commit_log()
+            return dict(zip([store.names[row] for row in rows.tolist()], store.rating[rows].tolist()))
+
+        new_ratings = {}
+        for name, rating_sum, count_sum in zip(names, rating_sums.tolist(), count_sums.tolist()):
+            product = self.getProduct(name)
+            if product is None or product.numRate + count_sum == 0:
+                continue
+            old_rating, old_numRate = product.rating, product.numRate
+            numRate = old_numRate + count_sum
+            product._write_rating((old_rating * old_numRate + rating_sum) / numRate, numRate)
+            product._rating_changed(old_rating, old_numRate, skip=self)
+            self._on_rating_change(product, old_rating, old_numRate, commit=False)
+            new_ratings[name] = product.rating
+        if self._log is not None:
+            self._commit_log()
+        return new_ratings
+    
+    def __getstate__(self) -> dict:
+        # The price indexes rely on products calling back through weak references, which don't survive pickling,
+        # so an unpickled inventory rebuilds its indexes on first use
+        state = self.__dict__.copy()
+        state["_price_index"] = state["_purchase_index"] = None
+        state["_rating_index"] = state["_rating_stats"] = None
+        state["_price_lock"] = state["_query_lock"] = state["_compact_lock"] = state["_low_stock_lock"] = None
+        state["_low_stock_index"] = state["_low_stock_keys"] = None
+        state["_reprices"] = 0
+        state["_query_cache"] = OrderedDict()
+        # A copy doesn't write to the original's mutation log
+        state["_log"] = state["_snapshot_path"] = None
+        return state
+
+    def __setstate__(self, state) -> None:
+        self.__dict__.update(state)
+        self._price_lock = _ReadWriteLock()
+        self._query_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._low_stock_lock = threading.Lock()
+
+    def __eq__(self, other) -> bool:
+        """
+        Check if two inventories are equal. Equal inventories have the same products.
+
+        Args:
+            other (myInventory): The other inventory to compare to.
+        """
+        return set(self.products.keys()) == set(other.products.keys())
+    
+    def __str__(self) -> str:
+        """
+        String representation of the inventory.
+        """
+        return f"Inventory: {self.inv_name}, Number of Products: {len(self)}"
+    
+    def __len__(self) -> int:
+        """
+        Get the number of products in the inventory.
+
+        Returns:
+            int: The number of products in the inventory.
+        """
+        return len(self.products)
+    
+    def __add__(self, other) -> 'myInventory':
+        """
+        Combine two inventories into one. The combined inventory has this inventory's default_stock and reorder_point,
+        and every product keeps its reorder point, see _merge_from.
+
+        Args:
+            other (myInventory or myShardedInventory): The other inventory to combine with.
+
+        Returns:
+            myInventory: The combined inventory.
+        """
+        
+        if isinstance(other, myShardedInventory):
+            other = other._to_inventory()
+        combined_inventory = myInventory(inv_name=f"{self.inv_name} + {other.inv_name}", columnar=self.columnar,
+                                         default_stock=self.default_stock, reorder_point=self.reorder_point)
+        combined_inventory._merge_from(self)
+        combined_inventory._merge_from(other)
+        return combined_inventory
+
+    def __radd__(self, other) -> 'myInventory':
+        """
+        Support sum(inventories), which starts from 0.
+
+        0 + inventory returns a running total holding this inventory's products, see _InventorySum, which each later
+        step of sum() extends in place, so summing many inventories costs one pass over their products like merge.
+        The inventories summed are never changed.
+
+        Args:
+            other (int or myInventory): The left operand, 0 when called from sum().
+
+        Returns:
+            myInventory: The combined inventory.
+        """
+        if isinstance(other, myInventory):
+            return other + self
+        if other != 0:
+            return NotImplemented
+
+        total = _InventorySum(inv_name=self.inv_name, columnar=self.columnar, default_stock=self.default_stock,
+                              reorder_point=self.reorder_point)
+        total._merge_from(self)
+        return total
+
+    @classmethod
+    def merge(cls, inventories, inv_name="My Inventory", columnar=False) -> 'myInventory':
+        """
+        Combine any number of inventories into a new one in a single pass.
+
+        Duplicate names are resolved in order: the first inventory in the list that has a product wins, the same rule
+        read_file and __add__ use. The combined inventory takes the default_stock and reorder_point of the first
+        inventory, and every product keeps its reorder point, see _merge_from.
+
+        Args:
+            inventories (iterable): The inventories to combine, in priority order.
+            inv_name (str, optional): The name of the combined inventory.
+            columnar (bool, optional): Whether the combined inventory uses columnar storage. Defaults to False.
+
+        Returns:
+            myInventory: The combined inventory.
+        """
+        inventories = iter(inventories)
+        first = next(inventories, None)
+        if first is None:
+            return cls(inv_name=inv_name, columnar=columnar)
+        combined_inventory = cls(inv_name=inv_name, columnar=columnar, default_stock=first.default_stock,
+                                 reorder_point=first.reorder_point)
+        combined_inventory._merge_from(first)
+        for inventory in inventories:
+            combined_inventory._merge_from(inventory)
+        return combined_inventory
+
+    @classmethod
+    def from_files(cls, paths, inv_name="My Inventory", columnar=False, processes=None, default_stock=10, reorder_point=0) -> 'myInventory':
+        """
+        Load several CSV files in parallel, one per worker process, and merge them into one inventory.
+
+        Duplicate names are resolved in the order of paths: a product from an earlier file wins over one from a later
+        file, and within a file the first row wins. The result is the same whichever worker finishes first.
+
+        Args:
+            paths (list): The CSV files to load.
+            inv_name (str, optional): The name of the combined inventory.
+            columnar (bool, optional): Whether to use columnar storage. Defaults to False.
+            processes (int, optional): The number of worker processes. Defaults to one per CPU.
+                With processes=1 the files are loaded one after another in this process.
+            default_stock (int, optional): The stock of every product loaded. Defaults to 10.
+            reorder_point (int, optional): The inventory's reorder point, see lowStock. Defaults to 0.
+
+        Returns:
+            myInventory: The combined inventory.
+        """
+        paths = list(paths)
+        settings = (repeat(columnar), repeat(default_stock), repeat(reorder_point))
+        if not paths:
+            return cls(inv_name=inv_name, columnar=columnar, default_stock=default_stock, reorder_point=reorder_point)
+        if processes == 1 or len(paths) == 1:
+            inventories = map(_load_inventory, paths, *settings)
+            return cls.merge(inventories, inv_name=inv_name, columnar=columnar)
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            # map returns results in the order of paths, which fixes the duplicate-resolution order
+            inventories = executor.map(_load_inventory, paths, *settings)
+            return cls.merge(inventories, inv_name=inv_name, columnar=columnar)
+
+    def _merge_from(self, other) -> list:
+        """
+        Add every product of another inventory that this one doesn't have yet.
+
+        Products of a dict-based inventory are shared with other, as + has always done, and stock changes through
+        either inventory show in both; products of a columnar inventory, or added to one, are copied.
+
+        Reorder points come along: each product added keeps the reorder point it had in other, its own or other's
+        reorder_point, and so do other's own reorder points for products not in either inventory. A product already
+        here keeps this inventory's reorder point; if other gave it a different one, a warning is logged, as it is
+        when other has a different default_stock (which only affects products read from files later).
+
+        Args:
+            other (myInventory): The inventory to copy from.
+
+        Returns:
+            list: The names of the products that were added.
+        """
+        # An empty inventory can reuse the other inventory's category index rather than rebuilding it
+        reuse_index = (not self.products and other._category_index is not None
+                       and other._category_stamp == other.products.version)
+
+        if self.columnar and other.columnar:
+            source = other.products
+            rows = [row for row, name in enumerate(source.names) if name not in self.products]
+            self.products.extend_from(source, rows)
+            added = [source.names[row] for row in rows]
+        elif other.columnar:
+            # other's entries only view its arrays, so its rows are copied into products of their own
+            added = [name for name in other.products.names if name not in self.products]
+            arrays = other._column_arrays(added)
+            categories, subcats = ([table[code] for code in codes.tolist()] for codes, table in (arrays["category"], arrays["subcat"]))
+            columns = zip(
+                added, categories, subcats, arrays["imageURL"], arrays["prodURL"], arrays["rating"].tolist(),
+                arrays["numRate"].tolist(), arrays["discPrice"].tolist(), arrays["price"].tolist(), arrays["stock"].tolist(),
+            )
+            for name, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price, stock in columns:
+                self.products.add(name, {
+                    "product": myProduct.from_validated(name, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price),
+                    "stock": stock,
+                })
+        else:
+            added = []
+            for product_name, product_info in other.products.items():
+                if product_name not in self.products:
+                    self.products.add(product_name, product_info)
+                    added.append(product_name)
+
+        if other.default_stock != self.default_stock:
+            logger.warning(f"{other.inv_name} has a default_stock of {other.default_stock}; {self.inv_name} keeps {self.default_stock}.")
+        points = dict(other._reorder_points)
+        if other.reorder_point != self.reorder_point:
+            for name in added:
+                points.setdefault(name, other.reorder_point)
+        added_names = set(added)
+        conflicts = 0
+        for name, point in points.items():
+            if name in self._reorder_points or (name in self.products and name not in added_names):
+                conflicts += self.getReorderPoint(name) != point
+            else:
+                self._reorder_points[name] = point
+        if conflicts:
+            logger.warning(f"{conflicts} products have a different reorder point in {other.inv_name}; {self.inv_name} keeps its own.")
+
+        self._index_products(added)
+        if reuse_index:
+            self._category_index = {key: list(names) for key, names in other._category_index.items()}
+            self._category_stamp = self.products.version
+        return added
+
+    def _column_arrays(self, names=None) -> dict:
+        """
+        Get every product field as one column per field, in insertion order, whichever storage the inventory uses.
+
+        Args:
+            names (list, optional): Only get these products, in this order. Defaults to None, meaning all of them.
+
+        Returns:
+            dict: name, imageURL and prodURL as lists, category and subcat as (codes, table) pairs,
+                and rating, numRate, discPrice, price and stock as NumPy arrays.
+        """
+        if self.columnar:
+            store = self.products
+            table = list(store.categories)
+            if names is not None:
+                rows = np.array([store.index[name] for name in names], dtype=np.int64)
+                return {
+                    "name": list(names),
+                    "category": (store.category_codes[rows], table),
+                    "subcat": (store.subcat_codes[rows], table),
+                    "imageURL": [store.image_urls[row] for row in rows.tolist()],
+                    "prodURL": [store.prod_urls[row] for row in rows.tolist()],
+                    **{field: getattr(store, field)[rows] for field in ("rating", "numRate", "discPrice", "price", "stock")},
+                }
+            return {
+                "name": list(store.names),
+                "category": (store.category_codes.copy(), table),
+                "subcat": (store.subcat_codes.copy(), table),
+                "imageURL": list(store.image_urls),
+                "prodURL": list(store.prod_urls),
+                "rating": store.rating.copy(),
+                "numRate": store.numRate.copy(),
+                "discPrice": store.discPrice.copy(),
+                "price": store.price.copy(),
+                "stock": store.stock.copy(),
+            }
+
+        infos = list(self.products.values()) if names is None else [self.products[name] for name in names]
+        products = [info["product"] for info in infos]
+        columns = {"name": [product.name for product in products]}
+        for field in ("category", "subcat"):
+            codes, table = pd.factorize(pd.Series([getattr(product, field) for product in products], dtype=object), use_na_sentinel=False)
+            columns[field] = (codes.astype(np.int32), list(table))
+        columns["imageURL"] = [product.imageURL for product in products]
+        columns["prodURL"] = [product.prodURL for product in products]
+        for field, dtype in (("rating", np.float64), ("numRate", np.int64), ("discPrice", np.float64), ("price", np.float64)):
+            columns[field] = np.array([getattr(product, field) for product in products], dtype=dtype)
+        columns["stock"] = np.array([info["stock"] for info in infos], dtype=np.int64)
+        return columns
+
+    EXPORT_COLUMNS = ("name", "category", "subcat", "imageURL", "prodURL", "rating", "numRate", "discPrice", "price",
+                      "purchase_price", "stock")
+
+    def to_pandas(self, query=None, columns=None) -> 'pd.DataFrame':
+        """
+        Export the products as a DataFrame with one row per product, in insertion order, for reporting.
+
+        For a columnar inventory without a query, rating, numRate, discPrice, price and stock are read-only views of the
+        inventory's own arrays, so nothing is copied and those columns show later stock, rating and price changes
+        (reprice writes its new discount prices in place), until the inventory grows past its capacity and moves to new
+        arrays. Everything else is a point-in-time copy taken at export time: purchase_price, which is computed from
+        discPrice and price, and every column of an export with a query or of a dict-based inventory, which costs one
+        copy of the selected rows. Copy the frame for a snapshot that later changes can't reach. category and subcat
+        are Categoricals over the shared category table, and the string columns hold the products' own str objects.
+
+        Args:
+            query (myQuery, optional): Only export the products that pass it. Defaults to None, meaning all products.
+            columns (list, optional): The columns to export, from EXPORT_COLUMNS. Defaults to None, meaning all of them.
+                Leaving out the string columns saves most of the memory of a large export.
+
+        Returns:
+            pd.DataFrame: The products.
+
+        Raises:
+            ValueError: If a column is not one of EXPORT_COLUMNS.
+        """
+        columns = list(self.EXPORT_COLUMNS if columns is None else columns)
+        unknown = [column for column in columns if column not in self.EXPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Can't export unknown columns {unknown}.")
+
+        if self.columnar and query is None:
+            store = self.products
+            table = list(store.categories)
+            arrays = {
+                "name": store.names,
+                "category": (store.category_codes, table),
+                "subcat": (store.subcat_codes, table),
+                "imageURL": store.image_urls,
+                "prodURL": store.prod_urls,
+            }
+            for field in ("rating", "numRate", "discPrice", "price", "stock"):
+                view = getattr(store, field).view()
+                view.flags.writeable = False
+                arrays[field] = view
+        else:
+            with self._price_lock.read():
+                names = None
+                if query is not None:
+                    names = self._run_query(query)
+                    if self.columnar:
+                        names.sort(key=self.products.index.__getitem__)
+                    else:
+                        order = {name: position for position, name in enumerate(self.products)}
+                        names.sort(key=order.__getitem__)
+                arrays = self._column_arrays(names)
+
+        frame = {}
+        for column in columns:
+            if column == "purchase_price":
+                discount, price = arrays["discPrice"], arrays["price"]
+                frame[column] = np.where(discount > 0, discount, price)
+            elif column in ("category", "subcat"):
+                frame[column] = _categorical(*arrays[column])
+            elif column in ("name", "imageURL", "prodURL"):
+                frame[column] = pd.Series(arrays[column], dtype=object, copy=False)
+            else:
+                frame[column] = arrays[column]
+        return pd.DataFrame(frame, columns=columns, copy=False)
+
+    def to_arrow(self, query=None, columns=None) -> 'pa.Table':
+        """
+        Export the products as an Arrow table, see to_pandas. The numeric columns are handed to Arrow without another
+        copy and category and subcat become dictionary columns; only the string columns are copied into Arrow's format.
+        An unfiltered columnar export can therefore share the inventory's arrays, which later stock, rating and price
+        changes write in place; purchase_price and filtered or dict-based exports are point-in-time copies.
+
+        pyarrow is optional: it is imported on the first call.
+
+        Args:
+            query (myQuery, optional): Only export the products that pass it. Defaults to None, meaning all products.
+            columns (list, optional): The columns to export, from EXPORT_COLUMNS. Defaults to None, meaning all of them.
+
+        Returns:
+            pa.Table: The products.
+
+        Raises:
+            ImportError: If pyarrow is not installed.
+        """
+        return pa.Table.from_pandas(self.to_pandas(query, columns), preserve_index=False)
+
+    def save_snapshot(self, path) -> None:
+        """
+        Save the inventory's products, stock levels and ratings, its default_stock and reorder_point and the products'
+        own reorder points to a binary snapshot file, so it can be restored with load_snapshot without parsing the CSV again.
+
+        The snapshot is an uncompressed NumPy .npz archive: one array per numeric field, category codes with their string
+        table, and the remaining strings as UTF-8 blobs. It carries SNAPSHOT_VERSION so older files can be recognised.
+        The file is written to a temporary name first and then renamed, so a crash never leaves a half-written snapshot.
+
+        Args:
+            path (str): The file to write.
+        """
+        columns = self._column_arrays()
+        arrays = {"version": np.array([SNAPSHOT_VERSION], dtype=np.int64)}
+        arrays["inv_name"], _ = _pack_strings([str(self.inv_name)])
+        for field in ("name", "imageURL", "prodURL"):
+            arrays[field], arrays[f"{field}_missing"] = _pack_strings(columns[field])
+        for field in ("category", "subcat"):
+            codes, table = columns[field]
+            arrays[f"{field}_codes"] = codes
+            arrays[f"{field}_table"], arrays[f"{field}_table_missing"] = _pack_strings(table)
+        for field in ("rating", "numRate", "discPrice", "price", "stock"):
+            arrays[field] = columns[field]
+        arrays["settings"] = np.array([self.default_stock, self.reorder_point], dtype=np.int64)
+        reorder_points = dict(self._reorder_points)
+        arrays["reorder_names"], arrays["reorder_names_missing"] = _pack_strings(list(reorder_points))
+        arrays["reorder_points"] = np.array(list(reorder_points.values()), dtype=np.int64)
+
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as file:
+            np.savez(file, **arrays)
+            # On disk before the rename, or a crash could leave the new name pointing at an empty file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load_snapshot(cls, path, columnar=False) -> 'myInventory':
+        """
+        Restore an inventory saved with save_snapshot.
+
+        Args:
+            path (str): The snapshot file.
+            columnar (bool, optional): Whether the restored inventory uses columnar storage. Defaults to False.
+
+        Returns:
+            myInventory: The restored inventory.
+
+        Raises:
+            ValueError: If the file was written with an unsupported snapshot version.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["version"][0])
+            if version not in (1, SNAPSHOT_VERSION):
+                raise ValueError(f"Unsupported snapshot version {version} in {path}, expected {SNAPSHOT_VERSION}.")
+            arrays = {key: data[key] for key in data.files}
+
+        inv_name = _unpack_strings(arrays["inv_name"], np.zeros(1, dtype=bool))[0]
+        strings = {field: _unpack_strings(arrays[field], arrays[f"{field}_missing"]) for field in ("name", "imageURL", "prodURL")}
+        for field in ("category", "subcat"):
+            table = _unpack_strings(arrays[f"{field}_table"], arrays[f"{field}_table_missing"])
+            strings[field] = [table[code] for code in arrays[f"{field}_codes"].tolist()]
+
+        if version >= 2:
+            default_stock, reorder_point = arrays["settings"].tolist()
+            inventory = cls(inv_name=inv_name, columnar=columnar, default_stock=default_stock, reorder_point=reorder_point)
+            names = _unpack_strings(arrays["reorder_names"], arrays["reorder_names_missing"])
+            inventory._reorder_points = dict(zip(names, arrays["reorder_points"].tolist()))
+        else:
+            inventory = cls(inv_name=inv_name, columnar=columnar)
+        if columnar:
+            inventory.products.extend(
+                strings["name"], strings["category"], strings["subcat"], strings["imageURL"], strings["prodURL"],
+                arrays["rating"], arrays["numRate"], arrays["discPrice"], arrays["price"], arrays["stock"],
+            )
+            return inventory
+
+        columns = zip(
+            strings["name"], strings["category"], strings["subcat"], strings["imageURL"], strings["prodURL"],
+            arrays["rating"].tolist(), arrays["numRate"].tolist(), arrays["discPrice"].tolist(), arrays["price"].tolist(),
+            arrays["stock"].tolist(),
+        )
+        for name, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price, stock in columns:
+            inventory.products.add(name, {
+                "product": myProduct.from_validated(name, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price),
+                "stock": stock,
+            })
+        return inventory
+
+    def attach_log(self, log, snapshot_path) -> None:
+        """
+        Record every stock, price and rating change of this inventory in a mutation log, compacted into snapshot_path.
+        Use recover to open a logged inventory at startup; this only starts logging from the current state.
+
+        Args:
+            log (myMutationLog): The log.
+            snapshot_path (str): Where checkpoint writes the snapshot the log is compacted into.
+        """
+        # Watch for price and rating changes made through myProduct, so they reach the log
+        _watch(self)
+        self._snapshot_path = snapshot_path
+        self._log = log
+
+    def checkpoint(self) -> None:
+        """
+        Compact the mutation log: save a snapshot of the inventory and start an empty log.
+        """
+        with self._compact_lock:
+            self._log.compact(self, self._snapshot_path)
+
+    def _commit_log(self) -> None:
+        """
+        Commit the mutation log, and compact it if it has grown past its compact_bytes.
+        """
+        log = self._log
+        log.commit()
+        if log.compact_bytes and log.size() >= log.compact_bytes and self._compact_lock.acquire(blocking=False):
+            # Only one thread compacts; the others carry on logging to the new file
+            try:
+                log.compact(self, self._snapshot_path)
+            finally:
+                self._compact_lock.release()
+
+    @classmethod
+    def recover(cls, log_path, snapshot_path, file_path=None, inv_name="My Inventory", columnar=False, default_stock=10,
+                reorder_point=0, **log_options) -> 'myInventory':
+        """
+        Open an inventory whose changes are logged, restoring the state it had when the process last stopped or crashed.
+
+        The last snapshot is loaded (or, the first time, file_path is read), the mutation log is replayed on top of it,
+        and the result is checkpointed into a new snapshot before logging resumes. Replay applies only the last
+        record of each product, with vectorized writes for a columnar inventory.
+
+        Args:
+            log_path (str): The mutation log.
+            snapshot_path (str): The snapshot the log is compacted into.
+            file_path (str, optional): The CSV to start from if there is no snapshot yet. Defaults to None, an empty inventory.
+            inv_name (str, optional): The name of the inventory if there is no snapshot yet. Defaults to "My Inventory".
+            columnar (bool, optional): Use a columnar inventory. Defaults to False.
+            default_stock (int, optional): The default_stock if there is no snapshot yet. Defaults to 10.
+            reorder_point (int, optional): The reorder_point if there is no snapshot yet. Defaults to 0.
+            **log_options: fsync, interval and compact_bytes for the myMutationLog.
+
+        Returns:
+            myInventory: The recovered inventory, logging to log_path.
+        """
+        if os.path.exists(snapshot_path):
+            inventory = cls.load_snapshot(snapshot_path, columnar=columnar)
+        else:
+            inventory = cls(inv_name=inv_name, file_path=file_path, columnar=columnar, default_stock=default_stock,
+                            reorder_point=reorder_point)
+        inventory._replay(*myMutationLog.read(log_path))
+        inventory.attach_log(myMutationLog(log_path, **log_options), snapshot_path)
+        inventory.checkpoint()
+        return inventory
+
+    def _replay(self, stock, prices, ratings, products, reorder_points) -> None:
+        """
+        Apply the latest values read from a mutation log: first add the logged products the inventory doesn't have,
+        then apply the changes, skipping products that still aren't in the inventory. Reorder points are applied to
+        any name, as setReorderPoint does.
+        The fields are written directly, so the indexes are dropped and rebuilt on next use.
+        """
+        for name, fields in products.items():
+            if name not in self.products:
+                category, subcat, imageURL, prodURL, rating, numRate, discPrice, price, stock_value = fields
+                product = myProduct.from_validated(name, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price)
+                self.products.add(name, {"product": product, "stock": stock_value})
+        for name, point in reorder_points.items():
+            if point is None:
+                self._reorder_points.pop(name, None)
+            else:
+                self._reorder_points[name] = point
+
+        disc_prices = {name: discPrice for name, (discPrice, _) in prices.items()}
+        base_prices = {name: price for name, (_, price) in prices.items() if price is not None}
+        if self.columnar:
+            store = self.products
+            for columns, values in ((("stock",), stock), (("discPrice",), disc_prices), (("price",), base_prices),
+                                    (("rating", "numRate"), ratings)):
+                known = [(store.index[name], value) for name, value in values.items() if name in store.index]
+                if not known:
+                    continue
+                rows = np.array([row for row, _ in known], dtype=np.int64)
+                fields = np.array([value for _, value in known], dtype=np.float64).reshape(len(known), -1)
+                for position, column in enumerate(columns):
+                    getattr(store, column)[rows] = fields[:, position]
+        else:
+            for name, value in stock.items():
+                if name in self.products:
+                    self.products[name]["stock"] = value
+            for name, value in disc_prices.items():
+                if name in self.products:
+                    self.products[name]["product"]._write_disc_price(value)
+            for name, value in base_prices.items():
+                if name in self.products:
+                    self.products[name]["product"]._write_price(value)
+            for name, (rating, numRate) in ratings.items():
+                if name in self.products:
+                    self.products[name]["product"]._write_rating(rating, numRate)
+
+        self._price_index = self._purchase_index = None
+        self._rating_index = self._rating_stats = None
+        self._category_index = self._name_index = self._low_stock_index = None
+        _stock_changed()
+        _prices_changed()
+        _ratings_changed()
+
+    # If you need any other helper methods, add them here.
+
+    
+
+
+class _InventorySum(myInventory):
+    """
+    The running total of sum(inventories), started by myInventory.__radd__. Adding an inventory to it merges that
+    inventory's products into the total itself instead of copying the total into a new inventory, which keeps sum()
+    linear. The total is a new inventory of its own, so the inventories summed are never changed; adding to the result
+    of sum() afterwards extends it too.
+    """
+
+    def __add__(self, other) -> 'myInventory':
+        if isinstance(other, myShardedInventory):
+            other = other._to_inventory()
+        if not isinstance(other, myInventory):
+            return NotImplemented
+        self.inv_name = f"{self.inv_name} + {other.inv_name}"
+        self._merge_from(other)
+        return self
+
 
-                # Handle ratings
-                if isinstance(row['ratings'], str):
-                    rating = ''.join(c for c in row['ratings'] if c.isdigit() or c == '.')
-                    rating = float(rating) if rating else 0.0  # Default to 0.0 if empty or invalid
-                elif isinstance(row['ratings'], float) and math.isnan(row['ratings']):
-                    rating = 0.0  # Default to 0.0 if NaN
-                else:
-                    rating = float(row['ratings'])
+def _shard_worker(connection, spec) -> None:
+    """
+    Serve one shard of a myShardedInventory: a columnar myInventory over a slice of the shared memory columns.
+    Requests arrive on connection as (method, args) and each gets a ("ok", result) or ("error", exception) reply;
+    None stops the worker.
 
-                # Create the product object
-                product = myProduct(
-                    name=row['name'],
-                    category=row['main_category'],
-                    subcat=row['sub_category'],
-                    imageURL=row['image'],
-                    prodURL=row['link'],
-                    rating=rating,
-                    numRate=no_of_ratings,
-                    discPrice=discount_price,
-                    price=actual_price
-                )
+    Args:
+        connection (Connection): This worker's end of the pipe to the parent.
+        spec (dict): The shared memory block of each column, the shard's first and end rows, its strings and its
+            reorder points.
+    """
+    start, end = spec["rows"]
+    blocks = {column: shared_memory.SharedMemory(name=name) for column, (name, _) in spec["blocks"].items()}
+    arrays = {column: np.ndarray(spec["size"], dtype=dtype, buffer=blocks[column].buf)[start:end]
+              for column, (_, dtype) in spec["blocks"].items()}
+    inventory = myInventory(spec["inv_name"], columnar=True, reorder_point=spec["reorder_point"])
+    inventory.products = _ColumnStore.from_arrays(arrays, spec["names"], spec["image_urls"], spec["prod_urls"], spec["categories"])
+    inventory._reorder_points = spec["reorder_points"]
+    store = inventory.products
 
-                # Add product to the inventory
-                if product.name not in self.products:
-                    self.products[product.name] = {"product": product, "stock": 10}
-                else:
-                    continue
+    def put_back(lines):
+        # Undo an atomic order's purchases when another shard rejected its part
+        for name, quantity in lines:
+            with _stock_lock(name):
+                store.stock[store.index[name]] += quantity
+        _stock_changed()
+        inventory._track_stock([name for name, _ in lines])
 
-            except (ValueError, TypeError) as e:
-                print(f"Row '{row['name']}' encountered an error, but handled: {e}")
-                continue
+    def rows(products):
+        return [product._row + start for product in products]
 
-        return len(self.products)
+    def rating_totals(category):
+        inventory._rating_indexes()
+        return inventory._rating_stats.get(category)
 
+    # Queries answer with global rows, which the parent reads from shared memory instead of receiving pickled products
+    handlers = {
+        "getPrices": lambda *args: rows(inventory.getPrices(*args)),
+        "getCategory": lambda *args: rows(inventory.iterCategory(*args)),
+        "query": lambda *args: rows(inventory.query(*args)),
+        "topRated": lambda *args: rows(inventory.topRated(*args)),
+        "ratingTotals": rating_totals,
+        "lowStock": inventory.lowStock,
+        # One order's lines through the vectorized batch path, which gives the same result as do_purchase
+        "do_purchase": lambda lines, atomic: inventory.do_purchase(lines, atomic=True) if atomic else inventory.do_purchase_batch([lines])[0],
+        "do_purchase_batch": inventory.do_purchase_batch,
+        "put_back": put_back,
+        "addReviews": inventory.addReviews,
+        "addReviewsBatch": inventory.addReviewsBatch,
+        "adjust_stock": inventory.adjust_stock,
+        "restock": inventory.restock,
+        "reprice": inventory.reprice,
+        "setReorderPoint": inventory.setReorderPoint,
+        "getReorderPoint": inventory.getReorderPoint,
+        "reorderPoints": lambda: inventory._reorder_points,
+    }
+    try:
+        while True:
+            request = connection.recv()
+            if request is None:
+                break
+            method, args = request
+            try:
+                connection.send(("ok", handlers[method](*args)))
+            except Exception as e:
+                connection.send(("error", e))
+    finally:
+        del arrays, store, inventory
+        for block in blocks.values():
+            block.close()
+        connection.close()
 
 
+class myShardedInventory():
+    """
+    An inventory split across worker processes by a hash of the product name, so purchases and reviews on different
+    shards run on different cores instead of taking turns for the GIL.
 
+    The numeric columns (prices, ratings, stock and category codes) live in shared memory. Each worker owns a contiguous
+    block of rows and is the only process that writes them. getProduct, itemRating and searchProducts are answered in
+    this process from shared memory. do_purchase, addReviews, adjust_stock and setReorderPoint go to the shard that owns
+    the product, the batch methods (do_purchase_batch, addReviewsBatch and restock) send each shard its part, and
+    getCategory, getPrices, query, topRated, averageRating, lowStock and reprice run on every shard in parallel, which
+    reply with row numbers or totals rather than pickled products. to_pandas, to_arrow and save_snapshot export a copy
+    of the products as of the call. These methods take the same arguments and give the same results as in myInventory,
+    except that products returned are read-only views of the shared rows, so they always show current stock, prices
+    and ratings; change them through the inventory's methods. == compares the products as for myInventory.
 
-    
-    def __len__(self) -> int:
+    Shards apply their part of a call independently, so a call that spans shards isn't atomic across them: other calls
+    may see some shards' parts applied before the rest, and if a shard raises, the parts other shards already applied
+    stay applied. The exception is do_purchase with atomic=True, which puts back the stock the other shards took.
+
+    Products can't be added once the inventory is sharded, so read_file raises TypeError, but + returns a new sharded
+    inventory with the products of both. Call close() (or use a with block) to stop the workers.
+    """
+
+    def __init__(self, inv_name="My Inventory", file_path=None, shards=None, inventory=None) -> None:
         """
-        Get the number of products in the inventory.
+        Args:
+            inv_name (str): The name of the inventory.
+            file_path (str, optional): A CSV file to load the products from.
+            shards (int, optional): The number of worker processes. Defaults to os.cpu_count().
+            inventory (myInventory, optional): Shard the products of this inventory instead of reading file_path.
+                Its current stock, prices, ratings and reorder points are copied.
+        """
+        if inventory is None:
+            inventory = myInventory(inv_name, file_path, columnar=True)
+        self.inv_name = inv_name
+        self.shards = shards or os.cpu_count() or 1
+        self.default_stock = inventory.default_stock
+        self.reorder_point = inventory.reorder_point
+        self._name_index = None
+        columns = inventory._column_arrays()
+
+        # Order the rows by shard, so each shard's rows are one contiguous block
+        names = columns["name"]
+        shard_of = np.array([zlib.crc32(name.encode("utf-8")) % self.shards for name in names], dtype=np.int64)
+        order = np.argsort(shard_of, kind="stable")
+        bounds = np.searchsorted(shard_of[order], np.arange(self.shards + 1)).tolist()
+        # Where each row was in the original inventory, to return category results in the order products were added
+        self._positions = order
+
+        # One category table for both code columns
+        categories = []
+        table_codes = {}
+        arrays = {}
+        for field, column in (("category", "category_codes"), ("subcat", "subcat_codes")):
+            codes, table = columns[field]
+            remap = np.array([table_codes.setdefault(value, len(table_codes)) for value in table], dtype=np.int32)
+            arrays[column] = remap[codes[order]] if len(table) else np.zeros(len(names), dtype=np.int32)
+        categories = list(table_codes)
+        for column in _ColumnStore._NUMERIC:
+            arrays[column] = columns[column][order]
+
+        self._blocks = {}
+        shared = {}
+        for column, values in arrays.items():
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            self._blocks[column] = block
+            shared[column] = np.ndarray(len(names), dtype=values.dtype, buffer=block.buf)
+            shared[column][:] = values
+            # Only the shard that owns a row writes it
+            shared[column].flags.writeable = False
+
+        names = [names[row] for row in order.tolist()]
+        image_urls = [columns["imageURL"][row] for row in order.tolist()]
+        prod_urls = [columns["prodURL"][row] for row in order.tolist()]
+        self.products = _ColumnStore.from_arrays(shared, names, image_urls, prod_urls, categories)
+        # The shard that owns each row
+        self._row_shards = np.repeat(np.arange(self.shards), np.diff(bounds)).tolist()
+
+        self._connections = []
+        self._locks = []
+        self._workers = []
+        for shard in range(self.shards):
+            start, end = bounds[shard], bounds[shard + 1]
+            spec = {
+                "inv_name": inv_name,
+                "size": len(names),
+                "rows": (start, end),
+                "blocks": {column: (block.name, arrays[column].dtype.str) for column, block in self._blocks.items()},
+                "names": names[start:end],
+                "image_urls": image_urls[start:end],
+                "prod_urls": prod_urls[start:end],
+                "categories": categories,
+                "reorder_point": inventory.reorder_point,
+                "reorder_points": {name: inventory._reorder_points[name] for name in names[start:end]
+                                   if name in inventory._reorder_points},
+            }
+            parent, child = multiprocessing.Pipe()
+            worker = multiprocessing.Process(target=_shard_worker, args=(child, spec), daemon=True)
+            worker.start()
+            child.close()
+            self._connections.append(parent)
+            self._locks.append(threading.Lock())
+            self._workers.append(worker)
+        self._finalizer = weakref.finalize(self, myShardedInventory._shutdown, self._connections, self._workers, list(self._blocks.values()))
+
+    def _shard(self, name) -> int:
+        """
+        Get the shard that owns a product.
+        """
+        return self._row_shards[self.products.index[name]]
+
+    def _send(self, requests_by_shard) -> dict:
+        """
+        Send requests to several shards at once and wait for all the replies.
+
+        Args:
+            requests_by_shard (dict): A (method, args) request per shard.
+
+        Returns:
+            dict: The ("ok", result) or ("error", exception) reply from each shard.
+        """
+        shards = sorted(requests_by_shard)
+        for shard in shards:
+            self._locks[shard].acquire()
+        try:
+            for shard in shards:
+                self._connections[shard].send(requests_by_shard[shard])
+            return {shard: self._connections[shard].recv() for shard in shards}
+        finally:
+            for shard in reversed(shards):
+                self._locks[shard].release()
+
+    def _call(self, requests_by_shard) -> dict:
+        """
+        Send requests to several shards at once, as _send, and get their results.
+
+        Returns:
+            dict: The result from each shard.
+
+        Raises:
+            Exception: The first exception a shard raised, once every shard has replied.
+        """
+        replies = self._send(requests_by_shard)
+        for status, result in replies.values():
+            if status == "error":
+                raise result
+        return {shard: result for shard, (_, result) in replies.items()}
+
+    def _fan_out(self, method, *args) -> list:
+        return list(self._call({shard: (method, args) for shard in range(self.shards)}).values())
+
+    def _split_records(self, records) -> tuple:
         """
+        Split a DataFrame of records with a product_name column into one DataFrame per shard.
+
+        Returns:
+            dict: The records of each shard that has any.
+            int: The number of distinct products not in the inventory, whose records were dropped.
+        """
+        names = records["product_name"].tolist()
+        rows = [self.products.index.get(name) for name in names]
+        known = np.array([row is not None for row in rows], dtype=bool)
+        unknown = int(pd.Series(names, dtype=object)[~known].nunique(dropna=False))
+        shards = np.array([self._row_shards[row] for row in rows if row is not None], dtype=np.int64)
+        records = records[known]
+        return {shard: records[shards == shard] for shard in np.unique(shards).tolist()}, unknown
+
+    @staticmethod
+    def _in_order(names, results) -> dict:
+        """
+        Combine the by-name result dicts of several shards, in order of first appearance of each name.
+        """
+        merged = {}
+        for result in results.values():
+            merged.update(result)
+        return {name: merged[name] for name in dict.fromkeys(names) if name in merged}
+
+    def __len__(self) -> int:
         return len(self.products)
 
+    def __str__(self) -> str:
+        return f"Inventory: {self.inv_name}, Number of Products: {len(self)}, Shards: {self.shards}"
+
+    def __eq__(self, other) -> bool:
+        """
+        Check if two inventories are equal. Equal inventories have the same products.
+
+        Args:
+            other (myInventory or myShardedInventory): The other inventory to compare to.
+        """
+        return set(self.products.keys()) == set(other.products.keys())
+
+    def __add__(self, other) -> 'myShardedInventory':
+        """
+        Combine two inventories into a new sharded inventory with as many shards as this one. Their current stock,
+        prices, ratings and reorder points are copied, as in myInventory's +.
+
+        Args:
+            other (myInventory or myShardedInventory): The other inventory to combine with.
+
+        Returns:
+            myShardedInventory: The combined inventory, which must be closed separately.
+        """
+        if isinstance(other, myShardedInventory):
+            other = other._to_inventory()
+        combined = self._to_inventory() + other
+        return myShardedInventory(combined.inv_name, shards=self.shards, inventory=combined)
+
+    def __radd__(self, other) -> 'myInventory':
+        """
+        Support sum(inventories), which starts from 0.
+
+        0 + inventory returns a copy of the products in a myInventory running total, which the later steps of sum()
+        extend in place as for myInventory, instead of starting new workers for every step. Shard the total with
+        myShardedInventory(inventory=total) if it should be sharded too.
+
+        Args:
+            other (int): The left operand, 0 when called from sum().
+
+        Returns:
+            myInventory: The combined inventory.
+        """
+        if other != 0:
+            return NotImplemented
+        return self._to_inventory(_InventorySum)
+
+    def _to_inventory(self, inventory_class=None) -> 'myInventory':
+        """
+        Copy the products, with their current stock, prices, ratings and reorder points, into a columnar myInventory
+        (or inventory_class) in the order they were added.
+        """
+        inventory = (inventory_class or myInventory)(self.inv_name, columnar=True, default_stock=self.default_stock,
+                                                     reorder_point=self.reorder_point)
+        rows = np.argsort(self._positions, kind="stable")
+        inventory.products.extend_from(self.products, rows)
+        inventory._index_products([self.products.names[row] for row in rows.tolist()])
+        for points in self._fan_out("reorderPoints"):
+            inventory._reorder_points.update(points)
+        return inventory
+
     def getProduct(self, product_name) -> myProduct:
         """
-        Get a product from the inventory.
+        Get a read-only view of a product, from shared memory.
 
         Args:
-            product (str): The name of the product.
+            product_name (str): The name of the product.
 
         Returns:
-            myProduct: The product object.
+            myProduct: The product, or None if it isn't in the inventory.
         """
-        return self.products.get(product_name, {}).get("product", None)
-        
+        row = self.products.index.get(product_name)
+        return None if row is None else self.products.view(row)
 
-    def adjust_stock(self, product, stock) -> None:
+    def itemRating(self, product_name) -> float:
         """
-        Adjusts the stock of a product to a new value.
+        Get the rating of a product, or None if it isn't in the inventory.
+        """
+        product = self.getProduct(product_name)
+        return product.get_rating() if product else None
+
+    def searchProducts(self, query, limit=10, fuzzy=False) -> list:
+        """
+        Search product names by words, as myInventory.searchProducts. The word index is built in this process on the
+        first search; names never change once sharded, so it stays current.
 
         Args:
-            product (str): The name of the product.
-            stock (int): The new stock value.
+            query (str): The words to search for.
+            limit (int, optional): The most products to return. Defaults to 10.
+            fuzzy (bool, optional): Also match misspelled words. Defaults to False.
+
+        Returns:
+            list: Read-only myProduct views, best match first.
         """
-        if product in self.products:
-            self.products[product]["stock"] = stock
+        if self._name_index is None:
+            name_index = _NameIndex()
+            for name in self.products.names:
+                name_index.add(name)
+            self._name_index = name_index
+        return [self.getProduct(name) for name in self._name_index.search(query, limit, fuzzy)]
 
-    def getCategory(self, category=None) -> list:
+    def getCategory(self, category=None, subcat=None) -> list:
         """
-        Get a subset of the inventory based on a category.
+        Get the products of a category from every shard, in the order they were added.
 
         Args:
             category (str, optional): The category to filter by. Defaults to None.
+            subcat (str, optional): The subcategory to filter by. Defaults to None.
 
         Returns:
-            list: A list of myProduct objects.
+            list: Read-only myProduct views.
         """
-        if category:
-            return [product_info["product"] for product_info in self.products.values() if product_info["product"].category == category]
-        return list(self.products.values())
+        rows = np.array([row for rows in self._fan_out("getCategory", category, subcat) for row in rows], dtype=np.int64)
+        rows = rows[np.argsort(self._positions[rows], kind="stable")]
+        return [self.products.view(row) for row in rows.tolist()]
 
-    def getPrices(self, min_price, max_price) -> list:
+    def iterCategory(self, category=None, subcat=None):
         """
-        Get a subset of the inventory based on a price range.
+        Iterate over the products of a category, as getCategory. The shards are asked once, on the first item.
+
+        Yields:
+            myProduct: Read-only views of the products in the category, in the order they were added.
+        """
+        yield from self.getCategory(category, subcat)
+
+    def prefetch_images(self, category=None, subcat=None, cache=None) -> int:
+        """
+        Download the images of a category (or of the whole inventory) into the image cache ahead of time, from this
+        process, as myInventory.prefetch_images.
+
+        Returns:
+            int: The number of distinct images of the category now in the cache, see myImageCache.prefetch.
+        """
+        urls = [product.imageURL for product in self.getCategory(category, subcat)]
+        return (cache or get_image_cache()).prefetch(urls)
+
+    def getPrices(self, min_price, max_price, purchase_price=False) -> list:
+        """
+        Get the products in a price range from every shard, in ascending price order.
 
         Args:
-            max_price (float): The maximum price.
             min_price (float): The minimum price.
+            max_price (float): The maximum price.
+            purchase_price (bool, optional): Filter on the purchase price instead of the base price. Defaults to False.
 
         Returns:
-            list: A list of myProduct objects.
+            list: Read-only myProduct views.
         """
-        return [product_info["product"] for product_info in self.products.values() if min_price <= product_info["product"].price <= max_price]
+        rows = np.array([row for rows in self._fan_out("getPrices", min_price, max_price, purchase_price) for row in rows], dtype=np.int64)
+        keys = self.products.purchase_price() if purchase_price else self.products.price
+        # Equal prices stay in the order the products were added, as in myInventory
+        rows = rows[np.lexsort((self._positions[rows], keys[rows]))]
+        return [self.products.view(row) for row in rows.tolist()]
 
-    def itemRating(self, product_name) -> float:
+    def query(self, query, order_by=None, limit=None) -> list:
         """
-        Get the rating of a product.
+        Get the products that pass every filter of a myQuery, as myInventory.query. Each shard runs the query (with its
+        own planner and cache) and returns at most limit rows in order, which are merged here.
 
         Args:
-            product_name (str): The name of the product.
+            query (myQuery): The filters.
+            order_by (str, optional): A field of myQuery.FIELDS to sort by, descending with a leading "-". Defaults to
+                None, in which case the products are in the order they were added.
+            limit (int, optional): Return at most this many products. Defaults to None, meaning all of them.
 
         Returns:
-            float: The rating of the product.
+            list: Read-only myProduct views.
+
+        Raises:
+            ValueError: If order_by is not one of myQuery.FIELDS.
         """
-        product = self.getProduct(product_name)
-        if product:
-            return product.get_rating()
-        return None
-    
-    def do_purchase(self, product_quantity_tuple_list) -> float:
+        field = order_by.lstrip("-") if order_by else None
+        if field is not None and field not in myQuery.FIELDS:
+            raise ValueError(f"Can't order query results by {order_by!r}.")
+        rows = np.array([row for rows in self._fan_out("query", query, order_by, limit) for row in rows], dtype=np.int64)
+        if field is None:
+            rows = rows[np.argsort(self._positions[rows], kind="stable")]
+        else:
+            store = self.products
+            values = (store.purchase_price() if field == "purchase_price" else getattr(store, field))[rows].astype(np.float64)
+            rows = rows[np.lexsort((self._positions[rows], -values if order_by.startswith("-") else values))]
+        return [self.products.view(row) for row in rows[:limit].tolist()]
+
+    def topRated(self, count=10, category=None, weighted=False) -> list:
         """
-        Perform a purchase of multiple products.
+        Get the best-rated products, as myInventory.topRated: each shard returns its best count from its rating index,
+        and the best count of those are kept. Equal ratings put the products added last first, as a new index does.
 
-        If the quantity of a product is not available, the purchase should get as many as possible, and the total price should be calculated based on the available quantity.
+        Returns:
+            list: Up to count read-only myProduct views, best first.
+        """
+        rows = np.array([row for rows in self._fan_out("topRated", count, category, weighted) for row in rows], dtype=np.int64)
+        store = self.products
+        keys = _weighted_rating(store.rating[rows], store.numRate[rows]) if weighted else store.rating[rows]
+        rows = rows[np.lexsort((-self._positions[rows], -keys))]
+        return [store.view(row) for row in rows[:max(count, 0)].tolist()]
 
-        Args:
-            product_quantity_tuple_list (list): A list of tuples, where each tuple contains a myProduct item name and an integer representing the quantity purchased.
+    def averageRating(self, category=None, weighted=False) -> float:
+        """
+        Get the average rating of a category, as myInventory.averageRating, from the running totals of every shard.
 
         Returns:
-            float: The total price of all the purchased products, calculated using the get_purchase_price function.
-            items_purchased (list): A list of tuples, where each tuple contains the name of the product, the quantity purchased, and the total price for that product.
+            float: The average rating, or None if there are no products (or, when weighted, no ratings) to average.
         """
-        total_price = 0
-        items_purchased = []
+        totals = [stats for stats in self._fan_out("ratingTotals", category) if stats]
+        count, rating_sum, weighted_sum, numRate_sum = (sum(column) for column in zip(*totals)) if totals else (0, 0, 0, 0)
+        if not count:
+            return None
+        if weighted:
+            return weighted_sum / numRate_sum if numRate_sum else None
+        return rating_sum / count
 
-        for product_name, quantity in product_quantity_tuple_list:
-            product_info = self.products.get(product_name)
-            if product_info:
-                product = product_info["product"]
-                stock = product_info["stock"]
-                purchased_quantity = min(quantity, stock)
-                price_for_product = purchased_quantity * product.get_purchase_price()
-                total_price += price_for_product
-                product_info["stock"] -= purchased_quantity
-                items_purchased.append((product_name, purchased_quantity, price_for_product))
+    def to_pandas(self, query=None, columns=None) -> 'pd.DataFrame':
+        """
+        Export the products as a DataFrame, as myInventory.to_pandas. Every column is a copy taken at the call, since
+        the shared columns are in shard order rather than the order the products were added.
+        """
+        return self._to_inventory().to_pandas(query, columns)
 
-        return total_price, items_purchased
-    
-    def addReviews(self, product_name, rating, numberRate=1) -> float:
+    def to_arrow(self, query=None, columns=None) -> 'pa.Table':
         """
-        Add a review to a product.
+        Export the products as an Arrow table, see to_pandas.
+        """
+        return pa.Table.from_pandas(self.to_pandas(query, columns), preserve_index=False)
+
+    def save_snapshot(self, path) -> None:
+        """
+        Save the products, stock levels, ratings and reorder points to a snapshot, as myInventory.save_snapshot.
+        myInventory.load_snapshot reads it back; pass the result to myShardedInventory(inventory=...) to shard it again.
+        """
+        self._to_inventory().save_snapshot(path)
+
+    def read_file(self, path, *args, **kwargs) -> int:
+        """
+        Products can't be added once the inventory is sharded.
+
+        Raises:
+            TypeError: Always. Read the file into a myInventory and combine it with +, which returns a new sharded inventory.
+        """
+        raise TypeError(f"Can't read {path} into a sharded inventory; read it into a myInventory and add it with +.")
+
+    def adjust_stock(self, product, stock) -> None:
+        """
+        Set the stock of a product, on its shard.
+        """
+        if product in self.products:
+            shard = self._shard(product)
+            self._call({shard: ("adjust_stock", (product, stock))})
+
+    def restock(self, restock) -> dict:
+        """
+        Add stock to many products at once, as myInventory.restock. Each shard restocks its products in parallel.
 
         Args:
-            product_name (str): The name of the product.
-            rating (float): The rating to add.
-            numberRate (int, optional): The number of ratings the rating is based on. Defaults to 1.
+            restock (pd.DataFrame, str or tuple): The restock records, in any form myInventory.restock takes.
 
         Returns:
-            float: The new rating of the product.
+            dict: The new stock of each product restocked, by name.
         """
-        product = self.getProduct(product_name)
-        if product:
-            return product.add_rating(rating, numberRate)
-        return None
-    
-    def __eq__(self, other) -> bool:
+        if isinstance(restock, str):
+            restock = pd.read_csv(restock)
+        elif isinstance(restock, tuple):
+            restock = pd.DataFrame(dict(zip(("product_name", "quantity", "reorder_point"), restock)))
+        if len(restock) == 0:
+            return {}
+        by_shard, unknown = self._split_records(restock)
+        if unknown:
+            logger.error(f"{unknown} products in the restock are not in the inventory and were skipped.")
+        results = self._call({shard: ("restock", (records,)) for shard, records in by_shard.items()})
+        return self._in_order(restock["product_name"].tolist(), results)
+
+    def setReorderPoint(self, product_name, reorder_point) -> None:
         """
-        Check if two inventories are equal. Equal inventories have the same products.
+        Set the reorder point of a product, on its shard. Products not in the inventory are ignored.
+        """
+        if product_name in self.products:
+            shard = self._shard(product_name)
+            self._call({shard: ("setReorderPoint", (product_name, reorder_point))})
+
+    def getReorderPoint(self, product_name) -> int:
+        """
+        Get the reorder point of a product: its own if one was set, otherwise the inventory's reorder_point.
+        """
+        if product_name not in self.products:
+            return self.reorder_point
+        shard = self._shard(product_name)
+        return self._call({shard: ("getReorderPoint", (product_name,))})[shard]
+
+    def lowStock(self, count=None) -> list:
+        """
+        Get the products whose stock is at or below their reorder point, most urgent (furthest below) first, from every
+        shard's low-stock index. Products equally far below stay in the order they were added.
 
         Args:
-            other (myInventory): The other inventory to compare to.
+            count (int, optional): The most products to return. Defaults to None, meaning all of them.
+
+        Returns:
+            list: (product name, stock, reorder point) tuples.
         """
-        return set(self.products.keys()) == set(other.products.keys())
-    
-    def __str__(self) -> str:
+        entries = [entry for entries in self._fan_out("lowStock", count) for entry in entries]
+        index, positions = self.products.index, self._positions
+        entries.sort(key=lambda entry: (entry[1] - entry[2], positions[index[entry[0]]]))
+        return entries[:count]
+
+    def reprice(self, percent=None, price=None, category=None, subcat=None, min_price=None, max_price=None) -> int:
         """
-        String representation of the inventory.
+        Set the discount price of every product matching a selector, as myInventory.reprice. Each shard reprices its
+        products in place, so products returned earlier show the new prices.
+
+        Returns:
+            int: The number of products repriced.
+
+        Raises:
+            ValueError: If neither or both of percent and price are given, or price is negative.
         """
-        return f"Inventory: {self.inv_name}, Number of Products: {len(self)}"
-    
-    def __len__(self) -> int:
+        return sum(self._fan_out("reprice", percent, price, category, subcat, min_price, max_price))
+
+    def addReviews(self, product_name, rating, numberRate=1) -> float:
         """
-        Get the number of products in the inventory.
+        Add a review to a product, on its shard.
 
         Returns:
-            int: The number of products in the inventory.
+            float: The new rating of the product, or None if it isn't in the inventory.
         """
-        return len(self.products)
-    
-    def __add__(self, other) -> 'myInventory':
+        if product_name not in self.products:
+            return None
+        shard = self._shard(product_name)
+        return self._call({shard: ("addReviews", (product_name, rating, numberRate))})[shard]
+
+    def addReviewsBatch(self, reviews) -> dict:
         """
-        Combine two inventories into one.
+        Add many reviews at once, as myInventory.addReviewsBatch. Each shard adds the reviews of its products in parallel.
 
         Args:
-            other (myInventory): The other inventory to combine with.
+            reviews (pd.DataFrame, str or tuple): The review records, in any form myInventory.addReviewsBatch takes.
 
         Returns:
-            myInventory: The combined inventory.
+            dict: The new rating of each product that was updated, by name.
         """
-        
-        combined_inventory = myInventory(inv_name=f"{self.inv_name} + {other.inv_name}")
+        if isinstance(reviews, str):
+            reviews = pd.read_csv(reviews)
+        elif isinstance(reviews, tuple):
+            reviews = pd.DataFrame(dict(zip(("product_name", "rating", "numberRate"), reviews)))
+        if len(reviews) == 0:
+            return {}
+        by_shard, _ = self._split_records(reviews)
+        results = self._call({shard: ("addReviewsBatch", (records,)) for shard, records in by_shard.items()})
+        return self._in_order(reviews["product_name"].tolist(), results)
 
-        # Add products from self
-        for product_name, product_info in self.products.items():
-            combined_inventory.products[product_name] = product_info
+    def do_purchase(self, product_quantity_tuple_list, atomic=False) -> tuple:
+        """
+        Perform a purchase, with the same results as myInventory.do_purchase. The lines are grouped by shard and each
+        shard buys its lines in parallel with the others.
 
-        # Add products from the other inventory, avoid duplicates
-        for product_name, product_info in other.products.items():
-            if product_name not in combined_inventory.products:
-                combined_inventory.products[product_name] = product_info
+        With atomic=True an order spanning several shards is bought all-or-nothing on each shard, and if any shard
+        rejects its part or raises, the stock the others took is put back. Until then, other orders may see that stock
+        as taken. Without atomic, if a shard raises, the lines the other shards bought stay bought.
 
-        return combined_inventory
-    
+        Args:
+            product_quantity_tuple_list (list): (product name, quantity) tuples.
+            atomic (bool, optional): Commit the order all-or-nothing. Defaults to False.
 
+        Returns:
+            float: The total price.
+            items_purchased (list): The (name, quantity, price) tuples, in the order of the lines.
+        """
+        order = list(product_quantity_tuple_list)
+        index, row_shards = self.products.index, self._row_shards
+        rows = [index.get(name) for name, _ in order]
+        if atomic and None in rows:
+            logger.info("Order rejected: not every product is in the inventory.")
+            return 0, []
+        line_shards = [row_shards[row] for row in rows if row is not None]
+        by_shard = {}
+        for line, row in zip(order, rows):
+            if row is not None:
+                by_shard.setdefault(row_shards[row], []).append(line)
+        if not by_shard:
+            return 0, []
 
-    def __radd__(self, other) -> 'myInventory':
-    
-        pass
-    
-    # If you need any other helper methods, add them here.
+        requests = {shard: ("do_purchase", (shard_lines, atomic)) for shard, shard_lines in by_shard.items()}
+        if not atomic:
+            results = self._call(requests)
+        else:
+            replies = self._send(requests)
+            bought = {shard: result[1] for shard, (status, result) in replies.items() if status == "ok" and result[1]}
+            if len(bought) < len(replies):
+                if bought:
+                    self._call({shard: ("put_back", ([(name, quantity) for name, quantity, _ in items],))
+                                for shard, items in bought.items()})
+                for status, result in replies.values():
+                    if status == "error":
+                        raise result
+                return 0, []
+            results = {shard: result for shard, (_, result) in replies.items()}
 
-    
+        # Put the items back in the order of the lines
+        shard_items = {shard: iter(items) for shard, (_, items) in results.items()}
+        items_purchased = [next(shard_items[shard]) for shard in line_shards]
+        total_price = 0
+        for _, _, price in items_purchased:
+            total_price += price
+        return total_price, items_purchased
+
+    def do_purchase_batch(self, orders) -> list:
+        """
+        Perform many purchases at once, as myInventory.do_purchase_batch. Each shard gets every order with only the
+        lines for its products, and runs them through its own vectorized batch path in parallel with the others.
+
+        Args:
+            orders (list or pd.DataFrame): A list of orders or a DataFrame of order lines, as myInventory.do_purchase_batch takes.
+
+        Returns:
+            list: One (total_price, items_purchased) tuple per order, as returned by do_purchase.
+
+        Raises:
+            ValueError: If a DataFrame row has no order_id.
+        """
+        if isinstance(orders, pd.DataFrame):
+            order_codes, order_labels = pd.factorize(orders["order_id"])
+            missing = int((order_codes < 0).sum())
+            if missing:
+                raise ValueError(f"{missing} order lines have no order_id.")
+            grouped = [[] for _ in range(len(order_labels))]
+            for code, name, quantity in zip(order_codes.tolist(), orders["name"].tolist(), orders["quantity"].tolist()):
+                grouped[code].append((name, quantity))
+            orders = grouped
+
+        index, row_shards = self.products.index, self._row_shards
+        order_shards = []
+        by_shard = {}
+        for position, order in enumerate(orders):
+            shards = []
+            for line in order:
+                row = index.get(line[0])
+                if row is not None:
+                    shards.append(row_shards[row])
+                    by_shard.setdefault(row_shards[row], [[] for _ in orders])[position].append(line)
+            order_shards.append(shards)
+
+        results = self._call({shard: ("do_purchase_batch", (shard_orders,)) for shard, shard_orders in by_shard.items()})
+        # Put each order's items back in the order of its lines
+        shard_items = {shard: [iter(items) for _, items in shard_results] for shard, shard_results in results.items()}
+        purchases = []
+        for position, shards in enumerate(order_shards):
+            items_purchased = [next(shard_items[shard][position]) for shard in shards]
+            total_price = 0
+            for _, _, price in items_purchased:
+                total_price += price
+            purchases.append((total_price, items_purchased))
+        return purchases
+
+    def close(self) -> None:
+        """
+        Stop the workers and free the shared memory. Products returned earlier must not be used afterwards.
+        """
+        self._finalizer()
+
+    def __enter__(self) -> 'myShardedInventory':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def _shutdown(connections, workers, blocks) -> None:
+        for connection in connections:
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        for connection in connections:
+            connection.close()
+        for block in blocks:
+            block.close()
+            block.unlink()
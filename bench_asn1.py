@@ -0,0 +1,436 @@
+"""
+Benchmarks for the inventory hot paths.
+
+Run the regression suite over synthetic CSVs of several sizes, save the results as a baseline, and fail a later run
+that is slower than the baseline by more than a threshold:
+
+    python bench_asn1.py suite --sizes 1000 100000 --save baseline.json
+    python bench_asn1.py suite --sizes 1000 100000 --baseline baseline.json --threshold 1.25
+
+Or print the before/after comparisons for individual optimizations:
+
+    python bench_asn1.py compare --rows 100000
+
+Or break down the cost of importing the inventory module with python -X importtime:
+
+    python bench_asn1.py importtime
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+import pandas as pd
+
+from START_asn_1 import myInventory, myProduct, myQuery
+
+FILE_1 = "Strength_Training.csv"
+FILE_2 = "Car_Electronics.csv"
+
+
+def make_csv(rows, templates=(FILE_1, FILE_2), directory=None, chunk_rows=100_000) -> str:
+    """
+    Write a synthetic CSV with the same schema as the templates by repeating their rows, making every name unique and
+    spreading the rows over ten subcategories per template category. The file is written in chunks, so very large
+    sizes don't need to fit in memory.
+
+    Args:
+        rows (int): The number of rows to write.
+        templates (tuple, optional): The CSVs to copy rows from. Defaults to both sample files.
+        directory (str, optional): Where to write the file. Defaults to a new temporary directory.
+        chunk_rows (int, optional): Rows generated per chunk. Defaults to 100,000.
+
+    Returns:
+        str: The path of the new CSV.
+    """
+    base = pd.concat([pd.read_csv(template) for template in templates], ignore_index=True)
+    directory = directory or tempfile.mkdtemp()
+    path = os.path.join(directory, f"synthetic_{rows}.csv")
+
+    for start in range(0, rows, chunk_rows):
+        positions = pd.RangeIndex(start, min(start + chunk_rows, rows))
+        data = base.iloc[positions % len(base)].reset_index(drop=True)
+        data['name'] = data['name'].astype(str) + " #" + positions.astype(str)
+        data['sub_category'] = data['sub_category'].astype(str) + " " + (positions % 10).astype(str)
+        data.to_csv(path, index=False, mode="w" if start == 0 else "a", header=start == 0)
+    return path
+
+
+def timed(func, *args, repeat=3, **kwargs) -> float:
+    """
+    Best wall-clock time of several calls, in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_read_file(path) -> dict:
+    """
+    Compare the row-by-row and vectorized read_file paths on one file.
+    """
+    rows = timed(lambda: myInventory("rows").read_file(path, vectorized=False))
+    columns = timed(lambda: myInventory("columns").read_file(path, vectorized=True))
+    return {"rows": rows, "vectorized": columns, "speedup": rows / columns}
+
+
+def bench_snapshot(path) -> dict:
+    """
+    Compare loading an inventory from CSV with restoring it from a binary snapshot.
+    """
+    snapshot = os.path.join(os.path.dirname(path), "snapshot.npz")
+    myInventory("snapshot", path).save_snapshot(snapshot)
+    csv = timed(lambda: myInventory("csv", path))
+    restore = timed(lambda: myInventory.load_snapshot(snapshot))
+    restore_columnar = timed(lambda: myInventory.load_snapshot(snapshot, columnar=True))
+    return {"csv": csv, "snapshot": restore, "snapshot_columnar": restore_columnar}
+
+
+class DictProduct():
+    """
+    A product laid out the way myProduct was before it used __slots__, with its fields in an instance __dict__.
+    """
+
+    def __init__(self, name, category, subcat, imageURL, prodURL, rating, numRate, discPrice, price):
+        self.name = name
+        self.category = category
+        self.subcat = subcat
+        self.imageURL = imageURL
+        self.prodURL = prodURL
+        self.rating = rating
+        self.numRate = numRate
+        self.discPrice = discPrice
+        self.price = price
+
+
+def bytes_per_item(build, count) -> float:
+    """
+    Memory allocated per item by build(i) for count items, not counting the list holding them.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    items = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(items) - 8
+
+
+def bench_product_memory(count=100_000) -> dict:
+    """
+    Bytes per product object (excluding the shared strings) for the old dict layout and the slotted myProduct.
+    """
+    fields = ("name", "category", "subcat", "image", "link", 4.4, 100, 10.0, 20.0)
+    return {
+        "dict": bytes_per_item(lambda i: DictProduct(*fields), count),
+        "slots": bytes_per_item(lambda i: myProduct(*fields), count),
+        "slots_validated": bytes_per_item(lambda i: myProduct.from_validated(*fields), count),
+    }
+
+
+def bench_purchase(path, count=100_000) -> dict:
+    """
+    Compare do_purchase in a loop with one do_purchase_batch call over the same orders.
+    """
+    names = list(myInventory("names", path).products)
+    orders = [[(names[i % len(names)], 1), (names[(i * 7) % len(names)], 2)] for i in range(count)]
+    loop = timed(lambda inventory: [inventory.do_purchase(order) for order in orders], myInventory("loop", path), repeat=1)
+    batch = timed(lambda inventory: inventory.do_purchase_batch(orders), myInventory("batch", path), repeat=1)
+    return {"loop": loop, "batch": batch, "speedup": loop / batch}
+
+
+def bench_purchase_contention(path, threads=(1, 2, 4, 8), orders=20_000) -> dict:
+    """
+    Time do_purchase from several threads buying different products, as the striped stock locks allow, once as
+    do_purchase runs now and once with every call wrapped in the inventory's price lock, as it used to be.
+
+    Returns:
+        dict: {thread count: {"unlocked": orders per second, "price_lock": orders per second}}.
+    """
+    inventory = myInventory("contention", path, default_stock=10**9)
+    names = list(inventory.products)
+
+    def locked_purchase(order):
+        with inventory._price_lock.read():
+            return inventory.do_purchase(order)
+
+    results = {}
+    for count in threads:
+        # Each thread buys its own products, so only shared locks make them wait for each other
+        per_thread = orders // count
+        work = [[[(names[(i * count + thread) % len(names)], 1)] for i in range(per_thread)] for thread in range(count)]
+        result = {}
+        for label, purchase in (("unlocked", inventory.do_purchase), ("price_lock", locked_purchase)):
+            workers = [threading.Thread(target=lambda thread_orders: [purchase(order) for order in thread_orders], args=(thread_orders,))
+                       for thread_orders in work]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            result[label] = per_thread * count / (time.perf_counter() - start)
+        results[count] = result
+    return results
+
+
+def peak_memory(func, *args, **kwargs) -> int:
+    """
+    Peak memory allocated while running func once, in bytes, as traced by tracemalloc.
+    """
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def import_time(module="START_asn_1", code=None, repeat=5) -> dict:
+    """
+    Time importing a module in fresh interpreters with python -X importtime.
+
+    One untimed import runs first so the timed runs read compiled bytecode, as an installed module would.
+
+    Args:
+        module (str, optional): The module to import. Defaults to "START_asn_1".
+        code (str, optional): Code run in place of a bare import, e.g. to also exercise the module. Defaults to None.
+        repeat (int, optional): Timed interpreters; the best one counts. Defaults to 5.
+
+    Returns:
+        dict: "seconds" for the module's cumulative import time, "imports" with the cumulative seconds of each module
+        it imported directly, and "loaded", which of the heavy dependencies were imported.
+    """
+    heavy = ("numpy", "pandas", "PIL", "requests")
+    code = code or f"import {module}"
+    code += f"\nimport sys; print(','.join(name for name in {heavy!r} if name in sys.modules))"
+    env = {key: value for key, value in os.environ.items() if key != "PYTHONDONTWRITEBYTECODE"}
+    command = [sys.executable, "-X", "importtime", "-c", code]
+    subprocess.run(command, env=env, capture_output=True, check=True)
+
+    best = None
+    for _ in range(repeat):
+        run = subprocess.run(command, env=env, capture_output=True, check=True, text=True)
+        # Lines look like "import time:  self [us] | cumulative | <indent>name", children before their parent
+        rows = re.findall(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$", run.stderr, re.MULTILINE)
+        seconds = imports = None
+        for index, (_, cumulative, indent, name) in enumerate(rows):
+            if name == module and len(indent) == 1:
+                seconds = int(cumulative) / 1e6
+                imports = {}
+                for _, child_cumulative, child_indent, child in reversed(rows[:index]):
+                    if len(child_indent) <= 1:
+                        break
+                    if len(child_indent) == 3:
+                        imports[child] = int(child_cumulative) / 1e6
+        if seconds is not None and (best is None or seconds < best["seconds"]):
+            best = {"seconds": seconds, "imports": imports, "loaded": [name for name in run.stdout.strip().split(",") if name]}
+    return best
+
+
+def suite_operations(path, queries=1000) -> dict:
+    """
+    The operations measured by the regression suite on one synthetic file. Each value is a (setup, run) pair:
+    setup builds fresh state outside the timing and run does the measured work on it.
+
+    Args:
+        path (str): The synthetic CSV.
+        queries (int, optional): How many calls the per-call operations make per run. Defaults to 1000.
+
+    Returns:
+        dict: (setup, run) pairs by operation name.
+    """
+    inventory = myInventory("suite", path)
+    names = list(inventory.products)
+    categories = sorted({product.subcat for product in inventory.getCategory()})
+    orders = [[(names[(i * 7919) % len(names)], 1 + i % 3)] for i in range(queries)]
+    reviews = [(names[(i * 104729) % len(names)], 1 + i % 5, 1 + i % 7) for i in range(queries)]
+    half = len(names) // 2
+
+    def fresh():
+        return myInventory("suite", path)
+
+    def halves():
+        left, right = myInventory("left"), myInventory("right")
+        for name in names[:half]:
+            left.products[name] = inventory.products[name]
+        for name in names[half:]:
+            right.products[name] = inventory.products[name]
+        return left, right
+
+    def price_queries(inv):
+        for i in range(queries):
+            low = (i * 37) % 2000
+            inv.getPrices(low, low + 100)
+
+    def category_queries(inv):
+        for i in range(queries):
+            inv.getCategory(subcat=categories[i % len(categories)])
+
+    def filter_queries(inv):
+        for i in range(queries):
+            low = (i * 37) % 2000
+            inv.query(myQuery().subcat(categories[i % len(categories)]).price(low, low + 500).rating(4).in_stock())
+
+    def purchases(inv):
+        for order in orders:
+            inv.do_purchase(order)
+
+    def review_calls(inv):
+        for name, rating, count in reviews:
+            inv.addReviews(name, rating, count)
+
+    return {
+        "read_file": (lambda: None, lambda _: myInventory("suite").read_file(path)),
+        "getPrices": (lambda: inventory, price_queries),
+        "getCategory": (lambda: inventory, category_queries),
+        "query": (lambda: inventory, filter_queries),
+        "do_purchase": (fresh, purchases),
+        "addReviews": (fresh, review_calls),
+        "__add__": (halves, lambda pair: pair[0] + pair[1]),
+    }
+
+
+def run_suite(sizes, repeat=3, directory=None) -> dict:
+    """
+    Measure every suite operation at every size.
+
+    Args:
+        sizes (list): Rows in each synthetic CSV.
+        repeat (int, optional): Timed runs per operation; the best one counts. Defaults to 3.
+        directory (str, optional): Where to write the synthetic CSVs. Defaults to a new temporary directory.
+
+    Returns:
+        dict: {"seconds": ..., "peak_bytes": ...} keyed by "operation@size".
+    """
+    directory = directory or tempfile.mkdtemp()
+    results = {}
+    for size in sizes:
+        path = make_csv(size, directory=directory)
+        for operation, (setup, run) in suite_operations(path).items():
+            best = float("inf")
+            for _ in range(repeat):
+                state = setup()
+                start = time.perf_counter()
+                run(state)
+                best = min(best, time.perf_counter() - start)
+            state = setup()
+            results[f"{operation}@{size}"] = {"seconds": best, "peak_bytes": peak_memory(run, state)}
+            print(f"{operation:>12} @ {size:>9} rows: {best:9.4f}s, peak {results[f'{operation}@{size}']['peak_bytes'] / 1e6:9.1f} MB")
+    results["import"] = {"seconds": import_time(repeat=repeat)["seconds"]}
+    print(f"{'import':>12}: {results['import']['seconds']:9.4f}s")
+    return results
+
+
+def find_regressions(results, baseline, threshold) -> list:
+    """
+    Compare suite results with a baseline.
+
+    Args:
+        results (dict): The current results from run_suite.
+        baseline (dict): Earlier results from run_suite.
+        threshold (float): How many times slower than the baseline an operation may be.
+
+    Returns:
+        list: A message for each operation slower than threshold times its baseline. Operations missing from either side are ignored.
+    """
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before and result["seconds"] > before["seconds"] * threshold:
+            regressions.append(f"{key}: {result['seconds']:.4f}s vs baseline {before['seconds']:.4f}s "
+                               f"({result['seconds'] / before['seconds']:.2f}x, threshold {threshold:.2f}x)")
+    return regressions
+
+
+def suite(args) -> int:
+    results = run_suite(args.sizes, repeat=args.repeat)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+        print(f"Saved results to {args.save}")
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as file:
+        baseline = json.load(file)
+    regressions = find_regressions(results, baseline, args.threshold)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+
+def compare(args) -> int:
+    path = make_csv(args.rows)
+    result = bench_read_file(path)
+    print(f"read_file, {args.rows} rows: row loop {result['rows']:.3f}s, "
+          f"vectorized {result['vectorized']:.3f}s, speedup {result['speedup']:.1f}x")
+
+    result = bench_product_memory()
+    print(f"bytes per product: __dict__ {result['dict']:.0f}, __slots__ {result['slots']:.0f}, "
+          f"from_validated {result['slots_validated']:.0f}")
+
+    result = bench_purchase(path)
+    print(f"purchases, 100000 orders: do_purchase loop {result['loop']:.3f}s, "
+          f"do_purchase_batch {result['batch']:.3f}s, speedup {result['speedup']:.1f}x")
+
+    for count, result in bench_purchase_contention(path).items():
+        print(f"do_purchase, {count} threads: {result['unlocked']:.0f} orders/s, "
+              f"{result['price_lock']:.0f} orders/s with the price lock held per order")
+
+    result = bench_snapshot(path)
+    print(f"startup, {args.rows} rows: CSV {result['csv']:.3f}s, snapshot {result['snapshot']:.3f}s, "
+          f"columnar snapshot {result['snapshot_columnar']:.3f}s")
+    return 0
+
+
+def importtime(args) -> int:
+    result = import_time(repeat=args.repeat)
+    print(f"import START_asn_1: {result['seconds'] * 1000:.1f} ms")
+    for name, seconds in sorted(result["imports"].items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {name:<30} {seconds * 1000:8.1f} ms")
+
+    # What each use of the module pulls in, and what those dependencies would add if imported up front
+    for label, code in (("myInventory()", "import START_asn_1; START_asn_1.myInventory('empty')"),
+                        ("read_file", f"import START_asn_1; START_asn_1.myInventory('csv', {FILE_1!r})")):
+        loaded = import_time(code=code, repeat=1)["loaded"]
+        print(f"after {label}: {', '.join(loaded) if loaded else 'no heavy dependencies'} loaded")
+    for module in ("pandas", "PIL.Image", "requests"):
+        print(f"deferred: import {module} {import_time(module=module, repeat=args.repeat)['seconds'] * 1000:.1f} ms")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    suite_parser = commands.add_parser("suite", help="Time the hot paths and check them against a baseline.")
+    suite_parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Rows in each synthetic CSV.")
+    suite_parser.add_argument("--repeat", type=int, default=3, help="Timed runs per operation.")
+    suite_parser.add_argument("--save", help="Write the results to this JSON file.")
+    suite_parser.add_argument("--baseline", help="Compare against results saved earlier with --save.")
+    suite_parser.add_argument("--threshold", type=float, default=1.25, help="Allowed slowdown relative to the baseline.")
+    suite_parser.set_defaults(run=suite)
+
+    compare_parser = commands.add_parser("compare", help="Print before/after numbers for individual optimizations.")
+    compare_parser.add_argument("--rows", type=int, default=100_000, help="Rows in the synthetic CSV.")
+    compare_parser.set_defaults(run=compare)
+
+    importtime_parser = commands.add_parser("importtime", help="Break down the import time of the inventory module.")
+    importtime_parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters timed per measurement.")
+    importtime_parser.add_argument("--top", type=int, default=10, help="Direct imports to list, slowest first.")
+    importtime_parser.set_defaults(run=importtime)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
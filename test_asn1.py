@@ -1,13 +1,24 @@
-from START_asn_1 import myInventory, myProduct
+from START_asn_1 import metrics, myInventory, myMutationLog, myProduct, myQuery, myShardedInventory
 import pytest
+import json
 import math
 import os
+import pandas as pd
+import subprocess
+import sys
 
 def toleranceEquals(a, b, tolerance):
     if math.isclose(a, b, abs_tol=tolerance):
         return True
     else:
         return False
+def productFields(product):
+    return (product.name, product.category, product.subcat, product.imageURL, product.prodURL,
+            product.rating, product.numRate, product.discPrice, product.price)
+@pytest.fixture(params=[False, True], ids=["dict", "columnar"])
+def columnar(request):
+    # Run a test against both product storages
+    return request.param
 FILE_1 = "Strength_Training.csv"
 FILE_2 = "Car_Electronics.csv"
 4
@@ -58,3 +69,1101 @@ def test_carLength():
     stud_val = len(inv_2)
     print("Student Value: ", stud_val, "Real Value: ", real_val)
     assert toleranceEquals(stud_val, real_val, .01)
+
+def test_vectorizedMatchesRows(columnar, tmp_path):
+    for file_path in (FILE_1, FILE_2):
+        inv_rows = myInventory("Rows", columnar=columnar)
+        inv_rows.read_file(file_path, vectorized=False)
+        inv_cols = myInventory("Columns", columnar=columnar)
+        inv_cols.read_file(file_path, vectorized=True)
+        assert list(inv_cols.products) == list(inv_rows.products)
+        for name in inv_rows.products:
+            assert productFields(inv_cols.getProduct(name)) == productFields(inv_rows.getProduct(name))
+
+    # A file with only its header row adds nothing on either path
+    header_only = tmp_path / "header_only.csv"
+    with open(FILE_1) as file:
+        header_only.write_text(file.readline())
+    for vectorized in (False, True):
+        inv = myInventory("Empty", columnar=columnar)
+        assert inv.read_file(str(header_only), vectorized=vectorized) == 0 and len(inv) == 0
+
+def test_columnarMatchesDict(columnar):
+    inv = myInventory("Columns", FILE_1, columnar=columnar)
+    assert len(inv) == len(inv_1)
+    assert inv == inv_1
+    assert [p.name for p in inv.getPrices(5, 10000)] == [p.name for p in inv_1.getPrices(5, 10000)]
+    assert [p.name for p in inv.getCategory("sports & fitness")] == [p.name for p in inv_1.getCategory("sports & fitness")]
+    assert toleranceEquals(inv.itemRating(inv_1_item_1), inv_1_item_1_init_rating, .01)
+    assert inv.getPrices(10, 5) == [] and inv.getCategory("No such category") == []
+    assert inv.getProduct("Not a product") is None and inv.itemRating("Not a product") is None
+    assert myInventory("Empty", columnar=columnar) == myInventory("Empty")
+
+def test_columnarPurchase(columnar):
+    inv = myInventory("Columns", FILE_1, columnar=columnar)
+    inv_dict = myInventory("Dict", FILE_1)
+    order = [(inv_1_item_1, 3), (inv_1_item_1, 0), (inv_1_item_1, 30), ("Not a product", 1)]
+    assert inv.do_purchase(order) == inv_dict.do_purchase(order)
+    assert inv.products[inv_1_item_1]["stock"] == 0
+    # Out of stock lines still get an item, with nothing bought
+    assert inv.do_purchase([(inv_1_item_1, 1)]) == (0, [(inv_1_item_1, 0, 0)])
+    assert inv.do_purchase([]) == (0, [])
+    product = inv.getProduct(inv_1_item_1)
+    product.set_discount_percent(10)
+    assert inv.getProduct(inv_1_item_1).discPrice == inv_dict.getProduct(inv_1_item_1).set_discount_percent(10)
+
+def test_priceIndexTracksChanges(columnar):
+    inv = myInventory("Prices", FILE_1, columnar=columnar)
+    real_val = sum(1 for info in inv.products.values() if 100 <= info["product"].get_purchase_price() <= 500)
+    assert len(inv.getPrices(100, 500, purchase_price=True)) == real_val
+
+    product = inv.getProduct(inv_1_item_1)
+    product.set_disc_price(12345.67)
+    assert inv_1_item_1 in [p.name for p in inv.getPrices(12345, 12346, purchase_price=True)]
+    product.set_discount_percent(100)
+    assert inv_1_item_1 not in [p.name for p in inv.getPrices(12345, 12346, purchase_price=True)]
+    assert inv_1_item_1 in [p.name for p in inv.getPrices(product.price, product.price)]
+
+    # Assigning a field directly still reaches the index
+    product.discPrice = 4321.0
+    assert [p.name for p in inv.getPrices(4321, 4321, purchase_price=True)] == [inv_1_item_1]
+
+    # Replacing a product in place keeps the length the same, but not the index
+    old = inv.getProduct(inv_1_item_1)
+    inv.products[inv_1_item_1] = {"product": myProduct(inv_1_item_1, old.category, old.subcat, old.imageURL,
+                                                       old.prodURL, 4.0, 10, 0, 7777.0), "stock": 5}
+    assert [p.name for p in inv.getPrices(7777, 7777)] == [inv_1_item_1]
+    assert inv.getPrices(4321, 4321, purchase_price=True) == []
+
+    inv.read_file(FILE_2)
+    real_val = sum(1 for info in inv.products.values() if 5 <= info["product"].price <= 10000)
+    assert len(inv.getPrices(5, 10000)) == real_val
+
+def test_priceIndexIgnoresOtherProducts():
+    inv = myInventory("Prices", FILE_1)
+    inv.getPrices(0, 1)
+    product = inv.getProduct(inv_1_item_1)
+    inv.products[inv_1_item_1] = {"product": myProduct.from_validated(*productFields(product)), "stock": 1}
+    inv.getPrices(0, 1)
+    # The replaced product is no longer the inventory's, so changing it doesn't move the new one in the index
+    product.set_disc_price(9876.54)
+    assert inv.getPrices(9876.54, 9876.54, purchase_price=True) == []
+    assert not hasattr(product, "__dict__")
+
+def test_categoryIndex(columnar):
+    inv = myInventory("Categories", FILE_1, columnar=columnar)
+    real_val = len(inv)
+    assert len(inv.getCategory("sports & fitness")) == real_val
+    assert all(isinstance(product, myProduct) for product in inv.getCategory())
+    assert len(inv.getCategory(subcat="Strength Training")) == real_val
+    assert inv.getCategory("not a category") == []
+
+    combined = inv + myInventory("Cars", FILE_2, columnar=columnar)
+    car_names = [product.name for product in combined.iterCategory("car & motorbike", "Car Electronics")]
+    assert len(car_names) == len(combined) - real_val
+    inv.read_file(FILE_2)
+    assert [product.name for product in inv.iterCategory("car & motorbike")] == car_names
+
+    # Moving a product to another category by replacing it in place rebuilds the index
+    old = inv.getProduct(inv_1_item_1)
+    moved = myProduct(inv_1_item_1, "toys", "Balls", old.imageURL, old.prodURL, old.rating, old.numRate, old.discPrice, old.price)
+    inv.products[inv_1_item_1] = {"product": moved, "stock": 10}
+    assert [product.name for product in inv.getCategory("toys")] == [inv_1_item_1]
+    assert len(inv.getCategory("sports & fitness")) == real_val - 1
+
+    # So does setting category or subcat on a product the index already holds
+    inv = myInventory("Categories", FILE_1, columnar=columnar)
+    inv.getCategory("sports & fitness")
+    inv.averageRating("sports & fitness")
+    toys = myQuery().category("toys")
+    assert inv.query(toys) == []
+    product = inv.getProduct(inv_1_item_1)
+    product.category = "toys"
+    assert [product.name for product in inv.getCategory("toys")] == [inv_1_item_1]
+    assert [product.name for product in inv.query(toys)] == [inv_1_item_1]
+    assert len(inv.getCategory("sports & fitness")) == real_val - 1
+    assert inv.averageRating("toys") == product.rating
+    product.subcat = "Balls"
+    assert [product.name for product in inv.getCategory("toys", "Balls")] == [inv_1_item_1]
+    assert inv.getCategory(subcat="Balls")[0].name == inv_1_item_1
+    assert len(inv.getCategory(subcat="Strength Training")) == real_val - 1
+
+def test_chunkedRead(columnar):
+    reports = []
+    inv = myInventory("Chunks", columnar=columnar)
+    assert inv.read_file(FILE_1, chunksize=100, progress=lambda rows, products: reports.append((rows, products))) == len(inv_1)
+    assert list(inv.products) == list(inv_1.products)
+    assert reports[-1] == (1104, len(inv_1))
+    assert len(reports) == 12
+
+    # A chunk size larger than the file reads it in one chunk
+    reports.clear()
+    inv = myInventory("One chunk", columnar=columnar)
+    inv.read_file(FILE_1, chunksize=10 ** 6, progress=lambda rows, products: reports.append((rows, products)))
+    assert reports == [(1104, len(inv_1))]
+
+def test_fromFiles(columnar):
+    inv = myInventory.from_files([FILE_1, FILE_2], columnar=columnar, processes=2)
+    assert len(inv) == len(inv_1 + inv_2)
+    assert list(inv.products) == list((inv_1 + inv_2).products)
+
+def test_mixedStorageMerge(columnar):
+    # Either storage can be merged into either, and the result's indexes track its own products
+    first = myInventory("First", FILE_1, columnar=columnar)
+    second = myInventory("Second", FILE_2, columnar=not columnar)
+    combined = first + second
+    assert combined.columnar == columnar
+    assert list(combined.products) == list((inv_1 + inv_2).products)
+    assert combined == myInventory.merge([first, second], columnar=columnar)
+
+    car = next(iter(second.products))
+    assert combined.getPrices(7777.77, 7777.77, purchase_price=True) == []
+    for name in (inv_1_item_1, car):
+        combined.getProduct(name).set_disc_price(7777.77)
+    assert sorted(product.name for product in combined.getPrices(7777.77, 7777.77, purchase_price=True)) == sorted([inv_1_item_1, car])
+    assert second.getPrices(7777.77, 7777.77, purchase_price=True) == []
+    combined.do_purchase([(car, 4)])
+    assert combined.products[car]["stock"] == 6 and second.products[car]["stock"] == 10
+
+def test_sum():
+    total = sum([inv_1, inv_2, inv_1])
+    assert len(total) == len(inv_1 + inv_2)
+    assert len(inv_1) == 1097 and len(inv_2) == 976
+    assert total.getProduct(inv_1_item_1) is inv_1.getProduct(inv_1_item_1)
+    assert myInventory.merge([inv_1, inv_2, inv_1]) == total
+
+    # sum() never changes the inventories summed
+    total = sum([inv_1])
+    assert total is not inv_1 and total == inv_1
+    total + inv_2
+    assert len(inv_1) == 1097 and len(inv_2) == 976
+
+def test_sumIsLinear(monkeypatch):
+    # Each step of sum() merges only the inventory being added into one running total, never copying the total
+    merged = []
+    merge_from = myInventory._merge_from
+    monkeypatch.setattr(myInventory, "_merge_from", lambda self, other: merged.append((self, other)) or merge_from(self, other))
+    total = sum([inv_1, inv_2, inv_1])
+    assert all(inventory is total for inventory, _ in merged)
+    assert [other for _, other in merged] == [inv_1, inv_2, inv_1] and merged[0][1] is inv_1
+    assert len(total) == len(inv_1 + inv_2)
+    assert len(inv_1) == 1097 and len(inv_2) == 976
+
+@pytest.mark.parametrize("load_columnar", [False, True])
+def test_snapshotRoundTrip(tmp_path, columnar, load_columnar):
+    inv = myInventory("Snapshot", FILE_1, columnar=columnar)
+    inv.do_purchase([(inv_1_item_1, 4)])
+    inv.addReviews(inv_1_item_1, 1, 100)
+    path = str(tmp_path / "inventory.npz")
+    inv.save_snapshot(path)
+
+    restored = myInventory.load_snapshot(path, columnar=load_columnar)
+    assert restored == inv
+    assert restored.inv_name == "Snapshot"
+    assert restored.products[inv_1_item_1]["stock"] == 6
+    for name in inv.products:
+        assert repr(restored.getProduct(name)) == repr(inv.getProduct(name))
+        assert restored.getProduct(name).imageURL == inv.getProduct(name).imageURL
+
+    # Stock settings and per-product reorder points survive the round trip
+    inv = myInventory("Settings", FILE_1, columnar=columnar, default_stock=7, reorder_point=5)
+    inv.setReorderPoint(inv_1_item_1, 8)
+    inv.save_snapshot(path)
+    restored = myInventory.load_snapshot(path, columnar=load_columnar)
+    assert (restored.default_stock, restored.reorder_point) == (7, 5)
+    assert restored._reorder_points == {inv_1_item_1: 8}
+    assert restored.lowStock() == inv.lowStock()
+
+    empty = str(tmp_path / "empty.npz")
+    myInventory("Empty", columnar=columnar).save_snapshot(empty)
+    assert len(myInventory.load_snapshot(empty, columnar=load_columnar)) == 0
+
+def test_slottedProduct():
+    import pickle
+    product = inv_1.getProduct(inv_1_item_1)
+    assert not hasattr(product, "__dict__")
+    fast = myProduct.from_validated(*productFields(product))
+    slow = myProduct(*productFields(product))
+    assert productFields(fast) == productFields(slow)
+    assert fast == slow and not fast < slow
+    assert fast.get_purchase_price() == slow.get_purchase_price()
+    assert fast.add_rating(5, 10) == slow.add_rating(5, 10)
+    assert productFields(pickle.loads(pickle.dumps(fast))) == productFields(fast)
+
+    # Views of a columnar inventory pickle as plain products
+    view = myInventory("Columns", FILE_1, columnar=True).getProduct(inv_1_item_1)
+    copy = pickle.loads(pickle.dumps(view))
+    assert type(copy) is myProduct and productFields(copy) == productFields(view)
+
+def test_concurrentPurchase(columnar):
+    import threading
+    inv = myInventory("Threads", FILE_1, columnar=columnar)
+    names = list(inv.products)[:8]
+    for name in names:
+        inv.adjust_stock(name, 500)
+    bought = []
+
+    def worker(seed):
+        for i in range(300):
+            order = [(names[(seed + i) % len(names)], 1 + i % 3), (names[(seed * 3 + i) % len(names)], 2)]
+            _, items = inv.do_purchase(order, atomic=(i % 2 == 0))
+            bought.extend(items)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for name in names:
+        stock = inv.products[name]["stock"]
+        assert stock >= 0
+        assert stock + sum(quantity for item, quantity, _ in bought if item == name) == 500
+
+def test_atomicPurchase(columnar):
+    inv = myInventory("Atomic", FILE_1, columnar=columnar)
+    other = "GISCO Power Running Training Speed Sled | Red"
+    assert inv.do_purchase([(inv_1_item_1, 3), (other, 11)], atomic=True) == (0, [])
+    assert inv.products[inv_1_item_1]["stock"] == 10
+    assert inv.do_purchase([(inv_1_item_1, 3), ("Not a product", 1)], atomic=True) == (0, [])
+    total, items = inv.do_purchase([(inv_1_item_1, 3), (other, 10)], atomic=True)
+    assert [quantity for _, quantity, _ in items] == [3, 10]
+    assert inv.products[other]["stock"] == 0
+
+    # The same product twice in one order needs the sum of both lines in stock
+    assert inv.do_purchase([(inv_1_item_1, 4), (inv_1_item_1, 4)], atomic=True) == (0, [])
+    assert inv.products[inv_1_item_1]["stock"] == 7
+
+def randomOrders(count, seed=7):
+    import random
+    names = list(inv_1.products)[:20] + ["Not a product"]
+    rng = random.Random(seed)
+    return [[(rng.choice(names), rng.randint(0, 6)) for _ in range(rng.randint(0, 4))] for _ in range(count)]
+
+def test_purchaseBatch(columnar):
+    orders = randomOrders(200)
+    inv_seq = myInventory("Sequential", FILE_1, columnar=columnar)
+    real_val = [inv_seq.do_purchase(order) for order in orders]
+    inv_batch = myInventory("Batch", FILE_1, columnar=columnar)
+    assert inv_batch.do_purchase_batch(orders) == real_val
+    assert all(inv_batch.products[name]["stock"] == info["stock"] for name, info in inv_seq.products.items())
+
+    frame = pd.DataFrame([(f"order {i}", name, quantity) for i, order in enumerate(orders) for name, quantity in order],
+                         columns=["order_id", "name", "quantity"])
+    inv_frame = myInventory("Frame", FILE_1, columnar=columnar)
+    assert inv_frame.do_purchase_batch(frame) == [result for result, order in zip(real_val, orders) if order]
+
+def test_purchaseBatchMissingValues():
+    inv = myInventory("Frame", FILE_1)
+    frame = pd.DataFrame({"order_id": ["a", None, "b"], "name": [inv_1_item_1] * 3, "quantity": [1, 1, 1]})
+    with pytest.raises(ValueError, match="order_id"):
+        inv.do_purchase_batch(frame)
+    assert inv.products[inv_1_item_1]["stock"] == 10
+
+    # A line without a name is skipped like one for an unknown product
+    frame = pd.DataFrame({"order_id": ["a", "a", "b"], "name": [inv_1_item_1, None, inv_1_item_1], "quantity": [1, 1, 2]})
+    price = inv.getProduct(inv_1_item_1).get_purchase_price()
+    assert inv.do_purchase_batch(frame) == [(price, [(inv_1_item_1, 1, price)]), (2 * price, [(inv_1_item_1, 2, 2 * price)])]
+
+def test_imageCache(tmp_path):
+    import io
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from PIL import Image
+    from START_asn_1 import myImageCache
+
+    images = {}
+    for i, color in enumerate(["red", "green", "blue"]):
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 48), color).save(buffer, format="PNG")
+        images[f"/img{i}.png"] = buffer.getvalue()
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            body = images.get(self.path)
+            self.send_response(200 if body else 404)
+            self.end_headers()
+            self.wfile.write(body or b"")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        inv = myInventory("Images")
+        for i in range(4):
+            product = myProduct(f"Item {i}", "cat", "sub", f"{base}/img{i}.png", "", 4.0, 1, 0, 10)
+            inv.products[product.name] = {"product": product, "stock": 10}
+
+        cache = myImageCache(cache_dir=str(tmp_path / "images"), max_workers=4, timeout=5)
+        assert inv.prefetch_images(category="cat", cache=cache) == 3
+        assert sorted(requests_seen) == ["/img0.png", "/img1.png", "/img2.png", "/img3.png"]
+        # Images cached already count too, without being downloaded again
+        assert inv.prefetch_images(category="cat", cache=cache) == 3
+        assert len(requests_seen) == 5
+
+        image = inv.getProduct("Item 1").displayIMG(cache=cache)
+        assert image.size == (64, 48)
+        thumbnail = inv.getProduct("Item 1").displayIMG(size=(16, 16), cache=cache)
+        assert thumbnail.size == (16, 12)
+        # Callers get their own copy of the cached thumbnail, so drawing on one doesn't change the next
+        thumbnail.paste((0, 0, 0), (0, 0, 16, 12))
+        again = inv.getProduct("Item 1").displayIMG(size=(16, 16), cache=cache)
+        assert again is not thumbnail
+        assert again.getpixel((0, 0)) == (0, 128, 0)
+        assert inv.getProduct("Item 3").displayIMG(cache=cache) is None
+        assert len(requests_seen) == 6
+
+        # A new cache over the same directory finds the files on disk
+        reopened = myImageCache(cache_dir=str(tmp_path / "images"))
+        assert reopened.fetch(f"{base}/img2.png") == images["/img2.png"]
+        assert len(requests_seen) == 6
+
+        # Least recently used files are evicted past max_bytes
+        small = myImageCache(cache_dir=str(tmp_path / "small"), max_bytes=2 * max(map(len, images.values())))
+        for i in (0, 1, 0, 2):
+            small.fetch(f"{base}/img{i}.png")
+        assert small._cached_bytes(f"{base}/img0.png") is not None
+        assert small._cached_bytes(f"{base}/img1.png") is None
+        assert small._bytes == sum(len(images[f"/img{i}.png"]) for i in (0, 2))
+
+        # Downloads between index writes share one write, which close() makes
+        batched = myImageCache(cache_dir=str(tmp_path / "batched"))
+        batched.INDEX_SAVE_INTERVAL = 60
+        for i in range(3):
+            batched.fetch(f"{base}/img{i}.png")
+        assert not os.path.exists(batched._index_path)
+        batched.close()
+        with open(batched._index_path) as file:
+            assert len(json.load(file)) == 3
+    finally:
+        server.shutdown()
+
+def test_sharedImageCache(monkeypatch):
+    # Threads asking for the shared cache at once all get the same one
+    import threading
+    import time
+    import START_asn_1
+    monkeypatch.setattr(START_asn_1, "_image_cache", None)
+    monkeypatch.setattr(START_asn_1, "myImageCache", lambda: time.sleep(0.05) or object())
+    caches = []
+    threads = [threading.Thread(target=lambda: caches.append(START_asn_1.get_image_cache())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(caches) == 8 and len({id(cache) for cache in caches}) == 1
+
+def test_ratingAggregates(columnar):
+    inv = myInventory("Ratings", FILE_1, columnar=columnar)
+    inv.read_file(FILE_2)
+    products = [info["product"] for info in inv.products.values()]
+    top = [product.rating for product in inv.topRated(5)]
+    assert top[0] == max(product.rating for product in products) and top == sorted(top, reverse=True)
+
+    cars = [product for product in products if product.category == "car & motorbike"]
+    assert toleranceEquals(inv.averageRating("car & motorbike"), sum(p.rating for p in cars) / len(cars), 1e-9)
+    real_val = sum(p.rating * p.numRate for p in cars) / sum(p.numRate for p in cars)
+    assert toleranceEquals(inv.averageRating("car & motorbike", weighted=True), real_val, 1e-9)
+
+    # Many high reviews push a product to the top of both rankings
+    inv.addReviews(inv_1_item_1, 10, 100000)
+    assert inv.topRated(1)[0].name == inv_1_item_1
+    assert inv.topRated(1, category="sports & fitness", weighted=True)[0].name == inv_1_item_1
+    assert inv_1_item_1 not in [p.name for p in inv.topRated(50, category="car & motorbike")]
+    products = [info["product"] for info in inv.products.values()]
+    assert toleranceEquals(inv.averageRating(), sum(p.rating for p in products) / len(products), 1e-9)
+    assert inv.averageRating("not a category") is None
+
+    # Assigning a rating directly moves the product in the rankings too
+    inv.getProduct(inv_1_item_1).rating = 0.0
+    assert inv_1_item_1 not in [p.name for p in inv.topRated(5)]
+    products = [info["product"] for info in inv.products.values()]
+    assert toleranceEquals(inv.averageRating(), sum(p.rating for p in products) / len(products), 1e-9)
+
+def test_ratingIndexConcurrentReviews(columnar):
+    import random
+    import threading
+    inv = myInventory("Ratings", FILE_1, columnar=columnar)
+    names = list(inv.products)
+    inv.topRated(1)
+
+    # Readers wait while a rating change holds the price lock for writing
+    answered = threading.Event()
+    with inv._price_lock.write():
+        thread = threading.Thread(target=lambda: (inv.topRated(1), inv.averageRating(), answered.set()))
+        thread.start()
+        assert not answered.wait(0.2)
+    thread.join(timeout=60)
+    assert answered.is_set()
+
+    done = threading.Event()
+    errors = []
+
+    # Each writer reviews its own products, since two reviews of one product at once race on the product itself
+    def review(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(2000):
+                inv.addReviews(rng.choice(names[seed::2]), rng.uniform(1, 5), rng.randint(1, 5))
+        except Exception as error:
+            errors.append(error)
+
+    def read():
+        try:
+            while not done.is_set():
+                assert len(inv.topRated(10, weighted=True)) == 10
+                assert 0 < inv.averageRating() <= 5
+        except Exception as error:
+            errors.append(error)
+
+    writers = [threading.Thread(target=review, args=(seed,)) for seed in range(2)]
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for thread in writers + readers:
+        thread.start()
+    for thread in writers:
+        thread.join(timeout=60)
+    done.set()
+    for thread in readers:
+        thread.join(timeout=60)
+    assert not errors and not any(thread.is_alive() for thread in writers + readers)
+
+    # The index kept up with every review, so it matches one built from scratch
+    top = [product.name for product in inv.topRated(20)]
+    average = inv.averageRating(weighted=True)
+    inv._rating_index = None
+    assert [product.name for product in inv.topRated(20)] == top
+    assert toleranceEquals(inv.averageRating(weighted=True), average, 1e-9)
+
+def test_reviewsBatch(tmp_path, columnar):
+    import random
+    names = list(inv_1.products)[:50] + ["Not a product"]
+    rng = random.Random(3)
+    records = [(rng.choice(names), rng.uniform(1, 5), rng.randint(1, 20)) for _ in range(2000)]
+    records += [(names[0], "not a rating", 1)]
+    frame = pd.DataFrame(records, columns=["product_name", "rating", "numberRate"])
+    path = str(tmp_path / "reviews.csv")
+    frame.to_csv(path, index=False)
+
+    inv_seq = myInventory("Sequential", FILE_1, columnar=columnar)
+    for name, rating, count in records:
+        inv_seq.addReviews(name, rating, count)
+    for reviews in (frame, path, (frame["product_name"], frame["rating"], frame["numberRate"])):
+        inv_batch = myInventory("Batch", FILE_1, columnar=columnar)
+        inv_batch.topRated(1)
+        assert len(inv_batch.addReviewsBatch(reviews)) == 50
+        for name in names[:-1]:
+            assert toleranceEquals(inv_batch.itemRating(name), inv_seq.itemRating(name), 1e-9)
+            assert inv_batch.getProduct(name).numRate == inv_seq.getProduct(name).numRate
+        assert toleranceEquals(inv_batch.averageRating(weighted=True), inv_seq.averageRating(weighted=True), 1e-9)
+
+def test_reviewsBatchFractionalCounts(columnar):
+    # Both truncate 2.5 to 2 ratings, as int() does, and skip "3.7"
+    other = "GISCO Power Running Training Speed Sled | Red"
+    records = [(inv_1_item_1, 5.0, "3.7"), (inv_1_item_1, 1.0, 2.5), (inv_1_item_1, 2.0, "4"), (other, 3.0, 2.0)]
+    inv_seq = myInventory("Sequential", FILE_1, columnar=columnar)
+    for name, rating, count in records:
+        inv_seq.addReviews(name, rating, count)
+    inv_batch = myInventory("Batch", FILE_1, columnar=columnar)
+    inv_batch.addReviewsBatch(pd.DataFrame(records, columns=["product_name", "rating", "numberRate"]))
+    for name in (inv_1_item_1, other):
+        assert inv_batch.getProduct(name).numRate == inv_seq.getProduct(name).numRate
+        assert toleranceEquals(inv_batch.itemRating(name), inv_seq.itemRating(name), 1e-9)
+    assert inv_seq.getProduct(inv_1_item_1).numRate == inv_1.getProduct(inv_1_item_1).numRate + 6
+
+def test_bulkReprice(columnar):
+    inv = myInventory("Reprice", FILE_1, columnar=columnar)
+    inv.read_file(FILE_2)
+    expected = myInventory("Expected", FILE_1, columnar=columnar)
+    expected.read_file(FILE_2)
+    inv.getPrices(0, 1, purchase_price=True)
+    if columnar:
+        column = inv.products._arrays["discPrice"]
+
+    real_val = 0
+    for product in expected.getCategory("sports & fitness"):
+        if 500 <= product.price <= 2000:
+            product.set_discount_percent(15)
+            real_val += 1
+    assert inv.reprice(percent=15, category="sports & fitness", min_price=500, max_price=2000) == real_val
+    assert inv.reprice(price=99.5, subcat="Car Electronics") == len(inv.getCategory(subcat="Car Electronics"))
+    for product in expected.getCategory(subcat="Car Electronics"):
+        product.set_disc_price(99.5)
+
+    for name in inv.products:
+        assert inv.getProduct(name).discPrice == expected.getProduct(name).discPrice
+    for low, high in ((0, 100), (99.5, 99.5), (400, 1700), (0, 1e9)):
+        stud_val = sorted(p.name for p in inv.getPrices(low, high, purchase_price=True))
+        real_val = sorted(name for name, info in expected.products.items() if low <= info["product"].get_purchase_price() <= high)
+        assert stud_val == real_val
+    if columnar:
+        # The prices are written into the existing column rather than a new copy
+        assert inv.products._arrays["discPrice"] is column
+
+    with pytest.raises(ValueError):
+        inv.reprice(category="sports & fitness")
+    with pytest.raises(ValueError):
+        inv.reprice(price=-1)
+
+def test_repriceSharedProducts():
+    import threading
+    first, second = myInventory("First", FILE_1), myInventory("Second", FILE_2)
+    combined = first + second
+    first.getPrices(0, 1, purchase_price=True)
+    combined.getPrices(0, 1, purchase_price=True)
+
+    # Both inventories hold the same product objects and reprice them at once from two threads
+    threads = [threading.Thread(target=inv.reprice, kwargs={"price": price, "category": "sports & fitness"})
+               for inv, price in ((first, 11.0), (combined, 12.0)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=30)
+    assert not any(thread.is_alive() for thread in threads)
+
+    price = first.getProduct(inv_1_item_1).discPrice
+    assert price in (11.0, 12.0)
+    for inv in (first, combined):
+        assert len(inv.getPrices(price, price, purchase_price=True)) == len(first)
+
+def test_purchaseDuringReprice(columnar):
+    import threading
+    inv = myInventory("Reprice", FILE_1, columnar=columnar, default_stock=10**6)
+    names = list(inv.products)[:2]
+    inv.reprice(price=10.0)
+    locked = inv._price_lock
+    # Purchases don't take the price lock while no reprice runs
+    inv._price_lock = None
+    assert inv.do_purchase([(names[0], 1), (names[1], 2)]) == (30.0, [(names[0], 1, 10.0), (names[1], 2, 20.0)])
+    assert inv.do_purchase([(names[0], 1)], atomic=True) == (10.0, [(names[0], 1, 10.0)])
+    inv._price_lock = locked
+
+    # Each order is priced wholly before or wholly after each reprice
+    done = threading.Event()
+
+    def reprice():
+        for price in [20.0, 10.0] * 200:
+            inv.reprice(price=price)
+        done.set()
+
+    orders = []
+
+    def purchase(atomic):
+        while not done.is_set():
+            orders.append(inv.do_purchase([(names[0], 1), (names[1], 1)], atomic=atomic)[1])
+
+    threads = [threading.Thread(target=reprice)] + [threading.Thread(target=purchase, args=(atomic,)) for atomic in (False, True)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    assert not any(thread.is_alive() for thread in threads)
+    assert orders and all(first[2] == second[2] for first, second in orders)
+
+def test_readWriteLock():
+    import threading
+    from START_asn_1 import _ReadWriteLock
+    lock = _ReadWriteLock()
+    writer_done = threading.Event()
+
+    def writer():
+        with lock.write():
+            writer_done.set()
+
+    with lock.read():
+        thread = threading.Thread(target=writer)
+        thread.start()
+        while not lock._writers_waiting:
+            pass
+        # A nested read goes ahead of the waiting writer instead of deadlocking with it
+        with lock.read():
+            assert not writer_done.is_set()
+        with pytest.raises(RuntimeError):
+            with lock.write():
+                pass
+    thread.join(timeout=5)
+    assert writer_done.is_set()
+
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+        assert lock._writer == threading.get_ident()
+    assert lock._writer is None and not lock._readers
+
+def test_searchProducts(columnar):
+    inv = myInventory("Search", FILE_2, columnar=columnar)
+    found = [product.name for product in inv.searchProducts("zqwint blue car adap")]
+    assert found and found[0].startswith("ZQWINT Bluetooth Car Adapter")
+    assert all("bluetooth" in name.lower() for name in (p.name for p in inv.searchProducts("bluetooth", limit=50)))
+    assert inv.searchProducts("zqwint bluetoth", fuzzy=False) == []
+    assert inv.searchProducts("zqwint bluetoth", fuzzy=True)[0].name.startswith("ZQWINT")
+    assert inv.searchProducts("") == [] and inv.searchProducts("...") == []
+
+    assert inv.searchProducts("reebok resistance") == []
+    inv.read_file(FILE_1)
+    assert inv.searchProducts("reebok resistance tube")[0].name == inv_1_item_1
+
+    # Products set through inv.products directly are found too
+    inv.products["Quantum Flux Capacitor"] = {"product": myProduct("Quantum Flux Capacitor", "cat", "sub", "", "", 4, 1, 0, 10), "stock": 1}
+    assert [product.name for product in inv.searchProducts("flux capac")] == ["Quantum Flux Capacitor"]
+
+def test_benchmarkHelpers(tmp_path):
+    from bench_asn1 import find_regressions, make_csv
+    path = make_csv(2500, directory=str(tmp_path), chunk_rows=1000)
+    assert len(myInventory("Synthetic", path)) == 2500
+    assert len(myInventory("Synthetic", path, columnar=True)) == 2500
+    baseline = {"read_file@1000": {"seconds": 1.0}, "getPrices@1000": {"seconds": 1.0}}
+    results = {"read_file@1000": {"seconds": 1.2}, "getPrices@1000": {"seconds": 1.3}, "do_purchase@1000": {"seconds": 9.0}}
+    assert [message.split(":")[0] for message in find_regressions(results, baseline, 1.25)] == ["getPrices@1000"]
+    assert find_regressions(results, {}, 1.25) == []
+
+@pytest.mark.parametrize("vectorized", [False, True])
+def test_metrics(tmp_path, vectorized):
+    path = tmp_path / "bad.csv"
+    data = pd.read_csv(FILE_1).head(5).assign(ratings=["4.1", "4.1.2", "3.9", "..", "4.4"])
+    # A row bad in two columns counts once, under the first column parsed
+    data["discount_price"] = data["discount_price"].astype(object)
+    data.loc[1, "discount_price"] = "1.2.3"
+    data.to_csv(path, index=False)
+    metrics.reset()
+    metrics.enabled = True
+    try:
+        inv = myInventory("Metrics")
+        inv.read_file(str(path), vectorized=vectorized)
+        inv.getPrices(0, 10000)
+        inv.getCategory(next(iter(inv.products.values()))["product"].category)
+        with pytest.raises(TypeError):
+            inv.do_purchase([None])
+    finally:
+        metrics.enabled = False
+    assert metrics.parse_failures == {"discount_price": 1, "ratings": 1}
+    assert len(inv) == 3
+    assert metrics.calls == {"read_file": 1, "getPrices": 1, "getCategory": 1, "do_purchase": 1}
+    assert metrics.errors == {"do_purchase": 1}
+    text = metrics.to_prometheus()
+    assert 'inventory_latency_seconds_bucket{operation="getPrices",le="+Inf"} 1' in text
+    assert 'inventory_parse_failures_total{column="ratings"} 1' in text
+    assert json.loads(metrics.to_json())["calls"]["read_file"] == 1
+    inv.getPrices(0, 10000)
+    assert metrics.calls["getPrices"] == 1
+
+def test_lazyImport():
+    code = ("import logging, sys, START_asn_1\n"
+            "print(sorted(name for name in ('numpy', 'pandas', 'PIL', 'requests') if name in sys.modules), logging.getLogger().handlers)\n"
+            f"START_asn_1.myInventory('lazy', {FILE_1!r})\n"
+            "print('pandas' in sys.modules, 'PIL' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split("\n")[:2]
+    assert output == ["[] []", "True False"]
+
+def test_query(columnar):
+    inv = myInventory("Query", FILE_2, columnar=columnar)
+    category = next(iter(inv.products.values()))["product"].category
+    inv.adjust_stock(list(inv.products)[0], 0)
+    queries = [
+        myQuery().category(category).price(100, 500).rating(4).in_stock(),
+        myQuery().purchase_price(high=300) & myQuery().numRate(1000),
+        myQuery().rating(4.2, 4.4),
+        myQuery().price(100, 200) & myQuery().price(150, 300),
+        myQuery().category(category) & myQuery().category("No such category"),
+    ]
+    if columnar:
+        # Build the price index so the selective price ranges start from it
+        inv.getPrices(0, 1)
+    for query in queries:
+        expected = {name for name, info in inv.products.items() if query.matches(info["product"], info["stock"])}
+        assert {product.name for product in inv.query(query)} == expected
+    assert inv.query(queries[4]) == []
+
+    by_rating = inv.query(myQuery().rating(4), order_by="-rating", limit=5)
+    assert [product.rating for product in by_rating] == sorted((p.rating for p in inv.query(myQuery().rating(4))), reverse=True)[:5]
+    with pytest.raises(ValueError):
+        inv.query(myQuery(), order_by="name")
+
+    # Cached results follow stock, price and rating changes
+    in_stock = myQuery().in_stock()
+    name = inv.query(in_stock, order_by="price", limit=1)[0].name
+    inv.do_purchase([(name, 1000)])
+    assert name not in {product.name for product in inv.query(in_stock)}
+    cheap = myQuery().purchase_price(0.4, 0.6)
+    assert inv.query(cheap) == []
+    inv.getProduct(name).set_disc_price(0.5)
+    assert [product.name for product in inv.query(cheap)] == [name]
+    top = myQuery().rating(4.99)
+    before = len(inv.query(top))
+    inv.addReviews(name, 5, 10**7)
+    assert len(inv.query(top)) == before + 1
+
+def test_queryCacheOrderOnly(columnar):
+    # Results of queries that only sort on a field are dropped from the cache when that field changes
+    inv = myInventory("Query", FILE_2, columnar=columnar)
+    everything = myQuery().category(next(iter(inv.products.values()))["product"].category)
+    cheapest = inv.query(everything, order_by="purchase_price", limit=1)[0]
+    cheapest.set_disc_price(10**7)
+    assert inv.query(everything, order_by="-purchase_price", limit=1)[0].name == cheapest.name
+
+    inv = myInventory("Query", FILE_2, columnar=columnar)
+    inv.query(everything, order_by="rating")[0].rating = 5.0
+    ratings = [product.rating for product in inv.query(everything, order_by="rating")]
+    assert ratings == sorted(ratings)
+
+    inv = myInventory("Query", FILE_2, columnar=columnar)
+    last = inv.query(everything, order_by="-rating")[-1].name
+    inv.addReviewsBatch(([last], [5.0], [10**7]))
+    ratings = [product.rating for product in inv.query(everything, order_by="-rating")]
+    assert ratings == sorted(ratings, reverse=True)
+
+    # So are results of products replaced through inv.products
+    first = inv.query(everything, order_by="price", limit=1)[0]
+    inv.products[first.name] = {"product": myProduct(first.name, first.category, first.subcat, first.imageURL,
+                                                     first.prodURL, first.rating, first.numRate, 0, 10**9), "stock": 1}
+    assert inv.query(everything, order_by="-price", limit=1)[0].name == first.name
+
+def test_mutationLog(tmp_path, columnar):
+    log_path, snapshot_path = str(tmp_path / "inventory.log"), str(tmp_path / "inventory.npz")
+    inv = myInventory.recover(log_path, snapshot_path, FILE_1, inv_name="Logged", columnar=columnar, compact_bytes=None)
+    names = list(inv.products)
+    inv.do_purchase([(names[0], 3), (names[1], 1)])
+    inv.do_purchase_batch([[(names[2], 2)], [(names[2], 4)]])
+    inv.adjust_stock(names[3], 42)
+    inv.getProduct(names[4]).set_disc_price(12.5)
+    inv.reprice(percent=10, category=inv.getProduct(names[5]).category, max_price=1000)
+    inv.addReviews(names[6], 1, 100)
+    inv.addReviewsBatch(([names[7], names[8]], [5, 2], [10, 20]))
+    inv.setReorderPoint(names[1], 8)
+    inv.setReorderPoint(names[2], 4)
+    inv.checkpoint()
+    inv.do_purchase([(names[9], 5)], atomic=True)
+    inv.getProduct(names[0]).set_discount_percent(50)
+    inv.setReorderPoint(names[2], None)
+    inv.restock(([names[3]], [0], [50]))
+    inv.getProduct(names[10]).price = 99.0
+    inv.getProduct(names[11]).price = 1234.5
+    inv.getProduct(names[11]).set_disc_price(1000.0)
+
+    # Simulate a crash in the middle of writing a record
+    with open(log_path, "ab") as file:
+        file.write(b'["s","' + names[1].encode() + b'",')
+
+    # Either storage can recover the log
+    for recovered_columnar in (False, True):
+        recovered = myInventory.recover(log_path, snapshot_path, columnar=recovered_columnar, compact_bytes=None)
+        stud_val = [(info["stock"], productFields(info["product"])) for info in map(recovered.products.__getitem__, names)]
+        real_val = [(info["stock"], productFields(info["product"])) for info in map(inv.products.__getitem__, names)]
+        assert stud_val == real_val
+        assert recovered.inv_name == "Logged"
+        assert recovered._reorder_points == {names[1]: 8, names[3]: 50}
+        assert recovered.lowStock() == inv.lowStock()
+    assert myMutationLog.read(log_path) == ({}, {}, {}, {}, {})
+
+    # Interval mode writes on close
+    log = myMutationLog(str(tmp_path / "interval.log"), fsync="interval", interval=60)
+    log.append(("s", "x", 1))
+    log.close()
+    assert myMutationLog.read(str(tmp_path / "interval.log"))[0] == {"x": 1}
+    with pytest.raises(ValueError):
+        myMutationLog(str(tmp_path / "bad.log"), fsync="sometimes")
+
+    # Price records written before base prices were logged carry only the discount price
+    old_path = str(tmp_path / "old.log")
+    with open(old_path, "w") as file:
+        file.write('["p","x",2.5]\n["p","y",3.5,4.0]\n')
+    assert myMutationLog.read(old_path)[1] == {"x": (2.5, None), "y": (3.5, 4.0)}
+
+def test_mutationLogInserts(tmp_path, columnar):
+    log_path, snapshot_path = str(tmp_path / "inventory.log"), str(tmp_path / "inventory.npz")
+    expected = inv_1 + inv_2
+    car = next(iter(inv_2.products))
+    inv = myInventory.recover(log_path, snapshot_path, FILE_1, columnar=columnar, compact_bytes=None)
+    inv.read_file(FILE_2)
+    inv.adjust_stock(car, 3)
+    inv.getProduct(car).set_disc_price(1.5)
+    inv._log.close()
+
+    # Recovering from the log alone, without a checkpoint, brings back the products added after it was opened
+    recovered = myInventory.recover(log_path, snapshot_path, columnar=not columnar, compact_bytes=None)
+    assert list(recovered.products) == list(expected.products)
+    assert recovered.products[car]["stock"] == 3
+    assert recovered.getProduct(car).discPrice == 1.5
+    assert len(recovered.getCategory(subcat="Car Electronics")) == len(inv_2)
+
+    # The row-by-row reader logs a whole file with one commit, and size() counts what was written
+    log_path = str(tmp_path / "rows.log")
+    inv = myInventory.recover(log_path, str(tmp_path / "rows.npz"), columnar=columnar, compact_bytes=None)
+    commits = []
+    commit = inv._log.commit
+    inv._log.commit = lambda *args: commits.append(args) or commit(*args)
+    inv.read_file(FILE_2, vectorized=False)
+    assert len(commits) == 1
+    assert inv._log.size() == os.path.getsize(log_path)
+    assert list(myMutationLog.read(log_path)[3]) == list(inv_2.products)
+
+def test_mutationLogTornTail(tmp_path):
+    path = str(tmp_path / "torn.log")
+    log = myMutationLog(path)
+    log.append(("s", "a", 1))
+    log.commit()
+    log.close()
+    with open(path, "ab") as file:
+        file.write(b'["s","b",')
+
+    # Appending after a torn record starts on a new line instead of gluing onto it
+    log = myMutationLog(path)
+    log.append(("s", "c", 3))
+    log.commit()
+    log.close()
+    assert myMutationLog.read(path)[0] == {"a": 1, "c": 3}
+    with open(path, "rb") as file:
+        assert file.read().count(b"\n") == 2
+
+def test_shardedInventory(columnar):
+    inv = myInventory("Single", FILE_2, columnar=columnar, reorder_point=3)
+    inv.read_file(FILE_1)
+    names = list(inv.products)
+    inv.setReorderPoint(names[5], 50)
+    with myShardedInventory("Sharded", shards=3, inventory=inv) as sharded:
+        assert len(sharded) == len(inv)
+        assert sharded == inv and inv == sharded
+        for category, subcat in ((None, "Car Electronics"), ("sports, fitness & outdoors", None), (None, None), ("No such category", None)):
+            assert [p.name for p in sharded.getCategory(category, subcat)] == [p.name for p in inv.getCategory(category, subcat)]
+        for purchase_price in (False, True):
+            assert [p.name for p in sharded.getPrices(100, 500, purchase_price)] == [p.name for p in inv.getPrices(100, 500, purchase_price)]
+
+        order = [(names[i], 1 + i % 4) for i in range(0, 200, 7)] + [("No such product", 1), (names[0], 20)]
+        assert sharded.do_purchase(order) == inv.do_purchase(order)
+        assert sharded.addReviews(names[1], 5, 3) == inv.addReviews(names[1], 5, 3)
+        sharded.adjust_stock(names[2], 99)
+        inv.adjust_stock(names[2], 99)
+        orders = randomOrders(40) + [[], [("No such product", 2)]]
+        assert sharded.do_purchase_batch(orders) == inv.do_purchase_batch(orders)
+        reviews = ([names[3], names[4], names[3], "No such product", names[6]], [4, "bad", 1, 5, 2], [2, 1, 1, 1, 1.5])
+        assert sharded.addReviewsBatch(reviews) == pytest.approx(inv.addReviewsBatch(reviews))
+        delivery = ([names[7], "No such product", names[8], names[7]], [5, 1, "many", 2], [None, None, None, 20])
+        assert sharded.restock(delivery) == inv.restock(delivery)
+        assert sharded.getReorderPoint(names[7]) == inv.getReorderPoint(names[7]) == 20
+        assert sharded.getReorderPoint(names[5]) == 50 and sharded.getReorderPoint("No such product") == 3
+        sharded.setReorderPoint(names[9], 12)
+        inv.setReorderPoint(names[9], 12)
+        assert sorted(sharded.lowStock()) == sorted(inv.lowStock())
+        shortfalls = [point - stock for _, stock, point in sharded.lowStock()]
+        assert shortfalls == sorted(shortfalls, reverse=True) and len(sharded.lowStock(2)) == 2
+        assert sharded.reprice(percent=10, subcat="Car Electronics") == inv.reprice(percent=10, subcat="Car Electronics")
+        with pytest.raises(ValueError):
+            sharded.reprice(percent=10, price=5)
+        for name in names[:200]:
+            assert sharded.products[name]["stock"] == inv.products[name]["stock"]
+            assert productFields(sharded.getProduct(name)) == pytest.approx(productFields(inv.getProduct(name)))
+
+        query = myQuery().category("Car Electronics").price(10, 500)
+        for order_by, limit in ((None, None), ("-rating", 7), ("purchase_price", None), ("stock", 3)):
+            stud_val = sharded.query(query, order_by, limit)
+            real_val = inv.query(query, order_by, limit)
+            assert len(stud_val) == len(real_val)
+            if order_by is None:
+                assert [p.name for p in stud_val] == sorted((p.name for p in real_val), key=names.index)
+            else:
+                field = order_by.lstrip("-")
+                value = (lambda p: p.get_purchase_price()) if field == "purchase_price" else (lambda p: getattr(p, field))
+                assert [value(p) for p in stud_val] == [value(p) for p in real_val]
+        with pytest.raises(ValueError):
+            sharded.query(query, order_by="name")
+        assert [p.name for p in sharded.searchProducts("car adap", 5)] == [p.name for p in inv.searchProducts("car adap", 5)]
+        assert sharded.searchProducts("") == inv.searchProducts("") == []
+
+        # An atomic order that fails on one shard puts back the stock taken on the others
+        shards = {}
+        for name in names:
+            shards.setdefault(sharded._shard(name), name)
+        before = {name: sharded.products[name]["stock"] for name in shards.values()}
+        lines = [(name, 1) for name in shards.values()]
+        lines[-1] = (lines[-1][0], 10**6)
+        assert sharded.do_purchase(lines, atomic=True) == (0, [])
+        assert {name: sharded.products[name]["stock"] for name in shards.values()} == before
+
+        # Views are read-only: shards own their rows, and the store can't grow away from shared memory
+        with pytest.raises(ValueError):
+            sharded.getProduct(names[0]).discPrice = 1.0
+        with pytest.raises(ValueError):
+            sharded.products.append(myProduct("New product", "c", "s", "i", "u", 1.0, 1, 1.0, 1.0))
+
+        other = myInventory("Other", FILE_1, columnar=columnar)
+        with sharded + other as combined:
+            assert combined == inv and combined.shards == 3
+            assert combined.getReorderPoint(names[5]) == 50 and combined.reorder_point == 3
+            assert combined.products[names[2]]["stock"] == 99
+            assert combined.getProduct(names[3]).get_rating() == pytest.approx(sharded.getProduct(names[3]).get_rating())
+
+def test_shardedInventoryMatchesInventory(tmp_path, columnar):
+    # The rest of myInventory's reporting and export calls give the same results on a sharded inventory
+    from START_asn_1 import myImageCache
+    inv = myInventory("Single", FILE_2, columnar=columnar, reorder_point=3)
+    inv.read_file(FILE_1)
+    names = list(inv.products)
+    inv.setReorderPoint(names[5], 50)
+    with myShardedInventory("Sharded", shards=3, inventory=inv) as sharded:
+        for category in (None, "car & motorbike", "No such category"):
+            assert [p.rating for p in sharded.topRated(15, category)] == [p.rating for p in inv.topRated(15, category)]
+            assert [p.name for p in sharded.topRated(15, category, weighted=True)] == [p.name for p in inv.topRated(15, category, weighted=True)]
+            for weighted in (False, True):
+                assert sharded.averageRating(category, weighted) == pytest.approx(inv.averageRating(category, weighted))
+            assert [p.name for p in sharded.iterCategory(category)] == [p.name for p in inv.iterCategory(category)]
+        assert sharded.topRated(0) == inv.topRated(0) == []
+
+        as_objects = {"category": object, "subcat": object}
+        for query in (None, myQuery().category("car & motorbike").rating(4)):
+            pd.testing.assert_frame_equal(sharded.to_pandas(query).astype(as_objects), inv.to_pandas(query).astype(as_objects))
+
+        path = str(tmp_path / "sharded.npz")
+        sharded.save_snapshot(path)
+        restored = myInventory.load_snapshot(path, columnar=columnar)
+        assert list(restored.products) == names
+        assert restored.getReorderPoint(names[5]) == 50 and restored.reorder_point == 3
+        assert productFields(restored.getProduct(names[1])) == productFields(inv.getProduct(names[1]))
+
+        assert sharded.prefetch_images("No such category", cache=myImageCache(str(tmp_path / "images"))) == 0
+        with pytest.raises(TypeError):
+            sharded.read_file(FILE_1)
+
+        # sum() and myInventory + myShardedInventory give a myInventory, leaving the operands alone
+        other = myInventory("Other", FILE_1, columnar=columnar)
+        total = sum([sharded, other])
+        assert total == inv + other and len(sharded) == len(inv)
+        assert list((other + sharded).products) == list((other + inv).products)
+
+def test_shardedInventoryEmptyShards():
+    inv = myInventory("Tiny", columnar=True)
+    inv.products.add("Only product", {"product": myProduct("Only product", "c", "s", "i", "u", 4.0, 2, 0.0, 10.0), "stock": 5})
+    # More shards than products leaves most of them empty
+    with myShardedInventory("Sharded", shards=4, inventory=inv) as sharded:
+        assert [p.name for p in sharded.getCategory()] == ["Only product"]
+        assert [p.name for p in sharded.query(myQuery().in_stock(), order_by="-price")] == ["Only product"]
+        assert sharded.do_purchase([("Only product", 2)]) == (20.0, [("Only product", 2, 20.0)])
+        assert sharded.lowStock() == [] and sharded.reprice(price=5) == 1
+        with pytest.raises(ValueError):
+            sharded.products.append(myProduct("New product", "c", "s", "i", "u", 1.0, 1, 1.0, 1.0))
+    with myShardedInventory("Empty", shards=2, inventory=myInventory("Empty", columnar=True)) as empty:
+        assert len(empty) == 0 and empty.getCategory() == [] and empty.do_purchase_batch([[("x", 1)]]) == [(0, [])]
+
+def test_lowStock(columnar):
+    inv = myInventory("Low", FILE_2, columnar=columnar, default_stock=5, reorder_point=2)
+    names = list(inv.products)
+    assert all(inv.products[name]["stock"] == 5 for name in names)
+    assert inv.lowStock() == [] and inv.lowStock(0) == []
+
+    inv.adjust_stock(names[0], 1)
+    inv.setReorderPoint(names[1], 5)
+    inv.do_purchase([(names[2], 2), ("No such product", 1), (names[2], 2)])
+    stud_val = inv.lowStock()
+    assert sorted(stud_val[:2]) == sorted([(names[0], 1, 2), (names[2], 1, 2)]) and stud_val[2] == (names[1], 5, 5)
+    assert len(inv.lowStock(1)) == 1
+
+    new_stock = inv.restock(pd.DataFrame({
+        "product_name": [names[0], names[2], names[0], "No such product", names[3], names[4]],
+        "quantity": [3, "many", 4, 1, 1, 1.5],
+        "reorder_point": [None, None, 10, None, None, 50],
+    }))
+    assert new_stock == {names[0]: 8, names[3]: 6}
+    # A fractional quantity is skipped along with the reorder point on its row
+    assert inv.getReorderPoint(names[0]) == 10 and inv.getReorderPoint(names[4]) == 2
+    assert inv.lowStock() == [(names[0], 8, 10), (names[2], 1, 2), (names[1], 5, 5)]
+
+    # The atomic and batch purchase paths and a reorder point reset keep the index current
+    assert inv.do_purchase([(names[5], 3), (names[6], 4)], atomic=True)[1]
+    inv.do_purchase_batch([[(names[6], 1), (names[7], 5)], [(names[7], 1)]])
+    inv.setReorderPoint(names[1], None)
+    stud_val = inv.lowStock()
+    assert sorted(stud_val[:3]) == sorted([(names[0], 8, 10), (names[6], 0, 2), (names[7], 0, 2)])
+    assert stud_val[3:] == [(names[2], 1, 2), (names[5], 2, 2)]
+
+    # The index is rebuilt once new products arrive
+    inv.read_file(FILE_1)
+    assert len(inv.lowStock()) == 5
+
+def test_lowStockSettingsMerge(columnar, caplog):
+    first = myInventory("First", FILE_2, columnar=columnar, default_stock=5, reorder_point=2)
+    second = myInventory("Second", FILE_1, columnar=columnar, default_stock=5, reorder_point=7)
+    shared = list(first.products)[0]
+    second_names = list(second.products)
+    first.setReorderPoint(shared, 4)
+    second.setReorderPoint(second_names[0], 1)
+    second.setReorderPoint("Not stocked yet", 9)
+
+    for combined in (first + second, myInventory.merge([first, second], columnar=columnar)):
+        assert (combined.default_stock, combined.reorder_point) == (5, 2)
+        # Products from second keep second's reorder points, its default one included
+        assert combined.getReorderPoint(second_names[0]) == 1 and combined.getReorderPoint(second_names[1]) == 7
+        assert combined.getReorderPoint(shared) == 4 and combined.getReorderPoint("Not stocked yet") == 9
+        assert combined.getReorderPoint(list(first.products)[1]) == 2
+        assert {name for name, _, _ in combined.lowStock()} == set(second_names) - {second_names[0]}
+    assert (0 + second).getReorderPoint(second_names[1]) == 7
+
+    # A conflicting reorder point or default_stock keeps the first inventory's, with a warning
+    second.products.add(shared, {"product": first.getProduct(shared), "stock": 5})
+    second.setReorderPoint(shared, 30)
+    third = myInventory("Third", columnar=columnar, default_stock=8)
+    with caplog.at_level("WARNING"):
+        combined = myInventory.merge([first, second, third], columnar=columnar)
+    assert combined.getReorderPoint(shared) == 4 and combined.default_stock == 5
+    assert "1 products have a different reorder point in Second" in caplog.text and "default_stock of 8" in caplog.text
+    assert myInventory.merge([]).reorder_point == 0
+
+    loaded = myInventory.from_files([FILE_2, FILE_1], columnar=columnar, processes=1, default_stock=3, reorder_point=3)
+    assert (loaded.default_stock, loaded.reorder_point) == (3, 3) and len(loaded.lowStock()) == len(loaded)
+    assert myInventory.from_files([], default_stock=3).default_stock == 3
+
+def test_toPandas(columnar):
+    query = myQuery().price(100, 500).in_stock()
+    inv = myInventory("Export", FILE_2, columnar=columnar)
+    inv.read_file(FILE_1)
+    names = list(inv.products)
+    inv.adjust_stock(names[3], 0)
+    frame = inv.to_pandas()
+    assert list(frame.columns) == list(myInventory.EXPORT_COLUMNS)
+    assert frame["name"].tolist() == names
+    assert frame["stock"][3] == 0
+    assert frame["purchase_price"].tolist() == [inv.getProduct(name).get_purchase_price() for name in names]
+    assert frame["subcat"][0] == inv.getProduct(names[0]).subcat
+
+    filtered = inv.to_pandas(query, columns=["name", "purchase_price", "stock"])
+    matches = {product.name: product for product in inv.query(query)}
+    assert filtered["name"].tolist() == [name for name in names if name in matches]
+    assert filtered["purchase_price"].tolist() == [matches[name].get_purchase_price() for name in filtered["name"]]
+    assert (filtered["stock"] > 0).all()
+    with pytest.raises(ValueError):
+        inv.to_pandas(columns=["weight"])
+    empty = myInventory("Empty", columnar=columnar).to_pandas(columns=["name", "stock"])
+    assert list(empty.columns) == ["name", "stock"] and len(empty) == 0
+
+    if columnar:
+        # The unfiltered export reads the inventory's arrays in place, and can't be used to change them
+        inv.adjust_stock(names[0], 42)
+        assert frame["stock"][0] == 42
+        with pytest.raises(ValueError):
+            frame["stock"].to_numpy()[0] = 1
+
+def test_toPandasReprice(columnar):
+    inv = myInventory("Export", FILE_2, columnar=columnar)
+    names = list(inv.products)
+    frame = inv.to_pandas()
+    filtered = inv.to_pandas(myQuery().in_stock(), columns=["name", "discPrice", "purchase_price"])
+    before = frame[["discPrice", "purchase_price"]].copy()
+    assert inv.reprice(price=1.25) == len(names)
+
+    # purchase_price and filtered or dict-based exports are copies taken at export time
+    pd.testing.assert_series_equal(frame["purchase_price"], before["purchase_price"])
+    assert filtered["discPrice"].tolist() == before["discPrice"].tolist()
+    assert filtered["purchase_price"].tolist() == before["purchase_price"].tolist()
+    # Only the columnar export's discPrice column is a live view of the repriced array
+    assert frame["discPrice"].tolist() == ([1.25] * len(names) if columnar else before["discPrice"].tolist())
+    assert inv.to_pandas()["purchase_price"].tolist() == [1.25] * len(names)
+
+def test_toArrow(columnar):
+    pytest.importorskip("pyarrow")
+    inv = myInventory("Export", FILE_2, columnar=columnar)
+    table = inv.to_arrow(columns=["name", "category", "stock"])
+    assert table.num_rows == len(inv)
+    assert table.column("stock").to_pylist() == [inv.products[name]["stock"] for name in inv.products]